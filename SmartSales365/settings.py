@@ -68,6 +68,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para medir el request completo; se desactiva solo con METRICAS_MUESTREO=0
+    'administracion.core.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -109,6 +111,33 @@ DATABASES = {
 }
 
 
+# Cache
+# Sin REDIS_URL se usa memoria local del proceso (desarrollo y tests).
+# En producción, REDIS_URL=redis://host:6379/0 (requiere el paquete 'redis').
+
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'smartsales',
+        }
+    }
+
+# Carrito activo en caché (ventas.core.cart_store): alias y segundos de vida.
+# El TTL acota cuánto puede tardar en verse un cambio de precio o stock.
+CART_CACHE_ALIAS = 'default'
+CART_CACHE_TTL = config('CART_CACHE_TTL', default=120, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -147,6 +176,11 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Archivos generados (reportes en segundo plano)
+MEDIA_URL = '/media/'
+
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -189,6 +223,11 @@ CORS_ALLOWED_ORIGINS = [
 # Permitir que el navegador envíe cookies en peticiones cross-origin
 CORS_ALLOW_CREDENTIALS = True
 
+# Headers que el frontend puede leer desde otro origen: la paginación por
+# cursor (series de ventas, visor de bitácora) manda la página siguiente en
+# X-Next-Cursor
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor']
+
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # CSRF Trusted Origins - Incluye tu IP local y emulador Android
@@ -211,6 +250,82 @@ CSRF_TRUSTED_ORIGINS = [
 
 API_KEY_IMGBB= config('API_KEY_IMGBB', default='')
 
+# ============================================
+# RESERVAS DE STOCK (checkout -> pago)
+# ============================================
+# Minutos que una unidad queda 'reservado' tras el checkout antes de que
+# release_expired_reservations la devuelva a 'disponible'.
+STOCK_RESERVA_MINUTOS = config('STOCK_RESERVA_MINUTOS', default=15, cast=int)
+
+# ============================================
+# MODELO DE PREDICCIÓN DE VENTAS
+# ============================================
+# Archivo generado por train_sales_model y leído por SalesPredictionView.
+SALES_MODEL_PATH = config('SALES_MODEL_PATH', default=str(BASE_DIR / 'sales_model.pkl'))
+# Cargar el modelo al iniciar el proceso (evita la espera en la primera consulta)
+SALES_MODEL_WARMUP = config('SALES_MODEL_WARMUP', default=False, cast=bool)
+
+# ============================================
+# BITÁCORA (administracion.core.bitacora)
+# ============================================
+# Con BITACORA_ASINCRONA las entradas se encolan y un hilo las guarda con
+# bulk_create cada BITACORA_LOTE entradas o BITACORA_INTERVALO segundos.
+# Antes de encolarse cada entrada se anota en un diario junto a
+# BITACORA_RESPALDO, que sobrevive a una caída del proceso y se importa al
+# arrancar. Si la base falla se vuelcan a BITACORA_RESPALDO y se reintentan;
+# una entrada que la base rechaza se descarta tras BITACORA_MAX_INTENTOS.
+BITACORA_ASINCRONA = config('BITACORA_ASINCRONA', default=True, cast=bool)
+BITACORA_LOTE = config('BITACORA_LOTE', default=100, cast=int)
+BITACORA_INTERVALO = config('BITACORA_INTERVALO', default=2.0, cast=float)
+BITACORA_RESPALDO = config('BITACORA_RESPALDO', default=str(BASE_DIR / 'bitacora_pendiente.jsonl'))
+BITACORA_MAX_INTENTOS = config('BITACORA_MAX_INTENTOS', default=5, cast=int)
+# Días que un registro queda en la tabla viva antes de que archivar_bitacora
+# lo mueva a RegistroBitacoraArchivo.
+BITACORA_RETENCION_DIAS = config('BITACORA_RETENCION_DIAS', default=90, cast=int)
+
+# ============================================
+# REPORTES EN SEGUNDO PLANO (inteligencia_negocios.core.trabajos)
+# ============================================
+# Con REPORTES_EN_PROCESO un pool de REPORTES_WORKERS hilos genera los
+# reportes encolados; si no, solo el comando procesar_reportes.
+REPORTES_EN_PROCESO = config('REPORTES_EN_PROCESO', default=True, cast=bool)
+REPORTES_WORKERS = config('REPORTES_WORKERS', default=2, cast=int)
+# Un trabajo 'procesando' por más tiempo se considera abandonado y se reintenta
+REPORTES_TIMEOUT_MINUTOS = config('REPORTES_TIMEOUT_MINUTOS', default=30, cast=int)
+# Veces que se reintenta un trabajo abandonado antes de dejarlo en 'error'
+REPORTES_MAX_INTENTOS = config('REPORTES_MAX_INTENTOS', default=3, cast=int)
+
+# Caché de resultados de reportes (inteligencia_negocios.core.cache_reportes).
+# Segundos de vida según el período: el día de hoy, lo reciente (mes en
+# curso, inventario) y los meses ya cerrados. Un TTL en 0 desactiva la caché.
+REPORTES_CACHE_ALIAS = 'default'
+REPORTES_CACHE_TTL_HOY = config('REPORTES_CACHE_TTL_HOY', default=60, cast=int)
+REPORTES_CACHE_TTL_RECIENTE = config('REPORTES_CACHE_TTL_RECIENTE', default=300, cast=int)
+REPORTES_CACHE_TTL_HISTORICO = config('REPORTES_CACHE_TTL_HISTORICO', default=24 * 3600, cast=int)
+# Reportes más grandes no se guardan: se leen por bloques cada vez
+REPORTES_CACHE_MAX_FILAS = config('REPORTES_CACHE_MAX_FILAS', default=5000, cast=int)
+REPORTES_CACHE_MAX_BYTES = config('REPORTES_CACHE_MAX_BYTES', default=2 * 1024 * 1024, cast=int)
+# Segundos que se sirve un reporte estándar ya generado aunque su versión
+# siga vigente: acota el atraso por cambios que no pasan por las señales
+REPORTES_ESTANDAR_MAX_EDAD = config('REPORTES_ESTANDAR_MAX_EDAD', default=3600, cast=int)
+
+# Motor analítico columnar (inteligencia_negocios.core.motor): los reportes
+# de ventas agrupados se calculan sobre una copia en memoria (NumPy) de las
+# ventas, actualizada de forma incremental, en vez de un GROUP BY en la base.
+# Cada worker guarda su copia; se recarga completa cada tantos segundos.
+REPORTES_MOTOR_COLUMNAR = config('REPORTES_MOTOR_COLUMNAR', default=False, cast=bool)
+REPORTES_MOTOR_RECARGA_SEGUNDOS = config('REPORTES_MOTOR_RECARGA_SEGUNDOS', default=3600, cast=int)
+
+# ============================================
+# MÉTRICAS DE REQUESTS (administracion.core.metricas)
+# ============================================
+# Fracción de requests medidos (0 = desactivado, 1 = todos). Los medidos
+# llevan el header Server-Timing y alimentan /api/_metrics (Prometheus).
+METRICAS_MUESTREO = config('METRICAS_MUESTREO', default=0.0, cast=float)
+# /api/_metrics exige Authorization: Bearer <token>; sin token no se publica
+# (el muestreo y Server-Timing siguen funcionando)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
 # ============================================
 # CONFIGURACIÓN DE STRIPE
 # ============================================
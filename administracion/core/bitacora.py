@@ -0,0 +1,344 @@
+"""
+Escritura diferida y por lotes de la bitácora.
+
+registrar_bitacora no inserta en el request: arma la entrada (con la fecha
+del momento) y la encola. Si hay una transacción abierta, la entrada se
+encola recién en transaction.on_commit, así una operación revertida no deja
+registro y el checkout no mantiene la transacción abierta por la bitácora.
+
+Cada entrada se agrega primero a un diario local del proceso
+(BITACORA_RESPALDO.diario.<pid>-<id>, JSON por línea) y recién después a la
+cola en memoria. Un hilo del proceso vacía la cola con bulk_create cuando
+junta BITACORA_LOTE entradas o cada BITACORA_INTERVALO segundos, y al
+terminar el proceso; el diario de ese lote se borra cuando el lote quedó
+guardado. Si el proceso muere de golpe (kill -9, falta de memoria, el
+SIGKILL del timeout de gunicorn) el diario queda en disco y el hilo de
+bitácora del próximo proceso lo importa al arrancar. Si la caída ocurre
+justo después del bulk_create, el lote puede guardarse dos veces: se
+prefiere un registro repetido a uno perdido.
+
+Si la base falla, las entradas se vuelcan a BITACORA_RESPALDO y se
+reintentan en la siguiente vuelta del hilo. Mientras la base no responda se
+reintentan sin límite; una entrada que la base rechaza se descarta tras
+BITACORA_MAX_INTENTOS intentos, salvo que apunte a un usuario ya borrado:
+esa se guarda sin usuario.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import IntegrityError, InterfaceError, OperationalError, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import RegistroBitacora
+
+logger = logging.getLogger(__name__)
+
+
+def _campos(entrada):
+    """Campos de RegistroBitacora de una entrada (sin el contador de intentos)."""
+    return {campo: valor for campo, valor in entrada.items() if campo != 'intentos'}
+
+
+def _linea(entrada):
+    return json.dumps(dict(entrada, fecha_hora=entrada['fecha_hora'].isoformat())) + '\n'
+
+
+def _proceso_vivo(pid):
+    if os.name == 'nt':
+        # os.kill(pid, 0) no es una consulta en Windows: no se adopta nada
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class BufferBitacora:
+    """
+    Cola en memoria de entradas de bitácora (dicts con los campos de
+    RegistroBitacora), respaldada por un diario en disco, con un hilo que
+    las persiste por lotes.
+    """
+
+    def __init__(self, lote=None, intervalo=None, respaldo=None, hilo=True):
+        self._lote = lote
+        self._intervalo = intervalo
+        self._respaldo = respaldo
+        self.usar_hilo = hilo
+        self._cola = deque()
+        self._lock = threading.Lock()
+        self._despertar = threading.Event()
+        self._detenido = threading.Event()
+        self._hilo = None
+        self._pid = None
+        self._diario = None
+        self._ruta_diario = None
+        self._pid_diario = None
+        # Diarios de este proceso (el abierto, los lotes en vuelo y los que
+        # se están recuperando): ninguna vuelta de recuperar() los adopta
+        self._propios = set()
+
+    @property
+    def lote(self):
+        return self._lote or settings.BITACORA_LOTE
+
+    @property
+    def intervalo(self):
+        return self._intervalo or settings.BITACORA_INTERVALO
+
+    @property
+    def respaldo(self):
+        return self._respaldo or settings.BITACORA_RESPALDO
+
+    @property
+    def max_intentos(self):
+        return settings.BITACORA_MAX_INTENTOS
+
+    @property
+    def prefijo_diario(self):
+        return f'{self.respaldo}.diario.'
+
+    def _nueva_ruta(self, sufijo=''):
+        return f'{self.prefijo_diario}{os.getpid()}-{uuid.uuid4().hex[:8]}{sufijo}'
+
+    # ==================== ENCOLADO ====================
+
+    def agregar(self, **entrada):
+        """Encola una entrada; dentro de una transacción, al confirmarse."""
+        entrada.setdefault('fecha_hora', timezone.now())
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._encolar(entrada))
+        else:
+            self._encolar(entrada)
+
+    def _encolar(self, entrada):
+        with self._lock:
+            self._anotar(entrada)
+            self._cola.append(entrada)
+            lleno = len(self._cola) >= self.lote
+        if self.usar_hilo:
+            self._asegurar_hilo()
+            if lleno:
+                self._despertar.set()
+
+    def _anotar(self, entrada):
+        """Agrega la entrada al diario del proceso (con el lock tomado)."""
+        try:
+            # Tras un fork el hijo no escribe en el diario heredado del padre
+            if self._pid_diario != os.getpid():
+                self._ruta_diario = self._nueva_ruta()
+                self._diario = open(self._ruta_diario, 'a', encoding='utf-8')
+                self._pid_diario = os.getpid()
+                self._propios.add(self._ruta_diario)
+            self._diario.write(_linea(entrada))
+            self._diario.flush()
+        except OSError as e:
+            logger.error(f"❌ No se pudo escribir el diario de bitácora {self._ruta_diario}: {e}")
+
+    def _asegurar_hilo(self):
+        # Tras un fork (gunicorn --preload) el hilo del padre no existe en el hijo
+        if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is not None and self._hilo.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._detenido.clear()
+            self._hilo = threading.Thread(target=self._bucle, name='bitacora', daemon=True)
+            self._hilo.start()
+
+    # ==================== VACIADO ====================
+
+    def _bucle(self):
+        # La primera vuelta, al arrancar, importa los diarios de procesos caídos
+        while not self._detenido.is_set():
+            try:
+                self.vaciar()
+                self.recuperar()
+            except Exception as e:
+                # Un error no puede terminar el hilo: la cola seguiría creciendo
+                logger.error(f"❌ Error al vaciar la bitácora: {e}")
+            finally:
+                # El hilo no retiene conexiones entre vueltas
+                connections.close_all()
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+    def _tomar(self):
+        """
+        Toma lo encolado y aparta su diario como lote en vuelo (las entradas
+        nuevas van a otro). Devuelve (entradas, ruta del lote o None).
+        """
+        with self._lock:
+            entradas = list(self._cola)
+            self._cola.clear()
+            if not entradas or self._diario is None or self._pid_diario != os.getpid():
+                return entradas, None
+            en_vuelo = f'{self._ruta_diario}.lote'
+            try:
+                self._diario.close()
+                os.replace(self._ruta_diario, en_vuelo)
+            except OSError as e:
+                logger.error(f"❌ No se pudo apartar el diario de bitácora {self._ruta_diario}: {e}")
+                en_vuelo = None
+            self._propios.discard(self._ruta_diario)
+            self._diario = self._ruta_diario = self._pid_diario = None
+            if en_vuelo:
+                self._propios.add(en_vuelo)
+        return entradas, en_vuelo
+
+    def _descartar_diario(self, ruta):
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        self._propios.discard(ruta)
+
+    def vaciar(self):
+        """Persiste lo encolado; lo que no se pueda guardar va al respaldo."""
+        entradas, en_vuelo = self._tomar()
+        if entradas:
+            # Si esto falla el lote queda en disco y se importa al reiniciar
+            self._guardar(entradas)
+        if en_vuelo:
+            self._descartar_diario(en_vuelo)
+        return len(entradas)
+
+    def _guardar(self, entradas):
+        try:
+            RegistroBitacora.objects.bulk_create(
+                [RegistroBitacora(**_campos(entrada)) for entrada in entradas],
+                batch_size=self.lote,
+            )
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo guardar un lote de {len(entradas)} entradas de bitácora: {e}")
+
+        # Una entrada inválida no arrastra al resto
+        fallidas = []
+        for entrada in entradas:
+            try:
+                self._guardar_una(_campos(entrada))
+            except (OperationalError, InterfaceError):
+                # La base no responde: no es culpa de la entrada
+                fallidas.append(entrada)
+            except Exception:
+                # La entrada no se puede insertar: cuenta para descartarla
+                fallidas.append(dict(entrada, intentos=entrada.get('intentos', 0) + 1))
+        if fallidas:
+            self._volcar(fallidas)
+
+    def _guardar_una(self, campos):
+        try:
+            with transaction.atomic():
+                RegistroBitacora.objects.create(**campos)
+        except IntegrityError:
+            if campos.get('usuario_id') is None:
+                raise
+            # El usuario se borró antes de guardar la entrada: va sin usuario
+            with transaction.atomic():
+                RegistroBitacora.objects.create(**dict(campos, usuario_id=None))
+
+    def _volcar(self, entradas):
+        volcadas = [entrada for entrada in entradas if entrada.get('intentos', 0) < self.max_intentos]
+        if len(volcadas) < len(entradas):
+            logger.error(
+                f"❌ {len(entradas) - len(volcadas)} entradas de bitácora descartadas "
+                f"tras {self.max_intentos} intentos"
+            )
+        if not volcadas:
+            return
+        try:
+            with open(self.respaldo, 'a', encoding='utf-8') as archivo:
+                for entrada in volcadas:
+                    archivo.write(_linea(entrada))
+            logger.error(f"❌ {len(volcadas)} entradas de bitácora volcadas a {self.respaldo}")
+        except OSError as e:
+            logger.error(f"❌ Se perdieron {len(volcadas)} entradas de bitácora: {e}")
+
+    # ==================== RECUPERACIÓN ====================
+
+    def _huerfanos(self):
+        """Diarios de procesos que ya no existen (o de un proceso anterior con el mismo pid)."""
+        for ruta in glob.glob(glob.escape(self.prefijo_diario) + '*'):
+            if ruta in self._propios:
+                continue
+            pid = ruta[len(self.prefijo_diario):].split('-', 1)[0]
+            if not pid.isdigit():
+                continue
+            if int(pid) == os.getpid() or not _proceso_vivo(int(pid)):
+                yield ruta
+
+    def _leer(self, ruta):
+        entradas, invalidas = [], 0
+        with open(ruta, encoding='utf-8', errors='replace') as archivo:
+            for linea in archivo:
+                if not linea.strip():
+                    continue
+                # Una línea cortada (p. ej. el proceso murió escribiéndola) no frena al resto
+                try:
+                    entrada = json.loads(linea)
+                    entrada['fecha_hora'] = parse_datetime(entrada['fecha_hora'])
+                except (ValueError, TypeError, KeyError):
+                    entrada = None
+                if not isinstance(entrada, dict) or entrada.get('fecha_hora') is None:
+                    invalidas += 1
+                    continue
+                entradas.append(entrada)
+        if invalidas:
+            logger.error(f"❌ {invalidas} líneas ilegibles descartadas de {ruta}")
+        return entradas
+
+    def recuperar(self):
+        """
+        Reintenta las entradas volcadas al archivo de respaldo y las de los
+        diarios que dejaron procesos caídos. Cada archivo se renombra antes
+        de leerlo para que dos procesos no lo importen dos veces, y se borra
+        recién después de guardar sus entradas.
+        """
+        tomados, entradas = [], []
+        for ruta in [self.respaldo, *self._huerfanos()]:
+            tomado = self._nueva_ruta('.recuperando')
+            try:
+                os.replace(ruta, tomado)
+            except FileNotFoundError:
+                continue
+            self._propios.add(tomado)
+            tomados.append(tomado)
+            entradas.extend(self._leer(tomado))
+
+        if entradas:
+            self._guardar(entradas)
+        for tomado in tomados:
+            self._descartar_diario(tomado)
+        return len(entradas)
+
+    def detener(self):
+        """Vacía la cola y detiene el hilo (al salir del proceso o en tests)."""
+        self._detenido.set()
+        self._despertar.set()
+        if self._hilo is not None and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=self.intervalo + 5)
+        self._hilo = None
+        self.vaciar()
+        with self._lock:
+            if self._diario is not None and self._pid_diario == os.getpid() and not self._cola:
+                # Todo quedó guardado: el diario vacío no hace falta
+                self._diario.close()
+                self._descartar_diario(self._ruta_diario)
+                self._diario = self._ruta_diario = self._pid_diario = None
+
+
+buffer_bitacora = BufferBitacora()
+atexit.register(buffer_bitacora.detener)
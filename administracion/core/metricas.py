@@ -0,0 +1,205 @@
+"""
+Instrumentación por request: tiempo total, tiempo en base de datos, cantidad
+de consultas y consultas duplicadas (misma sentencia repetida, típico de un
+N+1), agregadas por vista.
+
+MetricasMiddleware mide una fracción METRICAS_MUESTREO de los requests y
+agrega a la respuesta un header Server-Timing. Con METRICAS_MUESTREO = 0 el
+middleware se descarta al iniciar (MiddlewareNotUsed) y no cuesta nada.
+
+Las métricas se acumulan en memoria del proceso y se exponen en formato de
+texto de Prometheus en /api/_metrics. Con varios workers cada uno tiene sus
+propios contadores (Prometheus los distingue por instancia).
+"""
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) del histograma de duración
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Huellas de consultas duplicadas que se guardan por vista
+MAX_HUELLAS_POR_VISTA = 20
+
+_LISTA_PARAMETROS = re.compile(r'\(\s*%s(\s*,\s*%s)*\s*\)')
+_ESPACIOS = re.compile(r'\s+')
+
+
+def huella(sql):
+    """
+    Identifica la forma de una consulta sin sus parámetros: los IN (%s, %s, ...)
+    de cualquier largo cuentan como la misma consulta.
+    """
+    normalizada = _ESPACIOS.sub(' ', _LISTA_PARAMETROS.sub('(%s...)', sql)).strip()
+    return hashlib.sha1(normalizada.encode()).hexdigest()[:12], normalizada
+
+
+class Medicion:
+    """Consultas de un request, registradas vía connection.execute_wrapper."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_db = 0.0
+        self.huellas = Counter()
+        self.sentencias = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos_db += time.perf_counter() - inicio
+            self.consultas += 1
+            clave, normalizada = huella(sql)
+            self.huellas[clave] += 1
+            self.sentencias.setdefault(clave, normalizada)
+
+    @property
+    def duplicadas(self):
+        return {clave: veces for clave, veces in self.huellas.items() if veces > 1}
+
+
+class RegistroMetricas:
+    """Contadores agregados por (vista, método), seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self._series = defaultdict(lambda: {
+                'requests': 0,
+                'segundos': 0.0,
+                'segundos_db': 0.0,
+                'consultas': 0,
+                'duplicadas': 0,
+                'buckets': [0] * len(BUCKETS),
+            })
+            self._huellas = defaultdict(Counter)
+            self._sentencias = {}
+
+    def registrar(self, vista, metodo, segundos, medicion):
+        duplicadas = medicion.duplicadas
+        with self._lock:
+            serie = self._series[(vista, metodo)]
+            serie['requests'] += 1
+            serie['segundos'] += segundos
+            serie['segundos_db'] += medicion.segundos_db
+            serie['consultas'] += medicion.consultas
+            serie['duplicadas'] += sum(duplicadas.values()) - len(duplicadas)
+            for i, limite in enumerate(BUCKETS):
+                if segundos <= limite:
+                    serie['buckets'][i] += 1
+
+            huellas = self._huellas[vista]
+            for clave, veces in duplicadas.items():
+                if clave not in huellas and len(huellas) >= MAX_HUELLAS_POR_VISTA:
+                    continue
+                if clave not in self._sentencias:
+                    self._sentencias[clave] = medicion.sentencias[clave]
+                    logger.warning(
+                        f"🔁 Consulta repetida {veces} veces en {vista} [{clave}]: "
+                        f"{medicion.sentencias[clave][:300]}"
+                    )
+                huellas[clave] += veces - 1
+
+    def prometheus(self):
+        """Las métricas en formato de exposición de texto de Prometheus."""
+        with self._lock:
+            series = {clave: dict(serie, buckets=list(serie['buckets'])) for clave, serie in self._series.items()}
+            huellas = {vista: dict(contador) for vista, contador in self._huellas.items()}
+
+        lineas = [
+            '# HELP smartsales_request_duration_seconds Duración de los requests muestreados.',
+            '# TYPE smartsales_request_duration_seconds histogram',
+        ]
+        for (vista, metodo), serie in sorted(series.items()):
+            etiquetas = f'view="{_escapar(vista)}",method="{metodo}"'
+            for limite, cantidad in zip(BUCKETS, serie['buckets']):
+                lineas.append(f'smartsales_request_duration_seconds_bucket{{{etiquetas},le="{limite}"}} {cantidad}')
+            lineas.append(f'smartsales_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {serie["requests"]}')
+            lineas.append(f'smartsales_request_duration_seconds_sum{{{etiquetas}}} {serie["segundos"]:.6f}')
+            lineas.append(f'smartsales_request_duration_seconds_count{{{etiquetas}}} {serie["requests"]}')
+
+        contadores = (
+            ('db_seconds', 'segundos_db', 'Tiempo en la base de datos.', '{:.6f}'),
+            ('queries', 'consultas', 'Consultas SQL ejecutadas.', '{}'),
+            ('duplicate_queries', 'duplicadas', 'Consultas repetidas dentro del mismo request.', '{}'),
+        )
+        for nombre, campo, ayuda, formato in contadores:
+            lineas.append(f'# HELP smartsales_request_{nombre}_total {ayuda}')
+            lineas.append(f'# TYPE smartsales_request_{nombre}_total counter')
+            for (vista, metodo), serie in sorted(series.items()):
+                valor = formato.format(serie[campo])
+                lineas.append(
+                    f'smartsales_request_{nombre}_total{{view="{_escapar(vista)}",method="{metodo}"}} {valor}'
+                )
+
+        lineas.append('# HELP smartsales_duplicate_query_total Repeticiones por huella de consulta y vista.')
+        lineas.append('# TYPE smartsales_duplicate_query_total counter')
+        for vista, contador in sorted(huellas.items()):
+            for clave, veces in sorted(contador.items()):
+                lineas.append(
+                    f'smartsales_duplicate_query_total{{view="{_escapar(vista)}",fingerprint="{clave}"}} {veces}'
+                )
+        return '\n'.join(lineas) + '\n'
+
+
+def _escapar(valor):
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registro_metricas = RegistroMetricas()
+
+
+def _nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'sin_ruta'
+    return match.view_name or match.route or 'sin_ruta'
+
+
+class MetricasMiddleware:
+    """
+    Mide los requests muestreados (METRICAS_MUESTREO, de 0 a 1) y agrega
+    Server-Timing: total, db y cantidad de consultas/duplicadas.
+    """
+
+    def __init__(self, get_response):
+        self.muestreo = settings.METRICAS_MUESTREO
+        if self.muestreo <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.muestreo < 1 and random.random() >= self.muestreo:
+            return self.get_response(request)
+
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        with ExitStack() as pila:
+            for conexion in connections.all():
+                pila.enter_context(conexion.execute_wrapper(medicion))
+            response = self.get_response(request)
+        segundos = time.perf_counter() - inicio
+
+        registro_metricas.registrar(_nombre_vista(request), request.method, segundos, medicion)
+        duplicadas = sum(medicion.duplicadas.values()) - len(medicion.duplicadas)
+        response['Server-Timing'] = ', '.join([
+            f'total;dur={segundos * 1000:.1f}',
+            f'db;dur={medicion.segundos_db * 1000:.1f};desc="{medicion.consultas} consultas"',
+            f'dup;desc="{duplicadas} duplicadas"',
+        ])
+        return response
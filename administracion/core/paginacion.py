@@ -0,0 +1,48 @@
+"""
+Paginación por clave (keyset) sobre (fecha_hora, id) descendente.
+
+El cursor es la última fila devuelta, codificada como texto opaco; la página
+siguiente es WHERE (fecha_hora, id) < (cursor), que el índice compuesto
+resuelve sin recorrer las filas anteriores (a diferencia de OFFSET).
+"""
+import base64
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no es uno generado por codificar_cursor."""
+
+
+def codificar_cursor(fecha_hora, pk):
+    texto = f'{fecha_hora.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, pk = texto.rsplit('|', 1)
+        fecha_hora = parse_datetime(fecha)
+        if fecha_hora is None:
+            raise ValueError(fecha)
+        return fecha_hora, int(pk)
+    except ValueError as e:
+        raise CursorInvalido('Cursor inválido') from e
+
+
+def pagina_keyset(queryset, limite, cursor=None):
+    """
+    Devuelve (filas, siguiente_cursor) con a lo sumo `limite` filas ordenadas
+    por -fecha_hora, -id. siguiente_cursor es None en la última página.
+    """
+    queryset = queryset.order_by('-fecha_hora', '-id')
+    if cursor:
+        fecha_hora, pk = decodificar_cursor(cursor)
+        queryset = queryset.filter(Q(fecha_hora__lt=fecha_hora) | Q(fecha_hora=fecha_hora, id__lt=pk))
+    filas = list(queryset[:limite + 1])
+    if len(filas) <= limite:
+        return filas, None
+    ultima = filas[limite - 1]
+    return filas[:limite], codificar_cursor(ultima.fecha_hora, ultima.pk)
@@ -1,4 +1,11 @@
+import logging
+
+from django.conf import settings
+
 from ..models import RegistroBitacora
+from .bitacora import buffer_bitacora
+
+logger = logging.getLogger(__name__)
 
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -9,18 +16,26 @@ def get_client_ip(request):
     return ip
 
 def registrar_bitacora(request, usuario, accion, descripcion, modulo=None):
+    """
+    Registra una acción en la bitácora. Con BITACORA_ASINCRONA la entrada se
+    encola y se guarda por lotes fuera del request (ver core/bitacora.py).
+    """
     try:
         ip = get_client_ip(request)
         usuario_a_registrar = None
         if usuario and usuario.is_authenticated:
             usuario_a_registrar = usuario
-        
-        RegistroBitacora.objects.create(
-            usuario=usuario_a_registrar,
-            accion=accion,
-            descripcion=descripcion,
-            modulo=modulo,
-            ip_address=ip
-        )
+
+        entrada = {
+            'usuario_id': usuario_a_registrar.pk if usuario_a_registrar else None,
+            'accion': accion,
+            'descripcion': descripcion,
+            'modulo': modulo,
+            'ip_address': ip,
+        }
+        if settings.BITACORA_ASINCRONA:
+            buffer_bitacora.agregar(**entrada)
+        else:
+            RegistroBitacora.objects.create(**entrada)
     except Exception as e:
-        print(f'Error al registrar en la bitácora: {e}')
+        logger.error(f"❌ Error al registrar en la bitácora: {e}")
@@ -0,0 +1,66 @@
+# administracion/management/commands/archivar_bitacora.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from administracion.models import RegistroBitacora, RegistroBitacoraArchivo
+
+CAMPOS = ['id', 'usuario_id', 'accion', 'descripcion', 'modulo', 'ip_address', 'fecha_hora']
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve los registros de bitácora más viejos que la retención a la tabla de archivo '
+        '(por lotes) y opcionalmente purga el archivo. Pensado para correr a diario con cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=settings.BITACORA_RETENCION_DIAS,
+            help='Días que los registros quedan en la tabla viva.',
+        )
+        parser.add_argument('--lote', type=int, default=5000, help='Registros movidos por transacción.')
+        parser.add_argument(
+            '--purgar-dias',
+            type=int,
+            help='Además, borrar del archivo los registros con más de estos días.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Solo contar, sin mover ni borrar.')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError("--dias y --lote deben ser mayores que 0")
+        limite = timezone.now() - timedelta(days=options['dias'])
+        viejos = RegistroBitacora.objects.filter(fecha_hora__lt=limite)
+
+        if options['dry_run']:
+            self.stdout.write(f"Se archivarían {viejos.count()} registros anteriores a {limite:%Y-%m-%d %H:%M}")
+            return
+
+        movidos = 0
+        while True:
+            with transaction.atomic():
+                # Los más viejos primero, por el índice (fecha_hora, id)
+                filas = list(viejos.order_by('fecha_hora', 'id').values(*CAMPOS)[:options['lote']])
+                if not filas:
+                    break
+                # ignore_conflicts: si una corrida anterior se cortó, no duplica
+                RegistroBitacoraArchivo.objects.bulk_create(
+                    [RegistroBitacoraArchivo(**fila) for fila in filas],
+                    ignore_conflicts=True,
+                )
+                RegistroBitacora.objects.filter(id__in=[fila['id'] for fila in filas]).delete()
+            movidos += len(filas)
+            self.stdout.write(f"  {movidos} registros archivados...")
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {movidos} registros movidos al archivo"))
+
+        if options['purgar_dias'] is not None:
+            purga = timezone.now() - timedelta(days=options['purgar_dias'])
+            borrados, _ = RegistroBitacoraArchivo.objects.filter(fecha_hora__lt=purga).delete()
+            self.stdout.write(self.style.SUCCESS(f"🗑️ {borrados} registros purgados del archivo"))
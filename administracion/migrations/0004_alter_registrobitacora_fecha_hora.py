@@ -0,0 +1,17 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_alter_cliente_razon_social_alter_cliente_sexo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registrobitacora',
+            name='fecha_hora',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
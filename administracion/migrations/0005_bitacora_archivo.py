@@ -0,0 +1,71 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0004_alter_registrobitacora_fecha_hora'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegistroBitacoraArchivo',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('accion', models.CharField(max_length=50)),
+                ('descripcion', models.TextField()),
+                ('modulo', models.CharField(blank=True, max_length=50, null=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('fecha_hora', models.DateTimeField()),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='registros_bitacora_archivados', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Registro de Bitácora archivado',
+                'verbose_name_plural': 'Registros de Bitácora archivados',
+                'ordering': ['-fecha_hora', '-id'],
+            },
+        ),
+        migrations.AlterModelOptions(
+            name='registrobitacora',
+            options={'ordering': ['-fecha_hora', '-id'], 'verbose_name': 'Registro de Bitácora', 'verbose_name_plural': 'Registros de Bitácora'},
+        ),
+        migrations.RemoveIndex(
+            model_name='registrobitacora',
+            name='administrac_fecha_h_e48afe_idx',
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacora',
+            index=models.Index(fields=['-fecha_hora', '-id'], name='bitacora_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacora',
+            index=models.Index(fields=['usuario', '-fecha_hora', '-id'], name='bitacora_usuario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacora',
+            index=models.Index(fields=['modulo', '-fecha_hora', '-id'], name='bitacora_modulo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacora',
+            index=models.Index(fields=['accion', '-fecha_hora', '-id'], name='bitacora_accion_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacoraarchivo',
+            index=models.Index(fields=['-fecha_hora', '-id'], name='bitacora_arch_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacoraarchivo',
+            index=models.Index(fields=['usuario', '-fecha_hora', '-id'], name='bitacora_arch_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacoraarchivo',
+            index=models.Index(fields=['modulo', '-fecha_hora', '-id'], name='bitacora_arch_modulo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrobitacoraarchivo',
+            index=models.Index(fields=['accion', '-fecha_hora', '-id'], name='bitacora_arch_accion_idx'),
+        ),
+    ]
@@ -9,7 +9,8 @@ class RegistroBitacora(models.Model):
     descripcion = models.TextField()
     modulo = models.CharField(max_length=50, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    fecha_hora = models.DateTimeField(auto_now_add=True)
+    # default y no auto_now_add: la entrada lleva la hora del request aunque se guarde después
+    fecha_hora = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
         usuario_str = self.usuario.username if self.usuario else "Sistema"
@@ -20,9 +21,41 @@ class RegistroBitacora(models.Model):
     class Meta:
         verbose_name = 'Registro de Bitácora'
         verbose_name_plural = 'Registros de Bitácora'
-        ordering = ['-fecha_hora']
+        ordering = ['-fecha_hora', '-id']
+        # Paginación por (fecha_hora, id) y filtros del visor de bitácora
         indexes = [
-            models.Index(fields=['-fecha_hora']),
+            models.Index(fields=['-fecha_hora', '-id'], name='bitacora_fecha_id_idx'),
+            models.Index(fields=['usuario', '-fecha_hora', '-id'], name='bitacora_usuario_fecha_idx'),
+            models.Index(fields=['modulo', '-fecha_hora', '-id'], name='bitacora_modulo_fecha_idx'),
+            models.Index(fields=['accion', '-fecha_hora', '-id'], name='bitacora_accion_fecha_idx'),
+        ]
+
+
+class RegistroBitacoraArchivo(models.Model):
+    """
+    Registros de bitácora más viejos que BITACORA_RETENCION_DIAS, movidos
+    por el comando archivar_bitacora. Conservan el id original.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='registros_bitacora_archivados')
+    accion = models.CharField(max_length=50)
+    descripcion = models.TextField()
+    modulo = models.CharField(max_length=50, null=True, blank=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    fecha_hora = models.DateTimeField()
+
+    def __str__(self):
+        return f'[archivado {self.fecha_hora:%Y-%m-%d}] {self.accion} en {self.modulo or "N/A"}'
+
+    class Meta:
+        verbose_name = 'Registro de Bitácora archivado'
+        verbose_name_plural = 'Registros de Bitácora archivados'
+        ordering = ['-fecha_hora', '-id']
+        indexes = [
+            models.Index(fields=['-fecha_hora', '-id'], name='bitacora_arch_fecha_id_idx'),
+            models.Index(fields=['usuario', '-fecha_hora', '-id'], name='bitacora_arch_usuario_idx'),
+            models.Index(fields=['modulo', '-fecha_hora', '-id'], name='bitacora_arch_modulo_idx'),
+            models.Index(fields=['accion', '-fecha_hora', '-id'], name='bitacora_arch_accion_idx'),
         ]
 
 class Departamento(models.Model):
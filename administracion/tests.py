@@ -1,3 +1,229 @@
-from django.test import TestCase
+import glob
+import io
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from administracion.core.bitacora import BufferBitacora
+from administracion.core.metricas import huella, registro_metricas
+from administracion.models import Cliente, RegistroBitacora, RegistroBitacoraArchivo
+
+
+@override_settings(METRICAS_MUESTREO=1.0, METRICAS_TOKEN='secreto')
+class MetricasMiddlewareTests(TestCase):
+    """
+    Con muestreo activo cada request lleva Server-Timing y sus consultas se
+    acumulan por vista en /api/_metrics.
+    """
+
+    def setUp(self):
+        registro_metricas.reiniciar()
+
+    def test_huella_ignora_largo_de_listas(self):
+        uno, _ = huella('SELECT * FROM t WHERE id IN (%s)')
+        tres, _ = huella('SELECT *  FROM t\n WHERE id IN (%s, %s, %s)')
+        self.assertEqual(uno, tres)
+
+    def test_server_timing_y_prometheus(self):
+        Cliente.objects.create(nombre='Cliente Métricas')
+
+        response = self.client.get('/api/administracion/clientes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('consultas', response['Server-Timing'])
+
+        metricas = self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(metricas.status_code, 200)
+        self.assertTrue(metricas['Content-Type'].startswith('text/plain'))
+        texto = metricas.content.decode()
+        self.assertIn('smartsales_request_duration_seconds_count{view="cliente-list",method="GET"} 1', texto)
+        self.assertIn('smartsales_request_queries_total{view="cliente-list",method="GET"}', texto)
+
+    def test_token_requerido(self):
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 401)
+        self.assertEqual(self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer otro').status_code, 401)
+        response = self.client.get('/api/_metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICAS_TOKEN='')
+    def test_sin_token_no_se_publica(self):
+        response = self.client.get('/api/administracion/clientes/')
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 404)
+
+    @override_settings(METRICAS_MUESTREO=0.0)
+    def test_desactivado(self):
+        response = self.client.get('/api/administracion/clientes/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get('/api/_metrics').status_code, 404)
+
+
+class BufferBitacoraTests(TestCase):
+    """
+    Las entradas se encolan al confirmarse la transacción, se guardan por
+    lotes con su hora original y, si la base falla, pasan por el respaldo.
+    """
+
+    def setUp(self):
+        directorio = tempfile.mkdtemp()
+        self.respaldo = os.path.join(directorio, 'bitacora.jsonl')
+        self.buffer = BufferBitacora(lote=10, respaldo=self.respaldo, hilo=False)
+
+    def test_encola_al_confirmar_y_guarda_por_lote(self):
+        hace_un_rato = timezone.now() - timedelta(minutes=5)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                self.buffer.agregar(accion=f'ACCION {i}', descripcion='prueba', fecha_hora=hace_un_rato)
+            self.assertEqual(self.buffer.vaciar(), 0)
+
+        self.assertEqual(RegistroBitacora.objects.count(), 0)
+        self.assertEqual(self.buffer.vaciar(), 3)
+        self.assertEqual(RegistroBitacora.objects.filter(fecha_hora=hace_un_rato).count(), 3)
+
+    def test_respaldo_si_falla_la_base(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.agregar(accion='LOGIN', descripcion='prueba', modulo='Autenticacion')
+
+        gestor = RegistroBitacora.objects
+        with mock.patch.object(type(gestor), 'bulk_create', side_effect=DatabaseError), \
+                mock.patch.object(type(gestor), 'create', side_effect=DatabaseError):
+            self.buffer.vaciar()
+        self.assertTrue(os.path.exists(self.respaldo))
+        self.assertEqual(RegistroBitacora.objects.count(), 0)
+
+        self.assertEqual(self.buffer.recuperar(), 1)
+        self.assertFalse(os.path.exists(self.respaldo))
+        self.assertEqual(RegistroBitacora.objects.get().accion, 'LOGIN')
+
+
+    def test_diario_sobrevive_a_una_caida(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.agregar(accion='LOGIN', descripcion='uno')
+            self.buffer.agregar(accion='LOGOUT', descripcion='dos')
+
+        # El proceso muere sin vaciar la cola: solo queda el diario
+        self.buffer._diario.close()
+        nuevo = BufferBitacora(lote=10, respaldo=self.respaldo, hilo=False)
+        self.assertEqual(nuevo.recuperar(), 2)
+        self.assertCountEqual(RegistroBitacora.objects.values_list('accion', flat=True), ['LOGIN', 'LOGOUT'])
+        self.assertEqual(glob.glob(glob.escape(nuevo.prefijo_diario) + '*'), [])
+
+    def test_diario_se_borra_al_guardar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.agregar(accion='LOGIN', descripcion='prueba')
+        self.assertEqual(self.buffer.vaciar(), 1)
+        self.buffer.detener()
+        self.assertEqual(glob.glob(glob.escape(self.buffer.prefijo_diario) + '*'), [])
+        self.assertEqual(self.buffer.recuperar(), 0)
+
+    def test_recuperar_saltea_lineas_cortadas(self):
+        with open(self.respaldo, 'w', encoding='utf-8') as archivo:
+            archivo.write('{"accion": "LOGIN", "descripcion": "ok", "fecha_hora": "2024-05-01T10:00:00+00:00"}\n')
+            archivo.write('{"accion": "LOGOUT", "descri\n')
+        with self.assertLogs('administracion.core.bitacora', 'ERROR'):
+            self.assertEqual(self.buffer.recuperar(), 1)
+        self.assertEqual(RegistroBitacora.objects.get().accion, 'LOGIN')
+
+    @override_settings(BITACORA_MAX_INTENTOS=2)
+    def test_entrada_rechazada_se_descarta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.agregar(accion='LOGIN', descripcion='prueba')
+        gestor = RegistroBitacora.objects
+        with mock.patch.object(type(gestor), 'bulk_create', side_effect=DatabaseError), \
+                mock.patch.object(type(gestor), 'create', side_effect=DatabaseError), \
+                self.assertLogs('administracion.core.bitacora', 'ERROR'):
+            self.buffer.vaciar()
+            self.assertEqual(self.buffer.recuperar(), 1)
+        self.assertFalse(os.path.exists(self.respaldo))
+
+    def test_usuario_borrado_se_guarda_sin_usuario(self):
+        gestor = RegistroBitacora.objects
+        crear = gestor.create
+
+        def create(**campos):
+            if campos.get('usuario_id') is not None:
+                raise IntegrityError('usuario inexistente')
+            return crear(**campos)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.buffer.agregar(accion='LOGIN', descripcion='prueba', usuario_id=999)
+        with mock.patch.object(type(gestor), 'bulk_create', side_effect=IntegrityError), \
+                mock.patch.object(type(gestor), 'create', side_effect=create):
+            self.buffer.vaciar()
+        self.assertIsNone(RegistroBitacora.objects.get().usuario_id)
+        self.assertFalse(os.path.exists(self.respaldo))
+
+    def test_un_error_no_detiene_el_hilo(self):
+        def falla():
+            self.buffer._detenido.set()
+            self.buffer._despertar.set()
+            raise RuntimeError('falla')
+
+        with mock.patch.object(self.buffer, 'vaciar', side_effect=falla), \
+                mock.patch('administracion.core.bitacora.connections'), \
+                self.assertLogs('administracion.core.bitacora', 'ERROR'):
+            self.buffer._bucle()
+
+
+class RegistroBitacoraViewSetTests(TestCase):
+    """
+    El visor pagina por (fecha_hora, id) sin saltear ni repetir filas, aun
+    con horas iguales, y lee el archivo después de archivar_bitacora.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        ahora = timezone.now()
+        RegistroBitacora.objects.bulk_create([
+            RegistroBitacora(
+                accion='LOGIN',
+                descripcion=f'entrada {i}',
+                modulo='Autenticacion' if i % 2 else 'Ventas',
+                # Pares de filas con la misma hora
+                fecha_hora=ahora - timedelta(minutes=i // 2),
+            )
+            for i in range(7)
+        ])
+        RegistroBitacora.objects.create(
+            accion='LOGIN', descripcion='vieja', modulo='Ventas', fecha_hora=ahora - timedelta(days=400),
+        )
+
+    def _todas(self, url):
+        ids, cursor = [], None
+        while True:
+            response = self.client.get(url, {'limit': 3, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            ids.extend(fila['id'] for fila in response.json())
+            cursor = response.get('X-Next-Cursor')
+            if not cursor:
+                return ids
+
+    def test_paginacion_por_cursor(self):
+        esperado = list(RegistroBitacora.objects.order_by('-fecha_hora', '-id').values_list('id', flat=True))
+        self.assertEqual(self._todas('/api/administracion/bitacoras/'), esperado)
+
+    def test_cursor_visible_desde_otro_origen(self):
+        response = self.client.get('/api/administracion/bitacoras/', {'limit': 3}, HTTP_ORIGIN='http://localhost:5173')
+        self.assertTrue(response.get('X-Next-Cursor'))
+        self.assertIn('X-Next-Cursor', response['Access-Control-Expose-Headers'])
+
+    def test_filtros_y_cursor_invalido(self):
+        response = self.client.get('/api/administracion/bitacoras/', {'modulo': 'Autenticacion'})
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(self.client.get('/api/administracion/bitacoras/', {'cursor': 'xx'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/administracion/bitacoras/', {'desde': '2024-13-01'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/administracion/bitacoras/', {'usuario': 'abc'}).status_code, 400)
+
+    def test_archivar(self):
+        call_command('archivar_bitacora', '--dias', '30', '--lote', '1', stdout=io.StringIO())
+
+        self.assertFalse(RegistroBitacora.objects.filter(descripcion='vieja').exists())
+        archivados = self.client.get('/api/administracion/bitacoras/', {'archivados': '1'}).json()
+        self.assertEqual([fila['descripcion'] for fila in archivados], ['vieja'])
+        self.assertEqual(len(self._todas('/api/administracion/bitacoras/')), 7)
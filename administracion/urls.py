@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (LogoutView, CustomTokenObtainPairView, RegisterView, ProfileView, ChangePasswordView, MiClienteView, CambiarContrasenaView)
+from .views import metricas_prometheus
 from .views import UserViewSet, RoleViewSet, PermissionViewSet, ClienteViewSet, CiudadViewSet, DepartamentoViewSet, RegistroBitacoraViewSet
 from rest_framework_simplejwt.views import (TokenRefreshView, )
 
@@ -24,4 +25,5 @@ urlpatterns = [
     path('change-password/', ChangePasswordView.as_view(), name='change_password'),
     path('administracion/mi-cliente/', MiClienteView.as_view(), name='mi_cliente'),
     path('administracion/cambiar-contrasena/', CambiarContrasenaView.as_view(), name='cambiar_contrasena'),
+    path('_metrics', metricas_prometheus, name='metricas'),
 ]
@@ -6,9 +6,17 @@ from django.contrib.auth.models import User, Group, Permission
 from .serializers.serializers_usuario import UserSerializer
 from .serializers.serializers_rol import RoleSerializer, PermissionSerializer
 from .serializers.serializers_cliente import ClienteSerializer, CiudadSerializer, DepartamentoSerializer
-from administracion.models import Departamento, Ciudad, Cliente, RegistroBitacora
+from administracion.models import Departamento, Ciudad, Cliente, RegistroBitacora, RegistroBitacoraArchivo
 from .serializers.serializers_bitacora import RegistroBitacoraSerializer
 from .core.utils import registrar_bitacora
+from .core.metricas import registro_metricas
+from .core.paginacion import CursorInvalido, pagina_keyset
+from datetime import date, datetime, time, timedelta
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from django.utils.crypto import constant_time_compare
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt 
 from rest_framework.views import APIView
@@ -768,15 +776,95 @@ class ClienteViewSet(viewsets.ModelViewSet):
         )
 
 class RegistroBitacoraViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = RegistroBitacora.objects.select_related('usuario').order_by('-fecha_hora')
+    """
+    Visor de bitácora, paginado por (fecha_hora, id).
+    Filtros: ?usuario=<id>&modulo=&accion=&desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+    ?archivados=1 consulta los registros movidos por archivar_bitacora.
+    ?limit= filas por página (máx. 1000); la siguiente página se pide con
+    ?cursor=<valor del header X-Next-Cursor> (expuesto por CORS_EXPOSE_HEADERS).
+    """
+    queryset = RegistroBitacora.objects.select_related('usuario')
     serializer_class = RegistroBitacoraSerializer
-    
+    LIMITE = 500
+    LIMITE_MAXIMO = 1000
+
     def get_queryset(self):
-        """Optimizar consulta y limitar resultados"""
-        queryset = super().get_queryset()
-        
-        # Limitar a los últimos 500 registros por defecto
-        limit = int(self.request.query_params.get('limit', 500))
-        queryset = queryset[:limit]
-        
-        return queryset
+        """Tabla viva o archivo, con los filtros que cubren los índices"""
+        params = self.request.query_params
+        if params.get('archivados', '').lower() in ('1', 'true', 'si'):
+            queryset = RegistroBitacoraArchivo.objects.select_related('usuario')
+        else:
+            queryset = super().get_queryset()
+
+        usuario = self._usuario_param()
+        if usuario:
+            queryset = queryset.filter(usuario_id=usuario)
+        for campo in ('modulo', 'accion'):
+            valor = params.get(campo)
+            if valor:
+                queryset = queryset.filter(**{campo: valor})
+
+        # Límites de día completos en la zona horaria local (usan el índice)
+        desde = self._fecha_param('desde')
+        if desde:
+            queryset = queryset.filter(fecha_hora__gte=desde)
+        hasta = self._fecha_param('hasta')
+        if hasta:
+            queryset = queryset.filter(fecha_hora__lt=hasta + timedelta(days=1))
+        return queryset.order_by('-fecha_hora', '-id')
+
+    def _usuario_param(self):
+        valor = self.request.query_params.get('usuario')
+        if not valor:
+            return None
+        try:
+            return int(valor)
+        except ValueError:
+            raise ValidationError({'usuario': 'Debe ser el id numérico del usuario.'})
+
+    def _fecha_param(self, nombre):
+        valor = self.request.query_params.get(nombre)
+        if not valor:
+            return None
+        try:
+            return timezone.make_aware(datetime.combine(date.fromisoformat(valor), time.min))
+        except ValueError:
+            raise ValidationError({nombre: 'Use el formato AAAA-MM-DD.'})
+
+    def list(self, request, *args, **kwargs):
+        try:
+            limite = int(request.query_params.get('limit', self.LIMITE))
+        except ValueError:
+            return Response({'error': 'limit debe ser un número entero.'}, status=status.HTTP_400_BAD_REQUEST)
+        limite = max(1, min(limite, self.LIMITE_MAXIMO))
+
+        try:
+            filas, siguiente = pagina_keyset(self.get_queryset(), limite, request.query_params.get('cursor'))
+        except CursorInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = Response(self.get_serializer(filas, many=True).data)
+        if siguiente:
+            response['X-Next-Cursor'] = siguiente
+        return response
+
+
+# ==================== MÉTRICAS ====================
+
+def metricas_prometheus(request):
+    """
+    Métricas de requests en formato de texto de Prometheus.
+    Ruta: GET /api/_metrics
+    Solo existe con METRICAS_MUESTREO > 0 y METRICAS_TOKEN definido (sin
+    token no se publica: expone latencias y SQL por ruta), y exige el
+    header Authorization: Bearer <token>.
+    """
+    token = settings.METRICAS_TOKEN
+    if settings.METRICAS_MUESTREO <= 0 or not token:
+        raise Http404
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        registro_metricas.prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
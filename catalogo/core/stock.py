@@ -0,0 +1,365 @@
+"""
+Mantenimiento de los contadores de stock desnormalizados de Catalogo.
+
+Los contadores (stock_disponible, stock_reservado, stock_vendido) se ajustan
+con UPDATE ... SET campo = campo + delta dentro de la misma transacción que
+cambia el estado de los Producto, así nunca se lee-modifica-escribe en Python.
+
+Esos cambios de estado se hacen con UPDATE y no disparan post_save: quien
+necesite enterarse (p. ej. la caché de reportes) escucha stock_modificado,
+que se envía cada vez que se ajustan los contadores.
+"""
+from collections import Counter, defaultdict
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When, Window
+from django.db.models.functions import Greatest, RowNumber
+from django.dispatch import Signal
+from django.utils import timezone
+
+from catalogo.models import Catalogo, Producto
+
+# Unidades que cambiaron de estado. Argumento: deltas (ver ajustar_contadores)
+stock_modificado = Signal()
+
+
+class StockInsuficiente(Exception):
+    """
+    No hay unidades suficientes para reservar todas las líneas.
+    `reporte` trae el detalle por línea (ver _reporte).
+    """
+    def __init__(self, reporte):
+        self.reporte = reporte
+        self.faltantes = [linea for linea in reporte if linea['faltante']]
+        super().__init__('Stock insuficiente para reservar la venta')
+
+
+# Estado de Producto -> contador en Catalogo.
+# 'en_reparacion' y 'dado_de_baja' no tienen contador propio.
+CONTADORES_POR_ESTADO = {
+    'disponible': 'stock_disponible',
+    'reservado': 'stock_reservado',
+    'vendido': 'stock_vendido',
+}
+
+
+def ajustar_contadores(deltas):
+    """
+    Aplica deltas a los contadores en un solo UPDATE.
+    deltas: {catalogo_id: {'disponible': -2, 'vendido': 2, ...}}
+    """
+    if any(delta for cambios in deltas.values() for delta in cambios.values()):
+        stock_modificado.send(sender=Producto, deltas=deltas)
+
+    por_campo = defaultdict(dict)
+    for catalogo_id, cambios in deltas.items():
+        for estado, delta in cambios.items():
+            campo = CONTADORES_POR_ESTADO.get(estado)
+            if campo and delta:
+                por_campo[campo][catalogo_id] = por_campo[campo].get(catalogo_id, 0) + delta
+
+    if not por_campo:
+        return
+
+    actualizaciones = {}
+    ids = set()
+    for campo, valores in por_campo.items():
+        ids.update(valores)
+        delta = Case(
+            *[When(pk=catalogo_id, then=Value(valor)) for catalogo_id, valor in valores.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        # Greatest evita que un desfase previo deje el contador negativo;
+        # reconcile_stock se encarga de reportar y corregir la deriva.
+        actualizaciones[campo] = Greatest(F(campo) + delta, Value(0))
+
+    Catalogo.objects.filter(pk__in=ids).update(**actualizaciones)
+
+
+def registrar_transicion(catalogo_id, estado_anterior, estado_nuevo, cantidad=1,
+                         catalogo_anterior_id=None):
+    """
+    Registra que `cantidad` unidades pasaron de un estado a otro.
+    Si la unidad cambió de catálogo se indica con catalogo_anterior_id.
+    Usar estado_anterior=None para altas y estado_nuevo=None para bajas.
+    """
+    catalogo_anterior_id = catalogo_anterior_id or catalogo_id
+    if estado_anterior == estado_nuevo and catalogo_anterior_id == catalogo_id:
+        return
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    if estado_anterior:
+        deltas[catalogo_anterior_id][estado_anterior] -= cantidad
+    if estado_nuevo:
+        deltas[catalogo_id][estado_nuevo] += cantidad
+    ajustar_contadores(deltas)
+
+
+def _mover_unidades_fifo(lineas, estado_origen, estado_destino, valores):
+    """
+    Pasa hasta `cantidad` unidades por catálogo de estado_origen a estado_destino,
+    las más antiguas primero (fecha_ingreso), en una sola sentencia.
+    lineas: {catalogo_id: cantidad}; valores: {columna: valor} extra a escribir.
+    Debe llamarse dentro de una transacción. Retorna Counter {catalogo_id: movidas}.
+    """
+    lineas = {c: n for c, n in lineas.items() if n > 0}
+    if not lineas:
+        return Counter()
+
+    if connection.vendor == 'postgresql':
+        # Un único UPDATE sobre un SELECT ... FOR UPDATE SKIP LOCKED por línea
+        # (LATERAL): dos confirmaciones concurrentes nunca toman la misma unidad
+        # y ninguna espera a la otra; lo que una tenga bloqueado, la otra lo salta.
+        qn = connection.ops.quote_name
+        tabla = qn(Producto._meta.db_table)
+        col_catalogo = qn(Producto._meta.get_field('catalogo').column)
+        columnas = {'estado': estado_destino}
+        columnas.update(valores)
+        asignaciones = ', '.join(f'{qn(col)} = %s' for col in columnas)
+        sql = f"""
+            WITH lineas AS (
+                SELECT * FROM unnest(%s::bigint[], %s::integer[]) AS l(catalogo_id, cantidad)
+            ), seleccion AS (
+                SELECT u.id FROM lineas l
+                CROSS JOIN LATERAL (
+                    SELECT p.id FROM {tabla} p
+                    WHERE p.{col_catalogo} = l.catalogo_id AND p.estado = %s
+                    ORDER BY p.fecha_ingreso, p.id
+                    LIMIT l.cantidad
+                    FOR UPDATE SKIP LOCKED
+                ) u
+            )
+            UPDATE {tabla} p SET {asignaciones}
+            FROM seleccion s
+            WHERE p.id = s.id AND p.estado = %s
+            RETURNING p.{col_catalogo}
+        """
+        params = [list(lineas), list(lineas.values()), estado_origen,
+                  *columnas.values(), estado_origen]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return Counter(fila[0] for fila in cursor.fetchall())
+
+    # Resto de motores (SQLite en desarrollo/tests): un SELECT con ROW_NUMBER()
+    # por catálogo para elegir las unidades y un UPDATE por id.
+    limite = Case(
+        *[When(catalogo_id=c, then=Value(n)) for c, n in lineas.items()],
+        output_field=IntegerField(),
+    )
+    elegidas = list(
+        Producto.objects.filter(catalogo_id__in=lineas, estado=estado_origen)
+        .annotate(
+            fila=Window(RowNumber(), partition_by=[F('catalogo_id')],
+                        order_by=[F('fecha_ingreso').asc(), F('id').asc()]),
+            limite=limite,
+        )
+        .filter(fila__lte=F('limite'))
+        .values_list('id', 'catalogo_id')
+    )
+    if not elegidas:
+        return Counter()
+    campos = {'estado': estado_destino}
+    campos.update(valores)
+    Producto.objects.filter(pk__in=[pk for pk, _ in elegidas], estado=estado_origen).update(**campos)
+    return Counter(catalogo_id for _, catalogo_id in elegidas)
+
+
+def _reporte(lineas, movidas, clave):
+    return [
+        {
+            'catalogo_id': catalogo_id,
+            'solicitado': cantidad,
+            clave: movidas.get(catalogo_id, 0),
+            'faltante': max(cantidad - movidas.get(catalogo_id, 0), 0),
+        }
+        for catalogo_id, cantidad in lineas.items()
+    ]
+
+
+def _mover_por_filtro(productos, estado_destino, valores, skip_locked=False, limite=None):
+    """
+    Pasa a estado_destino las unidades del queryset (bloqueándolas primero,
+    hasta `limite` filas) y retorna {catalogo_id: {estado: delta}} para
+    ajustar contadores.
+    """
+    filas = (
+        productos.select_for_update(skip_locked=skip_locked)
+        .order_by().values_list('id', 'catalogo_id', 'estado')
+    )
+    filas = list(filas[:limite] if limite else filas)
+    if not filas:
+        return {}
+    campos = {'estado': estado_destino}
+    campos.update(valores)
+    Producto.objects.filter(pk__in=[pk for pk, _, _ in filas]).update(**campos)
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for _, catalogo_id, estado in filas:
+        deltas[catalogo_id][estado] -= 1
+        deltas[catalogo_id][estado_destino] += 1
+    return deltas
+
+
+def marcar_vendidos(lineas, fecha_venta=None, venta_id=None):
+    """
+    Marca como 'vendido' las unidades disponibles más antiguas de cada línea
+    y ajusta los contadores. lineas: {catalogo_id: cantidad}.
+    Retorna un reporte por línea: [{'catalogo_id', 'solicitado', 'vendido', 'faltante'}]
+    """
+    fecha_venta = fecha_venta or timezone.now()
+    valores = {'fecha_venta': fecha_venta}
+    if venta_id:
+        valores['venta_id'] = venta_id
+    with transaction.atomic():
+        movidas = _mover_unidades_fifo(lineas, 'disponible', 'vendido', valores)
+        ajustar_contadores({c: {'disponible': -n, 'vendido': n} for c, n in movidas.items()})
+    return _reporte(lineas, movidas, 'vendido')
+
+
+def recalcular_contadores(catalogo_ids=None, aplicar=True, lote=1000):
+    """
+    Recalcula los contadores desde la tabla de Producto con un COUNT agrupado
+    por lote de catálogos y corrige solo las filas con deriva.
+
+    Cada lote bloquea primero sus filas de Catalogo: una transición concurrente
+    o ya está contada en Producto, o todavía no aplicó su delta (espera el lock),
+    así que el valor escrito nunca pisa un ajuste en curso.
+
+    Retorna la lista de diferencias: [{'catalogo_id', 'campo', 'guardado', 'real'}]
+    """
+    ids = Catalogo.objects.order_by('pk').values_list('pk', flat=True)
+    if catalogo_ids is not None:
+        ids = ids.filter(pk__in=catalogo_ids)
+    ids = list(ids)
+
+    campos = list(CONTADORES_POR_ESTADO.values())
+    diferencias = []
+    for inicio in range(0, len(ids), lote):
+        ids_lote = ids[inicio:inicio + lote]
+        with transaction.atomic():
+            catalogos = list(
+                Catalogo.objects.select_for_update().filter(pk__in=ids_lote).only('id', *campos)
+            )
+            reales = defaultdict(dict)
+            conteos = (
+                Producto.objects.filter(catalogo_id__in=ids_lote, estado__in=CONTADORES_POR_ESTADO)
+                .values('catalogo_id', 'estado').annotate(total=Count('id')).order_by()
+            )
+            for fila in conteos:
+                reales[fila['catalogo_id']][fila['estado']] = fila['total']
+
+            a_corregir = []
+            for catalogo in catalogos:
+                modificado = False
+                for estado, campo in CONTADORES_POR_ESTADO.items():
+                    real = reales[catalogo.id].get(estado, 0)
+                    guardado = getattr(catalogo, campo)
+                    if guardado != real:
+                        diferencias.append({
+                            'catalogo_id': catalogo.id,
+                            'campo': campo,
+                            'guardado': guardado,
+                            'real': real,
+                        })
+                        setattr(catalogo, campo, real)
+                        modificado = True
+                if modificado:
+                    a_corregir.append(catalogo)
+
+            if aplicar and a_corregir:
+                Catalogo.objects.bulk_update(a_corregir, campos, batch_size=500)
+
+    return diferencias
+
+
+# ============================================
+# RESERVAS ENTRE CHECKOUT Y PAGO
+# ============================================
+
+def reservar_unidades(venta_id, lineas, minutos=None):
+    """
+    Reserva para la venta las unidades disponibles más antiguas de cada línea
+    hasta ahora + `minutos` (STOCK_RESERVA_MINUTOS por defecto).
+
+    Es todo o nada: si alguna línea no alcanza lanza StockInsuficiente y, como
+    corre dentro de la transacción del checkout, no queda nada reservado.
+    Solo se bloquean las filas de Producto elegidas (SKIP LOCKED), así que
+    checkouts concurrentes de otros productos, o del mismo con stock de sobra,
+    no se esperan entre sí.
+    """
+    minutos = minutos if minutos is not None else settings.STOCK_RESERVA_MINUTOS
+    vence = timezone.now() + timedelta(minutes=minutos)
+    with transaction.atomic():
+        movidas = _mover_unidades_fifo(
+            lineas, 'disponible', 'reservado',
+            {'venta_id': venta_id, 'reservado_hasta': vence},
+        )
+        reporte = _reporte(lineas, movidas, 'reservado')
+        if any(linea['faltante'] for linea in reporte):
+            raise StockInsuficiente(reporte)
+        ajustar_contadores({c: {'disponible': -n, 'reservado': n} for c, n in movidas.items()})
+    return reporte
+
+
+def confirmar_venta(venta_id, lineas, fecha_venta=None):
+    """
+    Convierte en 'vendido' las unidades reservadas por la venta y, si la reserva
+    venció y fue liberada (total o parcialmente), completa lo que falte con
+    unidades disponibles. lineas: {catalogo_id: cantidad}.
+    Retorna el reporte por línea: [{'catalogo_id', 'solicitado', 'vendido', 'faltante'}]
+    """
+    fecha_venta = fecha_venta or timezone.now()
+    with transaction.atomic():
+        deltas = _mover_por_filtro(
+            Producto.objects.filter(venta_id=venta_id, estado='reservado'),
+            'vendido', {'fecha_venta': fecha_venta, 'reservado_hasta': None},
+        )
+        ajustar_contadores(deltas)
+        confirmadas = Counter({c: cambios['vendido'] for c, cambios in deltas.items()})
+
+        pendientes = {c: n - confirmadas.get(c, 0) for c, n in lineas.items()}
+        reporte = marcar_vendidos(pendientes, fecha_venta=fecha_venta, venta_id=venta_id)
+
+    vendidas = Counter({linea['catalogo_id']: linea['vendido'] for linea in reporte}) + confirmadas
+    return _reporte(lineas, vendidas, 'vendido')
+
+
+def liberar_reserva(venta_id):
+    """
+    Devuelve a 'disponible' las unidades que la venta tenga reservadas
+    (venta cancelada). Retorna la cantidad liberada.
+    """
+    with transaction.atomic():
+        deltas = _mover_por_filtro(
+            Producto.objects.filter(venta_id=venta_id, estado='reservado'),
+            'disponible', {'venta_id': None, 'reservado_hasta': None},
+        )
+        ajustar_contadores(deltas)
+    return sum(cambios['disponible'] for cambios in deltas.values())
+
+
+def liberar_reservas_vencidas(ahora=None, lote=5000):
+    """
+    Barrido periódico: libera en lotes las reservas con reservado_hasta vencido.
+    Salta las filas bloqueadas (una confirmación de pago en curso) en vez de esperarlas.
+    Retorna la cantidad de unidades liberadas.
+    """
+    ahora = ahora or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            deltas = _mover_por_filtro(
+                Producto.objects.filter(estado='reservado', reservado_hasta__lt=ahora),
+                'disponible', {'venta_id': None, 'reservado_hasta': None},
+                skip_locked=True, limite=lote,
+            )
+            ajustar_contadores(deltas)
+        liberadas = sum(cambios['disponible'] for cambios in deltas.values())
+        total += liberadas
+        if liberadas < lote:
+            break
+    return total
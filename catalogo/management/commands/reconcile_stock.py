@@ -0,0 +1,57 @@
+# catalogo/management/commands/reconcile_stock.py
+from django.core.management.base import BaseCommand
+
+from catalogo.core.stock import recalcular_contadores
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los contadores de stock de Catalogo desde Producto y reporta la deriva encontrada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo reporta la deriva, sin corregir los contadores.',
+        )
+        parser.add_argument(
+            '--catalogo',
+            type=int,
+            action='append',
+            dest='catalogos',
+            help='ID de catálogo a reconciliar (se puede repetir). Por defecto, todos.',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=1000,
+            help='Cantidad de catálogos procesados por transacción.',
+        )
+
+    def handle(self, *args, **options):
+        aplicar = not options['dry_run']
+        self.stdout.write("Reconciliando contadores de stock...")
+
+        diferencias = recalcular_contadores(
+            catalogo_ids=options['catalogos'],
+            aplicar=aplicar,
+            lote=options['lote'],
+        )
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS("Sin deriva: todos los contadores coinciden."))
+            return
+
+        for d in diferencias:
+            self.stdout.write(
+                f"Catálogo #{d['catalogo_id']} {d['campo']}: guardado={d['guardado']} real={d['real']}"
+            )
+
+        catalogos = len({d['catalogo_id'] for d in diferencias})
+        if aplicar:
+            self.stdout.write(self.style.SUCCESS(
+                f"Se corrigieron {len(diferencias)} contadores en {catalogos} catálogos."
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Deriva en {len(diferencias)} contadores de {catalogos} catálogos (dry-run, sin cambios)."
+            ))
@@ -0,0 +1,36 @@
+# catalogo/management/commands/release_expired_reservations.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from catalogo.core.stock import liberar_reservas_vencidas
+
+
+class Command(BaseCommand):
+    help = 'Libera las reservas de stock vencidas (Producto reservado -> disponible). Pensado para cron o como proceso periódico.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Unidades liberadas por transacción.',
+        )
+        parser.add_argument(
+            '--cada',
+            type=int,
+            default=0,
+            help='Si se indica, repite el barrido cada N segundos en vez de terminar.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            liberadas = liberar_reservas_vencidas(lote=options['lote'])
+            if liberadas:
+                self.stdout.write(self.style.SUCCESS(f"Se liberaron {liberadas} unidades con reserva vencida."))
+            elif not options['cada']:
+                self.stdout.write("No hay reservas vencidas.")
+
+            if not options['cada']:
+                break
+            time.sleep(options['cada'])
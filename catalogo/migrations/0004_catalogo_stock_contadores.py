@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_contadores(apps, schema_editor):
+    Catalogo = apps.get_model('catalogo', 'Catalogo')
+    Producto = apps.get_model('catalogo', 'Producto')
+    campos = {
+        'disponible': 'stock_disponible',
+        'reservado': 'stock_reservado',
+        'vendido': 'stock_vendido',
+    }
+
+    conteos = {}
+    for fila in (
+        Producto.objects.filter(estado__in=campos)
+        .values('catalogo_id', 'estado').annotate(total=Count('id')).order_by()
+    ):
+        conteos.setdefault(fila['catalogo_id'], {})[fila['estado']] = fila['total']
+
+    catalogos = []
+    for catalogo in Catalogo.objects.filter(pk__in=conteos).only('id'):
+        for estado, campo in campos.items():
+            setattr(catalogo, campo, conteos[catalogo.id].get(estado, 0))
+        catalogos.append(catalogo)
+    Catalogo.objects.bulk_update(catalogos, list(campos.values()), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0003_alter_producto_estado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogo',
+            name='stock_disponible',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='catalogo',
+            name='stock_reservado',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='catalogo',
+            name='stock_vendido',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
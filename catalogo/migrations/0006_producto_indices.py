@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0005_producto_reserva'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(estado='disponible'), fields=['catalogo', 'fecha_ingreso', 'id'], name='producto_disponible_fifo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['catalogo', 'estado'], name='producto_catalogo_estado_idx'),
+        ),
+    ]
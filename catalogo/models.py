@@ -25,6 +25,16 @@ class Categoria(models.Model):
         verbose_name_plural = 'Categorías'
         ordering = ['nombre']
 
+class CatalogoQuerySet(models.QuerySet):
+    def para_serializar(self):
+        """
+        Todo lo que necesita CatalogoSerializer (marca y categoría; el stock
+        ya viene en la fila) en una sola consulta. Usar también en los
+        Prefetch de carrito y ventas.
+        """
+        return self.select_related('marca', 'categoria')
+
+
 class Catalogo(models.Model):
     CHOICE_ESTADO = {
         ('activo', 'Activo'),
@@ -42,12 +52,30 @@ class Catalogo(models.Model):
     estado = models.CharField(max_length=15, choices=CHOICE_ESTADO, default='activo')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    # Contadores desnormalizados de unidades (Producto) por estado.
+    # Se mantienen con catalogo.core.stock; reconcile_stock los reconstruye.
+    stock_disponible = models.PositiveIntegerField(default=0)
+    stock_reservado = models.PositiveIntegerField(default=0)
+    stock_vendido = models.PositiveIntegerField(default=0)
+
+    CAMPOS_STOCK = ('stock_disponible', 'stock_reservado', 'stock_vendido')
+
+    objects = CatalogoQuerySet.as_manager()
+
     def __str__(self):
         return f'{self.nombre} ({self.sku})'
-    
-    @property
-    def stock_disponible(self):
-        return self.productos.filter(estado='disponible').count()
+
+    def save(self, *args, **kwargs):
+        """
+        Al editar un catálogo existente no se reescriben los contadores de stock:
+        solo cambian con UPDATE atómicos y el valor en memoria puede estar viejo.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.CAMPOS_STOCK
+            ]
+        super().save(*args, **kwargs)
 
     class Meta:
         verbose_name = 'Catálogo de Producto'
@@ -68,6 +96,10 @@ class Producto(models.Model):
     fecha_ingreso = models.DateTimeField(auto_now_add=True) 
     catalogo = models.ForeignKey(Catalogo, on_delete=models.CASCADE, related_name='productos', db_column='Catalogo_id')
     fecha_venta = models.DateTimeField(null=True, blank=True)
+    # Venta que reservó (checkout) o compró la unidad. Mientras está 'reservado',
+    # reservado_hasta indica cuándo la libera release_expired_reservations.
+    venta = models.ForeignKey('ventas.Venta', on_delete=models.SET_NULL, null=True, blank=True, related_name='productos')
+    reservado_hasta = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return f'N/S: {self.numero_serie} - {self.catalogo.nombre}'
@@ -99,3 +131,21 @@ class Producto(models.Model):
         verbose_name = 'Ítem de Producto (Serializado)'
         verbose_name_plural = 'Ítems de Productos (Serializados)'
         ordering = ['-fecha_ingreso']
+        indexes = [
+            # Solo las reservas vivas: el barrido de vencidas no recorre el histórico
+            models.Index(
+                fields=['reservado_hasta'],
+                condition=models.Q(estado='reservado'),
+                name='producto_reserva_vence_idx',
+            ),
+            # Selección FIFO de unidades disponibles por catálogo (reservas y
+            # confirmación de ventas): ORDER BY fecha_ingreso, id sin ordenar
+            # en memoria y sin tocar las unidades ya vendidas.
+            models.Index(
+                fields=['catalogo', 'fecha_ingreso', 'id'],
+                condition=models.Q(estado='disponible'),
+                name='producto_disponible_fifo_idx',
+            ),
+            # Conteos por (catálogo, estado) de reconcile_stock
+            models.Index(fields=['catalogo', 'estado'], name='producto_catalogo_estado_idx'),
+        ]
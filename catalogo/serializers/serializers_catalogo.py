@@ -16,8 +16,6 @@ class CatalogoSerializer(serializers.ModelSerializer):
     categoria = CategoriaSerializer(read_only=True)
     marca_id = serializers.PrimaryKeyRelatedField(queryset=Marca.objects.all(), source='marca', write_only=True, allow_null=True, required=False)
     categoria_id = serializers.PrimaryKeyRelatedField(queryset=Categoria.objects.all(), source='categoria', write_only=True, allow_null=True, required=False)
-    
-    stock_disponible = serializers.SerializerMethodField()
 
     class Meta:
         model = Catalogo
@@ -26,6 +24,3 @@ class CatalogoSerializer(serializers.ModelSerializer):
                 'meses_garantia', 'modelo', 'marca', 'categoria', 'estado',
                 'stock_disponible', 'fecha_creacion', 'marca_id', 'categoria_id']
         read_only_fields = ['fecha_creacion', 'marca', 'categoria', 'stock_disponible'] 
-
-    def get_stock_disponible(self, obj):
-        return obj.stock_disponible
@@ -5,6 +5,8 @@ from catalogo.serializers.serializers_catalogo import CatalogoSerializer, MarcaS
 from .models import Catalogo, Marca, Categoria, Producto
 from catalogo.serializers.serializers_producto import ProductoSerializer
 from administracion.core.utils import registrar_bitacora
+from catalogo.core.stock import registrar_transicion
+from django.db import transaction
 import requests
 from django.conf import settings
 from rest_framework import viewsets, filters
@@ -96,7 +98,7 @@ class CatalogoViewSet(viewsets.ModelViewSet):
     API endpoint principal para gestionar el Catálogo (Productos).
     Incluye subida de imágenes a ImgBB y registro en Bitácora.
     """
-    queryset = Catalogo.objects.all().order_by('-fecha_creacion')
+    queryset = Catalogo.objects.para_serializar().order_by('-fecha_creacion')
     serializer_class = CatalogoSerializer
 
     filter_backends = [filters.SearchFilter]
@@ -237,7 +239,7 @@ class ProductoViewSet(viewsets.ModelViewSet):
     """
     API endpoint para gestionar el Inventario Físico (Producto).
     """
-    queryset = Producto.objects.all().order_by('-fecha_ingreso')
+    queryset = Producto.objects.select_related('catalogo').order_by('-fecha_ingreso')
     serializer_class = ProductoSerializer
     # (Aquí puedes añadir filtros para 'catalogo_id' si lo necesitas)
     # filter_backends = [DjangoFilterBackend]
@@ -249,7 +251,10 @@ class ProductoViewSet(viewsets.ModelViewSet):
         # --- CORREGIDO ---
         # Simplemente llamamos a save(). El serializador ya sabe qué hacer
         # con 'catalogo_id' gracias al 'source'.
-        instance = serializer.save() 
+        # El alta y el ajuste del contador de stock van en la misma transacción.
+        with transaction.atomic():
+            instance = serializer.save()
+            registrar_transicion(instance.catalogo_id, None, instance.estado)
         
         # Obtenemos info para la bitácora
         # --- CORREGIDO --- (usamos 'catalogo' en minúscula)
@@ -267,9 +272,20 @@ class ProductoViewSet(viewsets.ModelViewSet):
         """Actualizar item de inventario y registrar en bitácora"""
         instance_orig = self.get_object()
         costo_orig = instance_orig.costo
-        estado_orig = instance_orig.estado
-        
-        instance = serializer.save()
+
+        with transaction.atomic():
+            # Releemos estado y catálogo con bloqueo: el contador se ajusta
+            # contra el valor real, no contra uno leído antes de otra venta.
+            estado_orig, catalogo_orig_id = (
+                Producto.objects.select_for_update()
+                .values_list('estado', 'catalogo_id')
+                .get(pk=instance_orig.pk)
+            )
+            instance = serializer.save()
+            registrar_transicion(
+                instance.catalogo_id, estado_orig, instance.estado,
+                catalogo_anterior_id=catalogo_orig_id,
+            )
 
         cambios = []
         if instance.costo != costo_orig:
@@ -300,7 +316,14 @@ class ProductoViewSet(viewsets.ModelViewSet):
         # --- CORREGIDO --- (confirmamos 'catalogo' en minúscula)
         catalogo_nombre = instance.catalogo.nombre if instance.catalogo else 'N/A'
         
-        instance.delete()
+        with transaction.atomic():
+            estado_orig, catalogo_orig_id = (
+                Producto.objects.select_for_update()
+                .values_list('estado', 'catalogo_id')
+                .get(pk=instance.pk)
+            )
+            instance.delete()
+            registrar_transicion(catalogo_orig_id, estado_orig, None)
         
         registrar_bitacora(
             request=self.request,
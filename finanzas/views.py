@@ -33,44 +33,62 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 def actualizar_stock_productos(venta):
     """
     Actualiza el stock de productos cuando se completa una venta.
-    Marca productos como 'vendido' según la cantidad vendida.
+    Convierte en 'vendido' las unidades que la venta reservó en el checkout y,
+    si la reserva venció, completa con las disponibles más antiguas en una
+    sola operación (ver catalogo.core.stock.confirmar_venta). Los contadores
+    del catálogo se ajustan en la misma transacción.
+
+    Retorna el reporte por línea: [{'catalogo_id', 'solicitado', 'vendido', 'faltante'}]
     """
-    from catalogo.models import Producto
+    from django.db.models import Sum
+    from catalogo.core.stock import confirmar_venta
     
     try:
-        # Iterar sobre los detalles de la venta
-        for detalle in venta.detalles.all():
-            catalogo = detalle.catalogo
-            cantidad_vendida = detalle.cantidad
-            
-            logger.info(f"📦 Actualizando stock: {catalogo.nombre} - Cantidad: {cantidad_vendida}")
-            
-            # Obtener productos disponibles del catálogo
-            productos_disponibles = Producto.objects.filter(
-                catalogo=catalogo,
-                estado='disponible'
-            ).order_by('fecha_ingreso')[:cantidad_vendida]
-            
-            # Marcar productos como vendidos
-            productos_actualizados = 0
-            fecha_actual = timezone.now()
-            
-            for producto in productos_disponibles:
-                producto.estado = 'vendido'
-                producto.fecha_venta = fecha_actual
-                producto.save(update_fields=['estado', 'fecha_venta'])
-                productos_actualizados += 1
-                logger.info(f"✅ Producto {producto.numero_serie} marcado como vendido")
-            
-            if productos_actualizados < cantidad_vendida:
-                logger.warning(f"⚠️ Solo se pudieron marcar {productos_actualizados}/{cantidad_vendida} productos como vendidos para {catalogo.nombre}")
-            else:
-                logger.info(f"✅ Stock actualizado: {productos_actualizados} productos de {catalogo.nombre} marcados como vendidos")
+        # Una fila por catálogo aunque la venta repita productos en varias líneas
+        lineas = {
+            fila['catalogo_id']: fila['cantidad']
+            for fila in venta.detalles.values('catalogo_id').annotate(cantidad=Sum('cantidad')).order_by()
+        }
+        reporte = confirmar_venta(venta.id, lineas)
+        
+        vendidas = sum(linea['vendido'] for linea in reporte)
+        logger.info(f"📦 Stock actualizado para venta #{venta.id}: {vendidas} unidades marcadas como vendidas")
+        for linea in reporte:
+            if linea['faltante']:
+                logger.warning(
+                    f"⚠️ Venta #{venta.id}: solo se pudieron marcar {linea['vendido']}/{linea['solicitado']} "
+                    f"unidades del catálogo #{linea['catalogo_id']}"
+                )
+        return reporte
                 
     except Exception as e:
         logger.error(f"❌ Error al actualizar stock: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
+        return []
+
+
+def completar_pago(pago):
+    """
+    Marca el pago como completado y su venta como completada.
+    El stock se confirma solo si la venta cambia de estado en esta llamada:
+    la fila de la Venta queda bloqueada, así dos confirmaciones simultáneas
+    del mismo pago no venden las unidades dos veces.
+    """
+    from django.db import transaction
+    
+    with transaction.atomic():
+        pago.estado = 'completado'
+        pago.save(update_fields=['estado'])
+        
+        venta = Venta.objects.select_for_update().get(pk=pago.venta_id)
+        if venta.estado != 'completada':
+            venta.estado = 'completada'
+            venta.save(update_fields=['estado', 'actualizado_en'])
+            logger.info(f"✅ Venta #{venta.id} marcada como completada")
+            
+            # Reservas -> vendido (y disponibles si la reserva venció)
+            actualizar_stock_productos(venta)
 
 
 # ============================================
@@ -297,18 +315,8 @@ class ConfirmPaymentAutoVenta(APIView):
             if status_pi == "succeeded":
                 pago = Pago.objects.filter(transaccion_id=pi_id).first()
                 if pago:
-                    pago.estado = 'completado'
-                    pago.save(update_fields=['estado'])
-                    
-                    # Actualizar estado de la venta
-                    if pago.venta:
-                        pago.venta.estado = 'completada'
-                        pago.venta.save(update_fields=['estado'])
-                        logger.info(f"✅ Venta #{pago.venta.id} marcada como completada")
-                        
-                        # Actualizar stock de productos (marcar como vendidos)
-                        actualizar_stock_productos(pago.venta)
-                    
+                    # Pago y venta completados; las unidades reservadas pasan a vendido
+                    completar_pago(pago)
                     logger.info(f"✅ Pago #{pago.id} marcado como completado")
             
             return Response({
@@ -441,18 +449,8 @@ class ConfirmPaymentWithCardVenta(APIView):
             if status_pi == "succeeded":
                 pago = Pago.objects.filter(transaccion_id=pi_id).first()
                 if pago:
-                    pago.estado = 'completado'
-                    pago.save(update_fields=['estado'])
-                    
-                    # Actualizar estado de la venta
-                    if pago.venta:
-                        pago.venta.estado = 'completada'
-                        pago.venta.save(update_fields=['estado'])
-                        logger.info(f"✅ Venta #{pago.venta.id} marcada como completada")
-                        
-                        # Actualizar stock de productos (marcar como vendidos)
-                        actualizar_stock_productos(pago.venta)
-                    
+                    # Pago y venta completados; las unidades reservadas pasan a vendido
+                    completar_pago(pago)
                     logger.info(f"✅ Pago #{pago.id} marcado como completado")
             
             return Response({
@@ -523,17 +521,8 @@ class VerifyPaymentIntentVenta(APIView):
             
             # Si el pago fue exitoso, actualizar
             if status_pi == "succeeded" and pago.estado != 'completado':
-                pago.estado = 'completado'
-                pago.save(update_fields=['estado'])
-                
-                # Actualizar estado de la venta
-                if pago.venta and pago.venta.estado != 'completada':
-                    pago.venta.estado = 'completada'
-                    pago.venta.save(update_fields=['estado'])
-                    logger.info(f"✅ Venta #{pago.venta.id} marcada como completada")
-                    
-                    # Actualizar stock de productos (marcar como vendidos)
-                    actualizar_stock_productos(pago.venta)
+                # Pago y venta completados; las unidades reservadas pasan a vendido
+                completar_pago(pago)
                 
                 logger.info(f"✅ Pago #{pago.id} confirmado exitosamente")
             
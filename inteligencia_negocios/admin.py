@@ -1,3 +1,15 @@
 from django.contrib import admin
+from inteligencia_negocios.models import ReporteEstandar, TrabajoReporte
 
-# Register your models here.
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ['id', 'formato', 'estado', 'usuario', 'creado_en', 'terminado_en']
+    list_filter = ['estado', 'formato']
+    readonly_fields = ['id', 'spec', 'huella', 'creado_en', 'iniciado_en', 'terminado_en', 'intentos']
+
+
+@admin.register(ReporteEstandar)
+class ReporteEstandarAdmin(admin.ModelAdmin):
+    list_display = ['clave', 'formato', 'generado_en', 'nombre_archivo']
+    readonly_fields = ['clave', 'huella', 'formato', 'version', 'archivo', 'nombre_archivo', 'etag', 'generado_en']
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class InteligenciaNegociosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inteligencia_negocios'
+
+    def ready(self):
+        from inteligencia_negocios import signals  # noqa: F401
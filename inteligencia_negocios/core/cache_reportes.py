@@ -0,0 +1,253 @@
+"""
+Caché de resultados de reportes.
+
+La clave es la huella del pedido canónico (core.trabajos.canonizar) sin el
+formato: el mismo pedido en PDF o en Excel comparte las filas. Las filas y
+el archivo ya generado (CSV, XLSX, PDF) se guardan en entradas separadas;
+así un formato nuevo no repite la consulta, y el archivo repetido no se
+vuelve a generar.
+
+Cada clave lleva la versión de los datos que cubre el reporte: un contador
+por mes de ventas ('ventas:2024-09'), uno para las ventas de todo el
+historial, uno de inventario y uno de los datos maestros (catálogo,
+clientes). Las señales incrementan los contadores tocados al confirmar la
+transacción; una entrada con versión vieja no se vuelve a leer y expira
+sola. Los cambios de estado de stock (catalogo.core.stock) llegan por
+stock_modificado. Las demás escrituras masivas (bulk_create, update) no
+disparan señales: ahí el TTL acota el atraso.
+
+El TTL depende de la antigüedad del período: los meses cerrados duran mucho
+(REPORTES_CACHE_TTL_HISTORICO), el día de hoy poco (REPORTES_CACHE_TTL_HOY)
+y el resto, incluido el inventario, un tiempo intermedio.
+"""
+import logging
+import threading
+import time
+from datetime import date
+from itertools import chain, islice
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .datos import DatosReporte, obtener_datos
+from .trabajos import canonizar, huella
+
+logger = logging.getLogger(__name__)
+
+PREFIJO = 'reportes'
+
+# Contadores de versión
+MAESTROS = 'maestros'
+INVENTARIO = 'inventario'
+VENTAS = 'ventas'
+# Toda venta cuyo mes no se conoce sin consultar la base (p. ej. un detalle
+# guardado sin su venta cargada): invalida los reportes de todos los meses
+TODAS_LAS_VENTAS = 'ventas:todas'
+
+
+def _cache():
+    return caches[settings.REPORTES_CACHE_ALIAS]
+
+
+def contador_mes(año, mes):
+    return f'{VENTAS}:{año:04d}-{mes:02d}'
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def periodo(filtros):
+    """
+    Período de ventas que cubren los filtros: (meses, dia). meses es la
+    lista de (año, mes) o None si el reporte abarca todo el historial; dia
+    es la fecha si el filtro es un día puntual.
+    """
+    dia = mes = año = None
+    for campo, valor in filtros.items():
+        if campo.endswith('fecha__date'):
+            dia = _fecha(valor)
+        elif campo.endswith('fecha__month'):
+            mes = int(valor)
+        elif campo.endswith('fecha__year'):
+            año = int(valor)
+    if dia is not None:
+        return [(dia.year, dia.month)], dia
+    if año is not None and mes is not None:
+        return [(año, mes)], None
+    if año is not None:
+        return [(año, m) for m in range(1, 13)], None
+    return None, None
+
+
+class ClaveReporte:
+    """
+    Claves de caché y TTL de un pedido. La versión de los datos se lee al
+    crearla, antes de consultar: si una venta entra mientras se arma el
+    reporte, el resultado queda guardado con la versión vieja y no se usa.
+    """
+
+    def __init__(self, parsed_request):
+        spec = canonizar(parsed_request)
+        self.formato = spec.pop('format')
+        self.huella = huella(spec)
+
+        if spec['type'] == 'ventas':
+            meses, dia = periodo(spec['filters'])
+            if meses is None:
+                contadores = [MAESTROS, VENTAS, TODAS_LAS_VENTAS]
+            else:
+                contadores = [MAESTROS, TODAS_LAS_VENTAS, *(contador_mes(año, mes) for año, mes in meses)]
+            self.ttl = self._ttl_ventas(meses, dia)
+        else:
+            contadores = [MAESTROS, INVENTARIO]
+            self.ttl = settings.REPORTES_CACHE_TTL_RECIENTE
+        self.version = versiones(contadores)
+
+    @staticmethod
+    def _ttl_ventas(meses, dia):
+        hoy = timezone.localdate()
+        if dia is not None and dia >= hoy:
+            return settings.REPORTES_CACHE_TTL_HOY
+        if meses is not None and all((año, mes) < (hoy.year, hoy.month) for año, mes in meses):
+            return settings.REPORTES_CACHE_TTL_HISTORICO
+        return settings.REPORTES_CACHE_TTL_RECIENTE
+
+    @property
+    def activa(self):
+        return self.ttl > 0
+
+    @property
+    def filas(self):
+        return f'{PREFIJO}:filas:{self.huella}:{self.version}'
+
+    def artefacto(self, formato):
+        return f'{PREFIJO}:artefacto:{formato}:{self.huella}:{self.version}'
+
+
+# ==================== VERSIONES ====================
+
+def _clave_contador(nombre):
+    return f'{PREFIJO}:version:{nombre}'
+
+
+def _valor_inicial():
+    # Si un contador se pierde (caché reiniciada o expulsión), el nuevo valor
+    # no coincide con ninguno anterior y no resucita entradas viejas
+    return time.time_ns() // 1000
+
+
+def versiones(contadores):
+    """Versión combinada de los contadores (los que falten se crean)."""
+    cache = _cache()
+    claves = [_clave_contador(nombre) for nombre in contadores]
+    valores = cache.get_many(claves)
+    for clave in claves:
+        if clave not in valores:
+            cache.add(clave, _valor_inicial(), None)
+            valores[clave] = cache.get(clave, 0)
+    return huella([valores[clave] for clave in claves])[:16]
+
+
+def _incrementar(contadores):
+    cache = _cache()
+    for nombre in contadores:
+        clave = _clave_contador(nombre)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, _valor_inicial(), None)
+
+
+_pendientes = threading.local()
+
+
+def _incrementar_pendientes():
+    contadores = getattr(_pendientes, 'contadores', set())
+    _pendientes.contadores = set()
+    if not contadores:
+        return
+    try:
+        _incrementar(contadores)
+    except Exception as e:
+        logger.error(f"❌ No se pudo invalidar la caché de reportes {sorted(contadores)}: {e}")
+
+
+def invalidar(*contadores):
+    """
+    Invalida los contadores al confirmar la transacción (en el acto si no
+    hay una abierta). Antes no hace falta: un reporte armado mientras tanto
+    tomó la versión vieja (ver ClaveReporte) y queda descartado al
+    incrementarla. Todos los cambios de la transacción se juntan y se
+    incrementan una sola vez, sin tocar la caché en cada save.
+    """
+    if not hasattr(_pendientes, 'contadores'):
+        _pendientes.contadores = set()
+    _pendientes.contadores.update(contadores)
+    transaction.on_commit(_incrementar_pendientes)
+
+
+def invalidar_venta(fecha):
+    """Invalida los reportes que cubren el mes (local) de `fecha`."""
+    if fecha is None:
+        invalidar(VENTAS, TODAS_LAS_VENTAS)
+        return
+    dia = timezone.localtime(fecha).date()
+    invalidar(VENTAS, contador_mes(dia.year, dia.month))
+
+
+# ==================== FILAS Y ARTEFACTOS ====================
+
+def obtener_datos_cacheados(clave, parsed_request):
+    """
+    Igual que core.datos.obtener_datos, pero las filas de reportes de hasta
+    REPORTES_CACHE_MAX_FILAS filas se guardan y se reutilizan. Los más
+    grandes se leen siempre por bloques de la base, sin guardarlos.
+    """
+    if not clave.activa:
+        return obtener_datos(parsed_request)
+
+    cache = _cache()
+    entrada = cache.get(clave.filas)
+    if entrada is not None:
+        return DatosReporte(entrada['titulo'], entrada['columnas'], entrada['filas'])
+
+    datos = obtener_datos(parsed_request)
+    maximo = settings.REPORTES_CACHE_MAX_FILAS
+    filas = list(islice(datos, maximo + 1))
+    if len(filas) > maximo:
+        return DatosReporte(datos.titulo, datos.columnas, chain(filas, datos))
+
+    cache.set(clave.filas, {'titulo': datos.titulo, 'columnas': datos.columnas, 'filas': filas}, clave.ttl)
+    return DatosReporte(datos.titulo, datos.columnas, filas)
+
+
+def leer_artefacto(clave, formato):
+    """Bytes del archivo ya generado, o None."""
+    if not clave.activa:
+        return None
+    return _cache().get(clave.artefacto(formato))
+
+
+def guardar_artefacto(clave, formato, contenido):
+    if clave.activa and len(contenido) <= settings.REPORTES_CACHE_MAX_BYTES:
+        _cache().set(clave.artefacto(formato), contenido, clave.ttl)
+
+
+def guardando(clave, formato, partes):
+    """
+    Deja pasar las partes (str) de un archivo generado en streaming y, si al
+    terminar no superó REPORTES_CACHE_MAX_BYTES, lo guarda como artefacto.
+    """
+    acumuladas, tamaño = [], 0
+    for parte in partes:
+        yield parte
+        if acumuladas is not None:
+            acumuladas.append(parte)
+            tamaño += len(parte)
+            if not clave.activa or tamaño > settings.REPORTES_CACHE_MAX_BYTES:
+                acumuladas = None
+    if acumuladas is not None:
+        guardar_artefacto(clave, formato, ''.join(acumuladas).encode('utf-8'))
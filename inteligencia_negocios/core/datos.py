@@ -0,0 +1,197 @@
+"""
+Origen de datos de los reportes.
+
+obtener_datos(parsed_request) arma la consulta del reporte pedido y devuelve
+un DatosReporte: título, nombres de columna y un iterador de tuplas leído
+por bloques (.iterator(chunk_size)), de modo que los escritores (CSV, XLSX,
+PDF, JSON) nunca necesitan tener todas las filas en memoria a la vez.
+
+Con REPORTES_MOTOR_COLUMNAR los reportes de ventas agrupados se resuelven
+primero con core.motor (en memoria, sin consultar la base); lo que el motor
+no resuelve, o si falla, va por el ORM.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from catalogo.models import Producto
+from ventas.models import Venta, DetalleVenta
+
+from .motor import motor_analitico
+
+logger = logging.getLogger(__name__)
+
+# Filas leídas por viaje a la base
+CHUNK_SIZE = 2000
+
+_FIN = object()
+
+
+class TipoReporteInvalido(ValueError):
+    """El 'type' del reporte no es 'ventas' ni 'inventario'."""
+
+
+class DatosReporte:
+    """
+    Resultado de un reporte: titulo, columnas y las filas como tuplas en el
+    orden de columnas. Las filas se pueden recorrer una sola vez.
+    """
+
+    def __init__(self, titulo, columnas, filas):
+        self.titulo = titulo
+        self.columnas = list(columnas)
+        self._filas = iter(filas)
+        # Se lee la primera fila para saber si el reporte está vacío
+        self._primera = next(self._filas, _FIN)
+
+    @property
+    def vacio(self):
+        return self._primera is _FIN
+
+    def __iter__(self):
+        if self._primera is not _FIN:
+            primera, self._primera = self._primera, _FIN
+            yield primera
+        yield from self._filas
+
+    def como_dicts(self):
+        for fila in self:
+            yield dict(zip(self.columnas, fila))
+
+
+def _tuplas(queryset, columnas, chunk_size):
+    for fila in queryset.values(*columnas).iterator(chunk_size=chunk_size):
+        yield tuple(fila[columna] for columna in columnas)
+
+
+def _agrupado(queryset, campo, chunk_size, **agregados):
+    """GROUP BY campo con los agregados, ordenado por el último de mayor a menor."""
+    orden = list(agregados)[-1]
+    queryset = queryset.values(campo).annotate(**agregados).order_by(f'-{orden}')
+    columnas = [campo, *agregados]
+    return columnas, (tuple(fila[c] for c in columnas) for fila in queryset.iterator(chunk_size=chunk_size))
+
+
+# ==================== INVENTARIO ====================
+
+def _garantia_vigente(fila):
+    if fila['estado'] == 'vendido' and fila['fecha_venta']:
+        return timezone.now() <= fila['fecha_venta'] + timedelta(days=fila['catalogo__meses_garantia'] * 30)
+    return False
+
+
+def _fecha_fin_garantia(fila):
+    if fila['fecha_venta']:
+        return fila['fecha_venta'] + timedelta(days=fila['catalogo__meses_garantia'] * 30)
+    return None
+
+
+# select_field -> (columna de salida, campos a leer, cálculo). Las propiedades
+# de Producto se calculan desde columnas, sin instanciar el modelo.
+COLUMNAS_INVENTARIO = {
+    'catalogo__nombre': ('nombre', ['catalogo__nombre'], None),
+    'catalogo__precio': ('precio', ['catalogo__precio'], None),
+    'garantia_vigente': (
+        'garantia_vigente', ['estado', 'fecha_venta', 'catalogo__meses_garantia'], _garantia_vigente,
+    ),
+    'fecha_fin_garantia': ('fecha_fin_garantia', ['fecha_venta', 'catalogo__meses_garantia'], _fecha_fin_garantia),
+}
+_CAMPOS_PRODUCTO = {campo.name for campo in Producto._meta.concrete_fields} | {'id'}
+
+
+def _columna_inventario(nombre):
+    if nombre in COLUMNAS_INVENTARIO:
+        return COLUMNAS_INVENTARIO[nombre]
+    if nombre in _CAMPOS_PRODUCTO:
+        return nombre, [nombre], None
+    # Campo que no existe en Producto (p. ej. 'total'): columna vacía
+    return nombre, [], lambda fila: None
+
+
+def _inventario_detallado(queryset, campos, chunk_size):
+    especificaciones = [_columna_inventario(nombre) for nombre in campos]
+    leer = list(dict.fromkeys(c for _, leidos, _ in especificaciones for c in leidos))
+    columnas = [salida for salida, _, _ in especificaciones]
+
+    def filas():
+        if leer:
+            iterador = queryset.values(*leer).iterator(chunk_size=chunk_size)
+        else:
+            iterador = ({} for _ in queryset.values_list('id', flat=True).iterator(chunk_size=chunk_size))
+        for fila in iterador:
+            yield tuple(
+                calculo(fila) if calculo else fila[leidos[0]]
+                for _, leidos, calculo in especificaciones
+            )
+
+    return columnas, filas()
+
+
+# ==================== ORIGEN ====================
+
+def _desde_motor(parsed_request):
+    if not settings.REPORTES_MOTOR_COLUMNAR:
+        return None
+    try:
+        return motor_analitico.consultar(parsed_request)
+    except Exception as e:
+        logger.error(f"❌ Error en el motor analítico, se usa el ORM: {e}")
+        return None
+
+
+def obtener_datos(parsed_request, chunk_size=CHUNK_SIZE):
+    """Arma y ejecuta la consulta del reporte pedido."""
+    tipo = parsed_request['type']
+    filtros = parsed_request.get('filters') or {}
+    group_by = parsed_request.get('group_by')
+    campos = parsed_request.get('select_fields') or []
+
+    if tipo == 'inventario':
+        queryset = Producto.objects.filter(**filtros)
+        if group_by == 'categoria':
+            columnas, filas = _agrupado(queryset, 'catalogo__categoria__nombre', chunk_size, total_items=Count('id'))
+            return DatosReporte("Inventario por Categoría", columnas, filas)
+        if group_by == 'marca':
+            columnas, filas = _agrupado(queryset, 'catalogo__marca__nombre', chunk_size, total_items=Count('id'))
+            return DatosReporte("Inventario por Marca", columnas, filas)
+        columnas, filas = _inventario_detallado(queryset, campos, chunk_size)
+        return DatosReporte("Reporte de Inventario", columnas, filas)
+
+    if tipo == 'ventas':
+        resultado = _desde_motor(parsed_request)
+
+        if group_by == 'cliente':
+            if resultado is not None:
+                return DatosReporte("Reporte de Ventas por Cliente", *resultado)
+            queryset = (
+                Venta.objects.filter(**filtros)
+                .values('cliente__nombre', 'cliente__nit_ci')
+                .annotate(cantidad_compras=Count('id'), monto_total=Sum('total'))
+                .order_by('-monto_total')
+            )
+            columnas = ['cliente__nombre', 'cliente__nit_ci', 'cantidad_compras', 'monto_total']
+            filas = (tuple(fila[c] for c in columnas) for fila in queryset.iterator(chunk_size=chunk_size))
+            return DatosReporte("Reporte de Ventas por Cliente", columnas, filas)
+
+        agrupaciones = {
+            'producto': ("Reporte de Ventas por Producto", 'catalogo__nombre'),
+            'categoria': ("Reporte de Ventas por Categoría", 'catalogo__categoria__nombre'),
+            'marca': ("Reporte de Ventas por Marca", 'catalogo__marca__nombre'),
+        }
+        if group_by in agrupaciones:
+            titulo, campo = agrupaciones[group_by]
+            if resultado is not None:
+                return DatosReporte(titulo, *resultado)
+            columnas, filas = _agrupado(
+                DetalleVenta.objects.filter(**filtros), campo, chunk_size,
+                cantidad_unidades=Sum('cantidad'), monto_total=Sum('total'),
+            )
+            return DatosReporte(titulo, columnas, filas)
+
+        # Listado simple de ventas
+        return DatosReporte("Listado de Ventas", campos, _tuplas(Venta.objects.filter(**filtros), campos, chunk_size))
+
+    raise TipoReporteInvalido(tipo)
@@ -0,0 +1,226 @@
+"""
+Escritores de reportes: convierten un DatosReporte en JSON, CSV, XLSX o PDF.
+
+Todos recorren las filas una sola vez sin acumularlas: el CSV se genera
+línea por línea para un StreamingHttpResponse, el XLSX usa el modo
+write-only de openpyxl, que vuelca cada fila a disco a medida que llega, y
+el PDF se dibuja de a una página (tabla de tamaño fijo) por vez.
+"""
+import csv
+import datetime
+import json
+from itertools import islice
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from openpyxl import Workbook
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'csv': 'text/csv; charset=utf-8',
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+EXTENSIONES = {'json': 'json', 'csv': 'csv', 'excel': 'xlsx', 'pdf': 'pdf'}
+
+# PDF: filas por página (A4 apaisado), alto de fila, márgenes y fuente en puntos
+PDF_FILAS_POR_PAGINA = 40
+PDF_ALTO_FILA = 12
+PDF_MARGEN = 30
+PDF_FUENTE_TAMANO = 7
+PDF_RELLENO = 3
+
+
+def _texto(valor):
+    """Valor de celda como texto (CSV)."""
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime.datetime):
+        if timezone.is_aware(valor):
+            valor = timezone.localtime(valor)
+        return valor.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()
+    return str(valor)
+
+
+def _celda_excel(valor):
+    """Excel no admite zonas horarias: las fechas van en hora local."""
+    if isinstance(valor, datetime.datetime) and timezone.is_aware(valor):
+        return timezone.localtime(valor).replace(tzinfo=None)
+    if isinstance(valor, Decimal):
+        return float(valor)
+    return valor
+
+
+class _Linea:
+    """Destino de csv.writer que devuelve lo escrito en vez de guardarlo."""
+
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(datos):
+    """Genera el CSV línea por línea (con BOM para que Excel detecte UTF-8)."""
+    writer = csv.writer(_Linea())
+    yield '\ufeff' + writer.writerow(datos.columnas)
+    for fila in datos:
+        yield writer.writerow([_texto(valor) for valor in fila])
+
+
+def escribir_json(datos, archivo):
+    """Escribe {"report_data": [...]} en el archivo (binario), fila por fila."""
+    archivo.write(b'{"report_data": [')
+    for i, fila in enumerate(datos.como_dicts()):
+        if i:
+            archivo.write(b', ')
+        archivo.write(json.dumps(fila, cls=DjangoJSONEncoder).encode())
+    archivo.write(b']}')
+
+
+def escribir_csv(datos, archivo):
+    """Escribe el CSV en el archivo (binario)."""
+    for linea in lineas_csv(datos):
+        archivo.write(linea.encode('utf-8'))
+
+
+def escribir_xlsx(datos, archivo):
+    """Escribe el XLSX en el archivo (binario) con un workbook write-only."""
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(title=datos.titulo[:31])
+    hoja.append(datos.columnas)
+    for fila in datos:
+        hoja.append([_celda_excel(valor) for valor in fila])
+    libro.save(archivo)
+
+
+def _formateador(muestra):
+    """
+    Conversión a texto de una columna del PDF, elegida una sola vez según el
+    tipo del primer valor no nulo de la muestra.
+    """
+    if isinstance(muestra, datetime.datetime):
+        def formato(valor):
+            if timezone.is_aware(valor):
+                valor = timezone.localtime(valor)
+            return valor.strftime('%Y-%m-%d')
+    elif isinstance(muestra, datetime.date):
+        def formato(valor):
+            return valor.strftime('%Y-%m-%d')
+    elif isinstance(muestra, bool):
+        def formato(valor):
+            return 'Sí' if valor else 'No'
+    elif isinstance(muestra, str):
+        def formato(valor):
+            return valor
+    else:
+        formato = str
+
+    def formatear(valor):
+        return 'N/A' if valor is None else formato(valor)
+    return formatear
+
+
+def _recortador(ancho):
+    """Corta el texto que no entra en una columna de `ancho` puntos."""
+    maximo = max(int((ancho - 2 * PDF_RELLENO) / (PDF_FUENTE_TAMANO * 0.5)), 1)
+
+    def recortar(texto):
+        return texto if len(texto) <= maximo else texto[:maximo - 1] + '…'
+    return recortar
+
+
+def _anchos_pdf(encabezados, muestra, disponible):
+    """Ancho de cada columna según la muestra, escalado al ancho de la página."""
+    anchos = []
+    for i, encabezado in enumerate(encabezados):
+        textos = [encabezado] + [fila[i] for fila in muestra]
+        natural = max(stringWidth(texto, 'Helvetica-Bold', PDF_FUENTE_TAMANO) for texto in textos)
+        anchos.append(natural + 2 * PDF_RELLENO)
+    total = sum(anchos)
+    if total > disponible:
+        anchos = [ancho * disponible / total for ancho in anchos]
+    return anchos
+
+
+_ESTILO_PDF = TableStyle([
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), PDF_FUENTE_TAMANO),
+    ('LEFTPADDING', (0, 0), (-1, -1), PDF_RELLENO),
+    ('RIGHTPADDING', (0, 0), (-1, -1), PDF_RELLENO),
+    ('TOPPADDING', (0, 0), (-1, -1), 1),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+])
+
+
+def escribir_pdf(datos, archivo):
+    """
+    Escribe el PDF página por página: cada página es una tabla de
+    PDF_FILAS_POR_PAGINA filas (con el encabezado repetido) que se dibuja
+    directamente en el canvas, así nunca hay en memoria más de una página de
+    celdas y reportlab no tiene que partir una tabla gigante.
+    """
+    ancho_pagina, alto_pagina = landscape(A4)
+    disponible = ancho_pagina - 2 * PDF_MARGEN
+    lienzo = canvas.Canvas(archivo, pagesize=(ancho_pagina, alto_pagina))
+    lienzo.setTitle(datos.titulo)
+
+    filas = iter(datos)
+    pagina = list(islice(filas, PDF_FILAS_POR_PAGINA))
+
+    # Formato y anchos se deciden con la primera página y valen para todas
+    formateadores = []
+    for i in range(len(datos.columnas)):
+        muestra = next((fila[i] for fila in pagina if fila[i] is not None), None)
+        formateadores.append(_formateador(muestra))
+    encabezados = [str(columna) for columna in datos.columnas]
+    muestra = [[formatear(valor) for formatear, valor in zip(formateadores, fila)] for fila in pagina]
+    anchos = _anchos_pdf(encabezados, muestra, disponible)
+    recortadores = [_recortador(ancho) for ancho in anchos]
+    encabezados = [recortar(texto) for recortar, texto in zip(recortadores, encabezados)]
+    columnas = list(zip(formateadores, recortadores))
+
+    numero = 1
+    while pagina:
+        celdas = [encabezados]
+        for fila in pagina:
+            celdas.append([recortar(formatear(valor)) for (formatear, recortar), valor in zip(columnas, fila)])
+        tabla = Table(celdas, colWidths=anchos, rowHeights=PDF_ALTO_FILA)
+        tabla.setStyle(_ESTILO_PDF)
+
+        lienzo.setFont('Helvetica-Bold', 14)
+        lienzo.drawString(PDF_MARGEN, alto_pagina - PDF_MARGEN - 14, datos.titulo)
+        lienzo.setFont('Helvetica', 8)
+        lienzo.drawRightString(ancho_pagina - PDF_MARGEN, PDF_MARGEN / 2, f'Página {numero}')
+        _, alto_tabla = tabla.wrapOn(lienzo, disponible, alto_pagina)
+        tabla.drawOn(lienzo, PDF_MARGEN, alto_pagina - PDF_MARGEN - 24 - alto_tabla)
+        lienzo.showPage()
+
+        pagina = list(islice(filas, PDF_FILAS_POR_PAGINA))
+        numero += 1
+    lienzo.save()
+
+
+ESCRITORES = {
+    'json': escribir_json,
+    'csv': escribir_csv,
+    'excel': escribir_xlsx,
+    'pdf': escribir_pdf,
+}
+
+
+def escribir(formato, datos, archivo):
+    """Escribe el reporte en el formato pedido en un archivo binario."""
+    ESCRITORES[formato](datos, archivo)
@@ -0,0 +1,188 @@
+"""
+Reportes estándar: pedidos fijos (sin prompt) que se sirven ya generados.
+
+Cada reporte se registra con @registrar('clave') sobre una función que
+recibe la fecha de hoy y devuelve el plan (el dict que arma el parser).
+Agregar uno nuevo es agregar una función aquí.
+
+El archivo generado se guarda en ReporteEstandar junto con la versión de los
+datos que cubre (core.cache_reportes). obtener() lo devuelve tal cual
+mientras esa versión siga vigente y no tenga más de REPORTES_ESTANDAR_MAX_EDAD
+segundos; si cambió (entró una venta del mes, pasó el mes, se vendió o
+reservó stock) o es muy viejo, lo regenera. Si otro request ya lo está
+regenerando, sirve el archivo anterior en vez de generarlo dos veces: así
+un pico de descargas del mismo reporte no dispara un reporte por descarga.
+El comando prerenderizar_reportes los regenera por adelantado.
+"""
+import hashlib
+import logging
+import tempfile
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from ..models import ReporteEstandar
+from .cache_reportes import ClaveReporte
+from .datos import DatosReporte, obtener_datos
+from .escritores import EXTENSIONES, escribir
+from .trabajos import MAX_EN_MEMORIA
+
+logger = logging.getLogger(__name__)
+
+# Segundos que se reserva la regeneración de un reporte a un solo request
+BLOQUEO_SEGUNDOS = 300
+
+REPORTES = {}
+
+
+def registrar(clave):
+    """Registra la función que arma el plan del reporte estándar `clave`."""
+    def decorador(funcion):
+        REPORTES[clave] = funcion
+        return funcion
+    return decorador
+
+
+@registrar('sales_this_month_excel')
+def ventas_del_mes(today):
+    return {
+        'type': 'ventas',
+        'filters': {
+            'fecha__month': today.month,
+            'fecha__year': today.year
+        },
+        'format': 'excel',
+        'group_by': None,
+        'select_fields': ['id', 'fecha', 'cliente__nombre', 'total', 'estado']
+    }
+
+
+@registrar('inventory_available_pdf')
+def inventario_disponible(today):
+    return {
+        'type': 'inventario',
+        'filters': {'estado': 'disponible'},
+        'format': 'pdf',
+        'group_by': 'categoria', # Agrupado por categoría
+        'select_fields': []
+    }
+
+
+def plan(clave):
+    """El plan (dict del parser) de un reporte estándar, o None si no existe."""
+    funcion = REPORTES.get(clave)
+    if funcion is None:
+        return None
+    return funcion(datetime.now().date())
+
+
+def vigente(registro, clave_reporte):
+    """
+    El registro cubre la versión actual de los datos y no tiene más de
+    REPORTES_ESTANDAR_MAX_EDAD segundos (lo que no pasa por las señales,
+    como un UPDATE a mano, no cambia la versión).
+    """
+    edad = timezone.now() - registro.generado_en
+    return (
+        registro.huella == clave_reporte.huella
+        and registro.formato == clave_reporte.formato
+        and registro.version == clave_reporte.version
+        and edad.total_seconds() < settings.REPORTES_ESTANDAR_MAX_EDAD
+    )
+
+
+def _con_huella(datos, huella_filas):
+    """Las mismas filas, acumulando su huella a medida que se escriben."""
+    for fila in datos:
+        huella_filas.update(repr(fila).encode('utf-8'))
+        yield fila
+
+
+def renderizar(clave, plan_reporte=None, clave_reporte=None):
+    """
+    Genera el reporte `clave` y lo guarda (reemplazando el anterior).
+
+    El ETag es la huella de las filas y no del archivo: openpyxl y
+    reportlab graban la hora de creación, así que los mismos datos darían
+    otro archivo. Si las filas no cambiaron se conserva el archivo anterior.
+    """
+    plan_reporte = plan_reporte or plan(clave)
+    # La versión se toma antes de consultar (ver ClaveReporte)
+    clave_reporte = clave_reporte or ClaveReporte(plan_reporte)
+    anterior = ReporteEstandar.objects.filter(clave=clave).values('archivo', 'etag').first() or {}
+
+    datos = obtener_datos(plan_reporte)
+    campos = {'archivo': None, 'nombre_archivo': '', 'etag': ''}
+    if not datos.vacio:
+        nombre = f'{clave}.{EXTENSIONES[clave_reporte.formato]}'
+        huella_filas = hashlib.sha256(repr((clave, clave_reporte.formato, datos.titulo, datos.columnas)).encode('utf-8'))
+        filas = DatosReporte(datos.titulo, datos.columnas, _con_huella(datos, huella_filas))
+        with tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA) as archivo:
+            escribir(clave_reporte.formato, filas, archivo)
+            etag = huella_filas.hexdigest()[:32]
+            if etag == anterior.get('etag') and anterior.get('archivo') and default_storage.exists(anterior['archivo']):
+                ruta = anterior['archivo']
+            else:
+                archivo.seek(0)
+                ruta = default_storage.save(f'reportes/estandar/{nombre}', File(archivo))
+        campos = {'archivo': ruta, 'nombre_archivo': nombre, 'etag': etag}
+
+    registro, _ = ReporteEstandar.objects.update_or_create(clave=clave, defaults={
+        **campos,
+        'huella': clave_reporte.huella,
+        'formato': clave_reporte.formato,
+        'version': clave_reporte.version,
+        'generado_en': timezone.now(),
+    })
+    if anterior.get('archivo') and anterior['archivo'] != campos['archivo']:
+        # Un request que ya recibió el registro anterior lo vuelve a pedir
+        # si el archivo desaparece (ver views.StandardReportView)
+        default_storage.delete(anterior['archivo'])
+    return registro
+
+
+def obtener(clave):
+    """
+    El ReporteEstandar vigente de `clave` (regenerándolo si hace falta), o
+    None si la clave no está registrada.
+    """
+    plan_reporte = plan(clave)
+    if plan_reporte is None:
+        return None
+    clave_reporte = ClaveReporte(plan_reporte)
+    registro = ReporteEstandar.objects.filter(clave=clave).first()
+    if registro is not None and vigente(registro, clave_reporte):
+        return registro
+
+    cache = caches[settings.REPORTES_CACHE_ALIAS]
+    bloqueo = f'reportes:estandar:generando:{clave}'
+    tomado = cache.add(bloqueo, 1, BLOQUEO_SEGUNDOS)
+    if not tomado and registro is not None:
+        # Otro request lo está regenerando: mientras tanto, el anterior
+        return registro
+    try:
+        return renderizar(clave, plan_reporte, clave_reporte)
+    finally:
+        if tomado:
+            cache.delete(bloqueo)
+
+
+def prerenderizar(forzar=False):
+    """Regenera los reportes estándar viejos (o todos). Devuelve las claves regeneradas."""
+    regenerados = []
+    for clave in REPORTES:
+        plan_reporte = plan(clave)
+        clave_reporte = ClaveReporte(plan_reporte)
+        registro = ReporteEstandar.objects.filter(clave=clave).first()
+        if not forzar and registro is not None and vigente(registro, clave_reporte):
+            continue
+        try:
+            renderizar(clave, plan_reporte, clave_reporte)
+            regenerados.append(clave)
+        except Exception as e:
+            logger.error(f"❌ Error generando el reporte estándar {clave}: {e}")
+    return regenerados
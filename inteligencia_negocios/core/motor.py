@@ -0,0 +1,393 @@
+"""
+Motor analítico columnar (opcional, REPORTES_MOTOR_COLUMNAR).
+
+Mantiene en memoria del proceso una copia compacta de los hechos de venta
+en arreglos NumPy: una tabla por venta (día, cliente, estado, total) y otra
+por detalle (día, catálogo, cantidad, total). Los reportes de ventas
+agrupados por cliente, producto, categoría o marca se resuelven con filtros
+y bincount vectorizados sobre esos arreglos, sin consultar la base; así el
+tráfico de BI no compite con el checkout.
+
+Los montos se guardan en centavos (enteros) para sumar sin error y se
+devuelven como Decimal, igual que el ORM. Marca, categoría y nombres salen
+de dimensiones chicas (catálogos, marcas, categorías, clientes) que se
+recargan cuando cambian los datos maestros.
+
+La copia se actualiza de forma incremental: cuando cambia la versión de
+ventas de core.cache_reportes se leen solo las ventas con actualizado_en
+posterior a la última lectura (con un margen para transacciones que
+confirmaron tarde) y se reemplazan sus filas. Las ventas borradas en este
+proceso se quitan por señal; las de otros procesos, y los cambios que no
+pasan por Venta.save, se corrigen con la recarga completa cada
+REPORTES_MOTOR_RECARGA_SEGUNDOS. Cada proceso (worker) tiene su propia copia.
+
+Los pedidos que el motor no sabe resolver (otros filtros, listados,
+inventario) devuelven None y core.datos usa el ORM.
+"""
+import logging
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models.functions import TruncDate
+
+from administracion.models import Cliente
+from catalogo.models import Catalogo, Categoria, Marca
+from ventas.models import Venta, DetalleVenta
+
+from . import cache_reportes
+
+logger = logging.getLogger(__name__)
+
+# Las ventas confirmadas con hasta este atraso respecto de su actualizado_en
+# igual se leen en la siguiente actualización
+MARGEN = timedelta(seconds=60)
+
+# Filas leídas por viaje a la base y ids por consulta en las actualizaciones
+CHUNK_SIZE = 5000
+LOTE_IDS = 500
+
+_EPOCA = date(1970, 1, 1).toordinal()
+
+# Filtros que entiende el motor, según la tabla que consulta el ORM
+FILTROS_VENTAS = {'fecha__date', 'fecha__month', 'fecha__year', 'estado'}
+FILTROS_DETALLES = {
+    'venta__fecha__date', 'venta__fecha__month', 'venta__fecha__year',
+    'catalogo__marca__nombre__icontains', 'catalogo__categoria__nombre__icontains',
+}
+
+# group_by -> columna de salida del ORM
+AGRUPACIONES_DETALLE = {
+    'producto': 'catalogo__nombre',
+    'categoria': 'catalogo__categoria__nombre',
+    'marca': 'catalogo__marca__nombre',
+}
+
+
+def _dia(valor):
+    """Fecha (o texto ISO) como días desde 1970-01-01."""
+    if isinstance(valor, str):
+        valor = date.fromisoformat(valor)
+    return valor.toordinal() - _EPOCA
+
+
+def _centavos(valor):
+    return int(valor * 100) if valor is not None else 0
+
+
+def _monto(centavos):
+    return Decimal(int(round(centavos))).scaleb(-2)
+
+
+class Columnas:
+    """
+    Tabla de columnas NumPy que crece por duplicación. Las filas borradas
+    quedan marcadas en `vivas` hasta que compactar() las elimina.
+    """
+
+    def __init__(self, tipos):
+        self.tipos = tipos
+        self.n = 0
+        self.borradas = 0
+        self.datos = {nombre: np.empty(0, dtype=tipo) for nombre, tipo in tipos.items()}
+        self.vivas = np.empty(0, dtype=bool)
+
+    def __len__(self):
+        return self.n - self.borradas
+
+    def __getitem__(self, nombre):
+        return self.datos[nombre][:self.n]
+
+    def mascara(self):
+        return self.vivas[:self.n].copy()
+
+    def agregar(self, columnas):
+        cantidad = len(next(iter(columnas.values())))
+        if not cantidad:
+            return
+        necesario = self.n + cantidad
+        if necesario > len(self.vivas):
+            capacidad = max(necesario, 2 * len(self.vivas), 1024)
+            for nombre, tipo in self.tipos.items():
+                nuevo = np.empty(capacidad, dtype=tipo)
+                nuevo[:self.n] = self.datos[nombre][:self.n]
+                self.datos[nombre] = nuevo
+            vivas = np.zeros(capacidad, dtype=bool)
+            vivas[:self.n] = self.vivas[:self.n]
+            self.vivas = vivas
+        for nombre, valores in columnas.items():
+            self.datos[nombre][self.n:necesario] = valores
+        self.vivas[self.n:necesario] = True
+        self.n = necesario
+
+    def borrar(self, campo, valores):
+        if not self.n or not len(valores):
+            return
+        marcadas = self.vivas[:self.n] & np.isin(self[campo], np.asarray(valores, dtype=self.tipos[campo]))
+        self.vivas[:self.n][marcadas] = False
+        self.borradas += int(marcadas.sum())
+        if self.borradas > self.n // 4:
+            self.compactar()
+
+    def compactar(self):
+        vivas = self.vivas[:self.n]
+        for nombre in self.tipos:
+            self.datos[nombre] = self.datos[nombre][:self.n][vivas].copy()
+        self.n = len(self.datos[next(iter(self.tipos))])
+        self.vivas = np.ones(self.n, dtype=bool)
+        self.borradas = 0
+
+
+def _tabla_ventas():
+    return Columnas({'venta': np.int64, 'dia': np.int32, 'cliente': np.int64, 'estado': np.int8, 'total': np.int64})
+
+
+def _tabla_detalles():
+    return Columnas({'venta': np.int64, 'dia': np.int32, 'catalogo': np.int64, 'cantidad': np.int64, 'total': np.int64})
+
+
+def _indice(ids):
+    """Arreglo id -> posición (-1 si no existe), para traducir claves foráneas vectorizadamente."""
+    ids = np.asarray(ids, dtype=np.int64)
+    indice = np.full(int(ids.max()) + 2 if len(ids) else 1, -1, dtype=np.int64)
+    indice[ids] = np.arange(len(ids))
+    return indice
+
+
+def _posiciones(indice, ids):
+    """Posición de cada id en su dimensión (-1 para nulos o ids que todavía no están)."""
+    posiciones = np.full(len(ids), -1, dtype=np.int64)
+    validos = (ids >= 0) & (ids < len(indice))
+    posiciones[validos] = indice[ids[validos]]
+    return posiciones
+
+
+class Dimensiones:
+    """Catálogos, marcas, categorías y clientes como arreglos chicos."""
+
+    def __init__(self):
+        marcas = dict(Marca.objects.values_list('id', 'nombre'))
+        categorias = dict(Categoria.objects.values_list('id', 'nombre'))
+        catalogos = list(Catalogo.objects.values_list('id', 'nombre', 'marca_id', 'categoria_id'))
+
+        self.catalogo_indice = _indice([c[0] for c in catalogos])
+        self.catalogo_nombre = [c[1] for c in catalogos]
+        self.catalogo_marca = [marcas.get(c[2]) for c in catalogos]
+        self.catalogo_categoria = [categorias.get(c[3]) for c in catalogos]
+
+        clientes = list(Cliente.objects.values_list('id', 'nombre', 'nit_ci'))
+        self.cliente_indice = _indice([c[0] for c in clientes])
+        # Clientes con el mismo nombre y NIT van al mismo grupo, como en el ORM
+        grupos = {}
+        self.cliente_grupo = np.array(
+            [grupos.setdefault((c[1], c[2]), len(grupos)) for c in clientes], dtype=np.int64,
+        )
+        self.grupos_cliente = list(grupos)
+
+    def grupos_catalogo(self, campo):
+        """(código de grupo por catálogo, nombres de grupo) para agrupar detalles."""
+        valores = {
+            'catalogo__nombre': self.catalogo_nombre,
+            'catalogo__marca__nombre': self.catalogo_marca,
+            'catalogo__categoria__nombre': self.catalogo_categoria,
+        }[campo]
+        nombres = {}
+        codigos = np.array([nombres.setdefault(valor, len(nombres)) for valor in valores], dtype=np.int64)
+        return codigos, list(nombres)
+
+    def catalogos_con(self, valores, texto):
+        """Máscara por catálogo: el nombre (de marca o categoría) contiene `texto`."""
+        texto = texto.lower()
+        return np.array([valor is not None and texto in valor.lower() for valor in valores], dtype=bool)
+
+
+class MotorAnalitico:
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ventas = None
+        self.detalles = None
+        self.dimensiones = None
+        self.estados = [codigo for codigo, _ in Venta.ESTADO_CHOICES]
+        self._marca_agua = None
+        self._version_ventas = None
+        self._version_maestros = None
+        self._cargado_en = 0.0
+
+    # ==================== CARGA ====================
+
+    def _estado(self, estado):
+        if estado not in self.estados:
+            self.estados.append(estado)
+        return self.estados.index(estado)
+
+    def _leer(self, ventas, detalles):
+        """Lee ventas y detalles de los querysets y los agrega a las tablas."""
+        columnas = {nombre: array('q') for nombre in ('venta', 'dia', 'cliente', 'estado', 'total')}
+        marca_agua = self._marca_agua
+        filas = ventas.annotate(dia=TruncDate('fecha')).values_list(
+            'id', 'dia', 'cliente_id', 'estado', 'total', 'actualizado_en',
+        )
+        for venta_id, dia, cliente_id, estado, total, actualizado_en in filas.iterator(chunk_size=CHUNK_SIZE):
+            columnas['venta'].append(venta_id)
+            columnas['dia'].append(dia.toordinal() - _EPOCA)
+            columnas['cliente'].append(cliente_id if cliente_id is not None else -1)
+            columnas['estado'].append(self._estado(estado))
+            columnas['total'].append(_centavos(total))
+            if marca_agua is None or actualizado_en > marca_agua:
+                marca_agua = actualizado_en
+        self.ventas.agregar({nombre: np.frombuffer(valores, dtype=np.int64) for nombre, valores in columnas.items()})
+
+        columnas = {nombre: array('q') for nombre in ('venta', 'dia', 'catalogo', 'cantidad', 'total')}
+        filas = detalles.annotate(dia=TruncDate('venta__fecha')).values_list(
+            'venta_id', 'dia', 'catalogo_id', 'cantidad', 'total',
+        )
+        for venta_id, dia, catalogo_id, cantidad, total in filas.iterator(chunk_size=CHUNK_SIZE):
+            columnas['venta'].append(venta_id)
+            columnas['dia'].append(dia.toordinal() - _EPOCA)
+            columnas['catalogo'].append(catalogo_id)
+            columnas['cantidad'].append(cantidad)
+            columnas['total'].append(_centavos(total))
+        self.detalles.agregar({nombre: np.frombuffer(valores, dtype=np.int64) for nombre, valores in columnas.items()})
+        self._marca_agua = marca_agua
+
+    def cargar(self):
+        """Lee todos los hechos de venta y las dimensiones (recarga completa)."""
+        with self._lock:
+            inicio = time.perf_counter()
+            self._version_ventas = cache_reportes.versiones([cache_reportes.VENTAS])
+            self._version_maestros = cache_reportes.versiones([cache_reportes.MAESTROS])
+            self.ventas, self.detalles, self._marca_agua = _tabla_ventas(), _tabla_detalles(), None
+            self._leer(Venta.objects.all(), DetalleVenta.objects.all())
+            self.dimensiones = Dimensiones()
+            self._cargado_en = time.monotonic()
+            logger.info(
+                f"📊 Motor analítico cargado: {len(self.ventas)} ventas, {len(self.detalles)} detalles "
+                f"en {time.perf_counter() - inicio:.1f}s"
+            )
+
+    def actualizar(self):
+        """
+        Relee las ventas modificadas desde la última lectura (y sus detalles)
+        si cambió la versión de ventas; recarga las dimensiones si cambiaron
+        los datos maestros.
+        """
+        with self._lock:
+            if self.ventas is None or time.monotonic() - self._cargado_en > settings.REPORTES_MOTOR_RECARGA_SEGUNDOS:
+                self.cargar()
+                return
+
+            version_maestros = cache_reportes.versiones([cache_reportes.MAESTROS])
+            if version_maestros != self._version_maestros:
+                self._version_maestros = version_maestros
+                self.dimensiones = Dimensiones()
+
+            version_ventas = cache_reportes.versiones([cache_reportes.VENTAS])
+            if version_ventas == self._version_ventas:
+                return
+            self._version_ventas = version_ventas
+
+            ventas = Venta.objects.all()
+            if self._marca_agua is not None:
+                ventas = ventas.filter(actualizado_en__gte=self._marca_agua - MARGEN)
+            ids = list(ventas.values_list('id', flat=True))
+            for i in range(0, len(ids), LOTE_IDS):
+                lote = ids[i:i + LOTE_IDS]
+                self.ventas.borrar('venta', lote)
+                self.detalles.borrar('venta', lote)
+                self._leer(Venta.objects.filter(id__in=lote), DetalleVenta.objects.filter(venta_id__in=lote))
+
+    def olvidar_venta(self, venta_id):
+        """Quita una venta borrada (y sus detalles) de la copia."""
+        with self._lock:
+            if self.ventas is not None:
+                self.ventas.borrar('venta', [venta_id])
+                self.detalles.borrar('venta', [venta_id])
+
+    # ==================== CONSULTAS ====================
+
+    def soporta(self, parsed_request):
+        if parsed_request.get('type') != 'ventas':
+            return False
+        filtros = set(parsed_request.get('filters') or {})
+        group_by = parsed_request.get('group_by')
+        if group_by == 'cliente':
+            return filtros <= FILTROS_VENTAS
+        return group_by in AGRUPACIONES_DETALLE and filtros <= FILTROS_DETALLES
+
+    @staticmethod
+    def _filtrar_fechas(mascara, dias, filtros, prefijo):
+        if f'{prefijo}date' in filtros:
+            mascara &= dias == _dia(filtros[f'{prefijo}date'])
+        if f'{prefijo}month' in filtros or f'{prefijo}year' in filtros:
+            fechas = dias.astype('datetime64[D]')
+            if f'{prefijo}year' in filtros:
+                mascara &= fechas.astype('datetime64[Y]').astype(np.int64) + 1970 == int(filtros[f'{prefijo}year'])
+            if f'{prefijo}month' in filtros:
+                mascara &= fechas.astype('datetime64[M]').astype(np.int64) % 12 + 1 == int(filtros[f'{prefijo}month'])
+        return mascara
+
+    @staticmethod
+    def _sumar(codigos, cantidad_grupos, *pesos):
+        """Filas por grupo y sumas por grupo de cada columna de pesos."""
+        filas = np.bincount(codigos, minlength=cantidad_grupos)
+        return filas, [np.bincount(codigos, weights=peso, minlength=cantidad_grupos) for peso in pesos]
+
+    def _por_cliente(self, filtros):
+        tabla, dim = self.ventas, self.dimensiones
+        mascara = self._filtrar_fechas(tabla.mascara(), tabla['dia'], filtros, 'fecha__')
+        if 'estado' in filtros:
+            mascara &= tabla['estado'] == self._estado(filtros['estado'])
+
+        posiciones = _posiciones(dim.cliente_indice, tabla['cliente'][mascara])
+        sin_cliente = len(dim.grupos_cliente)
+        codigos = np.where(posiciones >= 0, dim.cliente_grupo[np.maximum(posiciones, 0)], sin_cliente)
+        filas, (montos,) = self._sumar(codigos, sin_cliente + 1, tabla['total'][mascara])
+
+        grupos = dim.grupos_cliente + [(None, None)]
+        columnas = ['cliente__nombre', 'cliente__nit_ci', 'cantidad_compras', 'monto_total']
+        orden = [i for i in np.argsort(-montos, kind='stable') if filas[i]]
+        return columnas, [(*grupos[i], int(filas[i]), _monto(montos[i])) for i in orden]
+
+    def _por_catalogo(self, filtros, campo):
+        tabla, dim = self.detalles, self.dimensiones
+        mascara = self._filtrar_fechas(tabla.mascara(), tabla['dia'], filtros, 'venta__fecha__')
+        posiciones = _posiciones(dim.catalogo_indice, tabla['catalogo'])
+
+        catalogos_validos = np.ones(len(dim.catalogo_nombre), dtype=bool)
+        if 'catalogo__marca__nombre__icontains' in filtros:
+            catalogos_validos &= dim.catalogos_con(dim.catalogo_marca, filtros['catalogo__marca__nombre__icontains'])
+        if 'catalogo__categoria__nombre__icontains' in filtros:
+            catalogos_validos &= dim.catalogos_con(
+                dim.catalogo_categoria, filtros['catalogo__categoria__nombre__icontains'],
+            )
+        mascara &= posiciones >= 0
+        mascara[mascara] &= catalogos_validos[posiciones[mascara]]
+
+        codigos_catalogo, nombres = dim.grupos_catalogo(campo)
+        codigos = codigos_catalogo[posiciones[mascara]]
+        filas, (cantidades, montos) = self._sumar(
+            codigos, len(nombres), tabla['cantidad'][mascara], tabla['total'][mascara],
+        )
+        columnas = [campo, 'cantidad_unidades', 'monto_total']
+        orden = [i for i in np.argsort(-montos, kind='stable') if filas[i]]
+        return columnas, [(nombres[i], int(round(cantidades[i])), _monto(montos[i])) for i in orden]
+
+    def consultar(self, parsed_request):
+        """(columnas, filas) del reporte, o None si el motor no lo resuelve."""
+        if not self.soporta(parsed_request):
+            return None
+        with self._lock:
+            self.actualizar()
+            filtros = parsed_request.get('filters') or {}
+            group_by = parsed_request['group_by']
+            if group_by == 'cliente':
+                return self._por_cliente(filtros)
+            return self._por_catalogo(filtros, AGRUPACIONES_DETALLE[group_by])
+
+
+motor_analitico = MotorAnalitico()
@@ -0,0 +1,229 @@
+"""
+Cola de reportes en segundo plano, guardada en la base (TrabajoReporte).
+
+encolar() registra el pedido y devuelve el trabajo; si ya hay uno igual
+pendiente o en proceso, devuelve ese (la restricción única parcial sobre la
+huella resuelve las carreras entre requests simultáneos).
+
+Los trabajos los toma un pool de hilos del propio proceso (con
+REPORTES_EN_PROCESO) y/o el comando procesar_reportes. Tomar un trabajo es
+un UPDATE condicional (estado='pendiente' -> 'procesando'), así varios
+hilos o procesos nunca procesan el mismo.
+
+Un trabajo que quedó 'procesando' porque su proceso murió vuelve a la cola
+al encolar, al procesar la cola o al consultar su estado, hasta
+REPORTES_MAX_INTENTOS veces; después queda en 'error'. Consultar un trabajo
+pendiente también despierta al pool, así lo que quedó en cola al reiniciar
+el servidor no espera a un pedido nuevo. El archivo generado queda en el
+almacenamiento de archivos (MEDIA_ROOT) para descargarlo después.
+"""
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from ..models import TrabajoReporte
+from .datos import obtener_datos
+from .escritores import EXTENSIONES, escribir
+
+logger = logging.getLogger(__name__)
+
+# Archivos hasta este tamaño se arman en memoria antes de guardarse
+MAX_EN_MEMORIA = 5 * 1024 * 1024
+
+
+class SinDatos(Exception):
+    """El reporte no tiene filas."""
+
+
+def canonizar(parsed_request):
+    """
+    El pedido del parser en forma JSON estable: fechas como texto ISO y
+    claves ordenadas. Es lo que se guarda y lo que se hashea.
+    """
+    spec = {
+        'type': parsed_request['type'],
+        'filters': parsed_request.get('filters') or {},
+        'format': parsed_request.get('format') or 'json',
+        'group_by': parsed_request.get('group_by'),
+        'select_fields': parsed_request.get('select_fields') or [],
+    }
+    return json.loads(json.dumps(spec, cls=DjangoJSONEncoder, sort_keys=True))
+
+
+def huella(spec):
+    texto = json.dumps(spec, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+# ==================== ENCOLADO ====================
+
+def encolar(parsed_request, usuario=None):
+    """
+    Devuelve (trabajo, creado). creado es False si se reutilizó uno activo
+    del mismo usuario (cada usuario solo ve sus propios trabajos).
+    """
+    if usuario is not None and not usuario.is_authenticated:
+        usuario = None
+    spec = canonizar(parsed_request)
+    clave = huella({'spec': spec, 'usuario': usuario.pk if usuario else None})
+    # Un trabajo colgado no debe absorber los pedidos iguales
+    recuperar_colgados()
+    existente = TrabajoReporte.objects.filter(huella=clave, estado__in=TrabajoReporte.ACTIVOS).first()
+    if existente:
+        return existente, False
+    try:
+        with transaction.atomic():
+            trabajo = TrabajoReporte.objects.create(
+                spec=spec,
+                huella=clave,
+                formato=spec['format'],
+                usuario=usuario,
+            )
+    except IntegrityError:
+        # Otro request creó el mismo trabajo entre la consulta y el INSERT
+        return TrabajoReporte.objects.get(huella=clave, estado__in=TrabajoReporte.ACTIVOS), False
+    transaction.on_commit(despachar)
+    return trabajo, True
+
+
+# ==================== PROCESAMIENTO ====================
+
+def tomar_siguiente():
+    """Marca como 'procesando' el pendiente más viejo y lo devuelve (o None)."""
+    while True:
+        candidato = (
+            TrabajoReporte.objects.filter(estado='pendiente')
+            .order_by('creado_en')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if candidato is None:
+            return None
+        tomados = TrabajoReporte.objects.filter(pk=candidato, estado='pendiente').update(
+            estado='procesando', iniciado_en=timezone.now(),
+        )
+        if tomados:
+            trabajo = TrabajoReporte.objects.get(pk=candidato)
+            trabajo.intentos += 1
+            trabajo.save(update_fields=['intentos'])
+            return trabajo
+        # Otro hilo/proceso lo tomó primero: probar con el siguiente
+
+
+def procesar(trabajo):
+    """Genera el archivo del trabajo y lo deja 'completado' o en 'error'."""
+    try:
+        datos = obtener_datos(trabajo.spec)
+        if datos.vacio:
+            raise SinDatos('No hay datos para este reporte')
+
+        nombre = f'reporte_{trabajo.spec["type"]}_{trabajo.pk.hex[:8]}.{EXTENSIONES[trabajo.formato]}'
+        with tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA) as archivo:
+            escribir(trabajo.formato, datos, archivo)
+            archivo.seek(0)
+            trabajo.archivo.save(nombre, File(archivo), save=False)
+        trabajo.nombre_archivo = nombre
+        trabajo.estado = 'completado'
+        trabajo.error = ''
+    except Exception as e:
+        logger.error(f"❌ Error generando el reporte {trabajo.pk}: {e}")
+        trabajo.estado = 'error'
+        trabajo.error = str(e)
+    trabajo.terminado_en = timezone.now()
+    trabajo.save(update_fields=['archivo', 'nombre_archivo', 'estado', 'error', 'terminado_en'])
+    return trabajo
+
+
+def ejecutar_pendientes(maximo=None):
+    """Procesa pendientes hasta vaciar la cola (o hasta `maximo`). Devuelve cuántos."""
+    recuperar_colgados()
+    procesados = 0
+    while maximo is None or procesados < maximo:
+        trabajo = tomar_siguiente()
+        if trabajo is None:
+            break
+        procesar(trabajo)
+        procesados += 1
+    return procesados
+
+
+def recuperar_colgados():
+    """
+    Devuelve a 'pendiente' los trabajos 'procesando' hace más de
+    REPORTES_TIMEOUT_MINUTOS (su proceso murió sin terminarlos). Los que ya
+    usaron REPORTES_MAX_INTENTOS quedan en 'error'. Devuelve cuántos volvieron.
+    """
+    ahora = timezone.now()
+    colgados = TrabajoReporte.objects.filter(
+        estado='procesando', iniciado_en__lt=ahora - timedelta(minutes=settings.REPORTES_TIMEOUT_MINUTOS),
+    )
+    agotados = colgados.filter(intentos__gte=settings.REPORTES_MAX_INTENTOS).update(
+        estado='error', error='Se agotaron los intentos de generar el reporte', terminado_en=ahora,
+    )
+    if agotados:
+        logger.error(f"❌ {agotados} trabajo(s) de reporte agotaron sus intentos")
+    return colgados.update(estado='pendiente', iniciado_en=None)
+
+
+def reanudar(trabajo):
+    """
+    Al consultar un trabajo activo: si quedó colgado vuelve a la cola y, si
+    está pendiente, se despierta al pool. Devuelve el trabajo actualizado.
+    """
+    if trabajo.estado not in TrabajoReporte.ACTIVOS:
+        return trabajo
+    recuperar_colgados()
+    if trabajo.estado == 'procesando':
+        trabajo.refresh_from_db()
+    if trabajo.estado == 'pendiente':
+        despachar()
+    return trabajo
+
+
+# ==================== POOL EN PROCESO ====================
+
+_pool = None
+_pool_lock = threading.Lock()
+# Tareas enviadas al pool que todavía no terminaron
+_en_curso = 0
+
+
+def _trabajar():
+    global _en_curso
+    try:
+        ejecutar_pendientes()
+    except Exception as e:
+        logger.error(f"❌ Error en el pool de reportes: {e}")
+    finally:
+        with _pool_lock:
+            _en_curso -= 1
+        # El hilo no retiene conexiones a la base
+        connections.close_all()
+
+
+def despachar():
+    """
+    Despierta un hilo del pool para procesar la cola (si está habilitado).
+    Con todos los hilos ocupados no encola más tareas: los que están
+    trabajando vacían la cola antes de terminar.
+    """
+    global _pool, _en_curso
+    if not settings.REPORTES_EN_PROCESO:
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=settings.REPORTES_WORKERS, thread_name_prefix='reportes')
+        if _en_curso >= settings.REPORTES_WORKERS:
+            return
+        _en_curso += 1
+    _pool.submit(_trabajar)
@@ -0,0 +1,159 @@
+"""
+Vocabulario del parser de reportes: las palabras clave fijas del parser más
+las marcas y categorías del catálogo, compiladas en una sola expresión
+regular.
+
+La expresión se arma como un trie (las palabras que comparten prefijo
+comparten rama), así el costo de buscar en un prompt depende del largo del
+prompt y no de cuántas marcas haya. Se busca con un lookahead en cada
+posición para encontrar también palabras superpuestas ('subtotal' y
+'total'), igual que los `in` que reemplaza.
+
+Las marcas y categorías se leen de la base recién cuando se necesitan y se
+vuelven a leer cuando cambia la generación del vocabulario: las señales de
+Marca y Categoria la incrementan en la caché compartida, de modo que todos
+los procesos se enteran del cambio.
+"""
+import logging
+import re
+import threading
+
+from django.core.cache import cache
+from django.db import DatabaseError
+
+from catalogo.models import Categoria, Marca
+
+logger = logging.getLogger(__name__)
+
+CLAVE_GENERACION = 'reportes:vocabulario:generacion'
+
+_FIN = ''
+
+
+def _trie(palabras):
+    raiz = {}
+    for palabra in palabras:
+        nodo = raiz
+        for letra in palabra:
+            nodo = nodo.setdefault(letra, {})
+        nodo[_FIN] = True
+    return raiz
+
+
+def _patron(nodo):
+    """Expresión regular equivalente al trie; prefiere siempre la palabra más larga."""
+    ramas = [re.escape(letra) + _patron(hijo) for letra, hijo in sorted(nodo.items()) if letra != _FIN]
+    if not ramas:
+        return ''
+    cuerpo = ramas[0] if len(ramas) == 1 else '(?:' + '|'.join(ramas) + ')'
+    if _FIN in nodo:
+        # La palabra puede terminar aquí: el resto es opcional (y codicioso)
+        return '(?:' + cuerpo + ')?'
+    return cuerpo
+
+
+class Automata:
+    """
+    Busca a la vez todas las palabras de una lista dentro de un texto.
+    buscar() devuelve las palabras contenidas como [(posición, palabra)]
+    ordenadas por posición y, en la misma posición, de la más larga a la más corta.
+    """
+
+    def __init__(self, palabras):
+        palabras = sorted({palabra for palabra in palabras if palabra})
+        raiz = _trie(palabras)
+        self._regex = re.compile('(?=(' + _patron(raiz) + '))') if palabras else None
+
+        # En cada posición la regex da la palabra más larga; las que son
+        # prefijo de ella se agregan desde aquí
+        self._prefijos = {}
+        for palabra in palabras:
+            nodo, prefijos = raiz, []
+            for i, letra in enumerate(palabra[:-1], start=1):
+                nodo = nodo[letra]
+                if _FIN in nodo:
+                    prefijos.append(palabra[:i])
+            self._prefijos[palabra] = prefijos[::-1]
+
+    def buscar(self, texto):
+        if self._regex is None:
+            return []
+        encontradas = []
+        for match in self._regex.finditer(texto):
+            palabra = match.group(1)
+            if not palabra:
+                continue
+            posicion = match.start()
+            encontradas.append((posicion, palabra))
+            encontradas.extend((posicion, prefijo) for prefijo in self._prefijos[palabra])
+        return encontradas
+
+
+class Vocabulario:
+    """Palabras fijas + marcas y categorías del catálogo, ya compiladas."""
+
+    def __init__(self, palabras_fijas, marcas, categorias):
+        self.marcas = frozenset(marcas)
+        # nombre en el prompt -> nombre de la categoría para el filtro
+        self.categorias = dict(categorias)
+        self.automata = Automata([*palabras_fijas, *self.marcas, *self.categorias])
+
+    def buscar(self, texto):
+        return self.automata.buscar(texto)
+
+
+def generacion():
+    """Generación vigente del catálogo de marcas/categorías (compartida entre procesos)."""
+    return cache.get(CLAVE_GENERACION, 0)
+
+
+def invalidar():
+    """Marca el vocabulario como desactualizado en todos los procesos."""
+    try:
+        cache.incr(CLAVE_GENERACION)
+    except ValueError:
+        # La clave no existía (caché recién iniciada o expulsada)
+        cache.set(CLAVE_GENERACION, 1, None)
+
+
+class RegistroVocabulario:
+    """Guarda el vocabulario compilado y lo rehace cuando cambia la generación."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vocabularios = {}
+
+    def obtener(self, palabras_fijas, sinonimos_categorias, gen=None):
+        """
+        Devuelve el vocabulario de la generación `gen` (la vigente si es
+        None). Las marcas y categorías se leen de la base una vez por
+        generación; sinonimos_categorias se agregan a las de la base.
+        """
+        gen = generacion() if gen is None else gen
+        clave = (palabras_fijas, gen)
+        vocabulario = self._vocabularios.get(clave)
+        if vocabulario is not None:
+            return vocabulario
+
+        with self._lock:
+            vocabulario = self._vocabularios.get(clave)
+            if vocabulario is not None:
+                return vocabulario
+            try:
+                marcas = [nombre.lower() for nombre in Marca.objects.values_list('nombre', flat=True)]
+                categorias = {
+                    nombre.lower(): nombre.lower() for nombre in Categoria.objects.values_list('nombre', flat=True)
+                }
+            except DatabaseError as e:
+                # Sin base (p. ej. antes de migrar): solo las palabras fijas, sin guardar
+                logger.warning(f"⚠️ No se pudieron leer marcas y categorías para el parser: {e}")
+                return Vocabulario(palabras_fijas, [], sinonimos_categorias)
+
+            categorias.update(sinonimos_categorias)
+            vocabulario = Vocabulario(palabras_fijas, marcas, categorias)
+            # Solo se conserva la generación vigente
+            self._vocabularios = {clave: vocabulario}
+            return vocabulario
+
+
+registro_vocabulario = RegistroVocabulario()
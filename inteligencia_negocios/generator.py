@@ -1,181 +1,71 @@
 # reports/services/generator.py
-from django.http import HttpResponse
-from django.db.models import Count, Sum # ¡IMPORTANTE: Añadir Sum!
+import io
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
 from rest_framework.response import Response
-import pandas as pd
-import datetime
 
-# --- IMPORTAMOS TODOS LOS MODELOS NECESARIOS ---
-from catalogo.models import Producto, Catalogo, Marca, Categoria
-from ventas.models import Venta, DetalleVenta # ¡NUEVO!
+from .core.cache_reportes import ClaveReporte, guardando, guardar_artefacto, leer_artefacto, obtener_datos_cacheados
+from .core.datos import TipoReporteInvalido
+from .core.escritores import CONTENT_TYPES, EXTENSIONES, escribir, lineas_csv
 
-# --- IMPORTACIONES DE REPORTLAB ---
-import io
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+# XLSX y PDF: hasta este tamaño el archivo queda en memoria; más grande, en disco
+MAX_EN_MEMORIA = 5 * 1024 * 1024
 
-class ReportGenerator:
-    def generate(self, parsed_request):
-        
-        formato = parsed_request['format']
-        data = []
-        report_title = "Reporte" # Título genérico
 
-        # --- CASO 1: REPORTE DE INVENTARIO (Sin cambios) ---
-        if parsed_request['type'] == 'inventario':
-            report_title = "Reporte de Inventario"
-            queryset = Producto.objects.filter(**parsed_request['filters'])
-            group_by = parsed_request.get('group_by')
-            
-            if group_by:
-                if group_by == 'categoria':
-                    report_title = "Inventario por Categoría"
-                    data = list(queryset.values('catalogo__categoria__nombre').annotate(total_items=Count('id')).order_by('-total_items'))
-                elif group_by == 'marca':
-                    report_title = "Inventario por Marca"
-                    data = list(queryset.values('catalogo__marca__nombre').annotate(total_items=Count('id')).order_by('-total_items'))
-            else:
-                fields_to_select = parsed_request.get('select_fields')
-                for producto in queryset:
-                    row = {}
-                    for field_name in fields_to_select:
-                        if field_name == 'catalogo__nombre': row['nombre'] = producto.catalogo.nombre
-                        elif field_name == 'catalogo__precio': row['precio'] = producto.catalogo.precio
-                        else: row[field_name] = getattr(producto, field_name, None)
-                    data.append(row)
+class ReportGenerator:
+    """
+    Genera el reporte pedido por el parser: los datos salen de
+    core.datos.obtener_datos (leídos por bloques) y el formato lo escribe
+    core.escritores. CSV, XLSX y PDF se envían sin cargar todas las filas en memoria.
 
-        # --- CASO 2: REPORTE DE VENTAS (¡NUEVO BLOQUE!) ---
-        elif parsed_request['type'] == 'ventas':
-            report_title = "Reporte de Ventas"
-            group_by = parsed_request.get('group_by')
-            filters = parsed_request['filters']
-            
-            if group_by == 'cliente':
-                report_title = "Reporte de Ventas por Cliente"
-                queryset = Venta.objects.filter(**filters)
-                data = list(
-                    # --- CORRECCIÓN ---
-                    # Agrupamos por nombre y nit_ci (o razon_social si prefieres)
-                    queryset.values('cliente__nombre', 'cliente__nit_ci') 
-                    .annotate(
-                        cantidad_compras=Count('id'),
-                        monto_total=Sum('total')
-                    )
-                    .order_by('-monto_total')
-                )
+    Las filas y los archivos generados se guardan en caché
+    (core.cache_reportes) hasta que cambian los datos que cubren.
+    """
 
-            elif group_by == 'producto':
-                report_title = "Reporte de Ventas por Producto"
-                # [cite_start]"agrupado por producto" [cite: 54]
-                queryset = DetalleVenta.objects.filter(**filters)
-                data = list(
-                    queryset.values('catalogo__nombre') # Agrupamos por nombre de catálogo
-                    .annotate(
-                        cantidad_unidades=Sum('cantidad'),
-                        monto_total=Sum('total')
-                    )
-                    .order_by('-monto_total')
-                )
-            
-            elif group_by == 'categoria':
-                report_title = "Reporte de Ventas por Categoría"
-                queryset = DetalleVenta.objects.filter(**filters)
-                data = list(
-                    queryset.values('catalogo__categoria__nombre')
-                    .annotate(
-                        cantidad_unidades=Sum('cantidad'),
-                        monto_total=Sum('total')
-                    )
-                    .order_by('-monto_total')
-                )
-
-            elif group_by == 'marca':
-                report_title = "Reporte de Ventas por Marca"
-                queryset = DetalleVenta.objects.filter(**filters)
-                data = list(
-                    queryset.values('catalogo__marca__nombre')
-                    .annotate(
-                        cantidad_unidades=Sum('cantidad'),
-                        monto_total=Sum('total')
-                    )
-                    .order_by('-monto_total')
+    def generate(self, parsed_request):
+        formato = parsed_request['format']
+        nombre = f'reporte_{parsed_request["type"]}.{EXTENSIONES.get(formato, "")}'
+        clave = ClaveReporte(parsed_request)
+
+        if formato in ('csv', 'excel', 'pdf'):
+            contenido = leer_artefacto(clave, formato)
+            if contenido is not None:
+                return FileResponse(
+                    io.BytesIO(contenido), as_attachment=True, filename=nombre, content_type=CONTENT_TYPES[formato],
                 )
 
-            else:
-                # Listado simple de ventas
-                report_title = "Listado de Ventas"
-                fields_to_select = parsed_request.get('select_fields')
-                # (Usamos .values() para campos de Venta)
-                queryset = Venta.objects.filter(**filters)
-                data = list(queryset.values(*fields_to_select))
-
-        else:
-             return Response({'error': 'Tipo de reporte no válido.'}, status=400)
+        try:
+            datos = obtener_datos_cacheados(clave, parsed_request)
+        except TipoReporteInvalido:
+            return Response({'error': 'Tipo de reporte no válido.'}, status=400)
 
         # --- VALIDACIÓN (Si no hay datos) ---
-        if not data:
+        if datos.vacio:
             return Response({'error': 'No hay datos para este reporte'}, status=404)
 
         # --- RENDERIZAR EL FORMATO SOLICITADO ---
         if formato == 'json':
-            return Response({'report_data': data})
-
-        elif formato == 'excel':
-            df = pd.DataFrame(data)
-            
-            # Limpieza de Timezones (para todas las columnas de fecha)
-            for col in df.columns:
-                if pd.api.types.is_datetime64_any_dtype(df[col]):
-                    df[col] = df[col].dt.tz_localize(None)
-            
-            response = HttpResponse(content_type='application/vnd.ms-excel')
-            response['Content-Disposition'] = f'attachment; filename="reporte_{parsed_request["type"]}.xlsx"'
-            
-            df.to_excel(response, index=False)
-            return response # <-- Corregido (solo un return)
-
-        elif formato == 'pdf':
-            response = HttpResponse(content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="reporte_{parsed_request["type"]}.pdf"'
-            doc = SimpleDocTemplate(response, pagesize=landscape(A4))
-            
-            flowables = []
-            styles = getSampleStyleSheet()
-            title = Paragraph(report_title, styles['h1'])
-            flowables.append(title)
-            
-            # Convertir datos a lista de listas
-            headers = list(data[0].keys())
-            table_data = [headers]
-            for row_dict in data:
-                row_list = []
-                for header in headers:
-                    value = row_dict.get(header)
-                    if isinstance(value, (datetime.datetime, datetime.date)):
-                         value = value.strftime('%Y-%m-%d')
-                    elif isinstance(value, (int, float)):
-                        value = str(value) # Convertir números a string
-                    elif value is None:
-                        value = "N/A"
-                    value = str(value) # Fallback final
-                    row_list.append(value)
-                table_data.append(row_list)
-
-            # Crear y estilizar tabla
-            pdf_table = Table(table_data)
-            style = TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ])
-            pdf_table.setStyle(style)
-            flowables.append(pdf_table)
+            return Response({'report_data': list(datos.como_dicts())})
 
-            doc.build(flowables)
+        if formato == 'csv':
+            response = StreamingHttpResponse(
+                guardando(clave, 'csv', lineas_csv(datos)), content_type=CONTENT_TYPES['csv'],
+            )
+            response['Content-Disposition'] = f'attachment; filename="{nombre}"'
             return response
 
-        return Response({'error': 'Formato no soportado.'}, status=400)
\ No newline at end of file
+        elif formato in ('excel', 'pdf'):
+            archivo = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+            escribir(formato, datos, archivo)
+            if archivo.tell() <= settings.REPORTES_CACHE_MAX_BYTES:
+                archivo.seek(0)
+                guardar_artefacto(clave, formato, archivo.read())
+            archivo.seek(0)
+            # FileResponse lo envía por bloques y cierra el archivo al terminar
+            return FileResponse(
+                archivo, as_attachment=True, filename=nombre, content_type=CONTENT_TYPES[formato],
+            )
+
+        return Response({'error': 'Formato no soportado.'}, status=400)
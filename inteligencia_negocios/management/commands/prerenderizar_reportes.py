@@ -0,0 +1,37 @@
+# inteligencia_negocios/management/commands/prerenderizar_reportes.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from inteligencia_negocios.core.estandar import prerenderizar
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera por adelantado los reportes estándar cuyos datos cambiaron, para '
+        'que StandardReportView los sirva sin generarlos. Correrlo antes del '
+        'horario de descarga (cron) o dejarlo corriendo con --intervalo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            help='Seguir corriendo y revisar cada estos segundos si algún reporte quedó viejo.',
+        )
+        parser.add_argument('--forzar', action='store_true', help='Regenerar todos aunque estén al día.')
+
+    def handle(self, *args, **options):
+        forzar = options['forzar']
+        while True:
+            close_old_connections()
+            regenerados = prerenderizar(forzar=forzar)
+            if regenerados:
+                self.stdout.write(self.style.SUCCESS(f"✅ Reportes estándar generados: {', '.join(regenerados)}"))
+            elif forzar or not options['intervalo']:
+                self.stdout.write("Los reportes estándar ya estaban al día.")
+            if not options['intervalo']:
+                return
+            forzar = False
+            time.sleep(options['intervalo'])
@@ -0,0 +1,56 @@
+# inteligencia_negocios/management/commands/procesar_reportes.py
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from inteligencia_negocios.core.trabajos import ejecutar_pendientes, recuperar_colgados
+from inteligencia_negocios.models import TrabajoReporte
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de la cola de reportes: genera los TrabajoReporte pendientes. '
+        'Se puede correr en varios procesos a la vez.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía.')
+        parser.add_argument('--una-vez', action='store_true', help='Procesar lo pendiente y salir.')
+        parser.add_argument(
+            '--purgar-dias',
+            type=int,
+            help='Borrar trabajos terminados (y sus archivos) con más de estos días y salir.',
+        )
+
+    def handle(self, *args, **options):
+        if options['purgar_dias'] is not None:
+            self.purgar(options['purgar_dias'])
+            return
+
+        self.stdout.write("Procesando la cola de reportes...")
+        while True:
+            close_old_connections()
+            colgados = recuperar_colgados()
+            if colgados:
+                self.stdout.write(self.style.WARNING(f"⚠️ {colgados} trabajo(s) colgados vuelven a la cola"))
+            procesados = ejecutar_pendientes()
+            if procesados:
+                self.stdout.write(self.style.SUCCESS(f"✅ {procesados} reporte(s) generados"))
+            if options['una_vez']:
+                return
+            if not procesados:
+                time.sleep(options['intervalo'])
+
+    def purgar(self, dias):
+        limite = timezone.now() - timedelta(days=dias)
+        viejos = TrabajoReporte.objects.filter(estado__in=['completado', 'error'], terminado_en__lt=limite)
+        borrados = 0
+        for trabajo in viejos.iterator():
+            if trabajo.archivo:
+                trabajo.archivo.delete(save=False)
+            trabajo.delete()
+            borrados += 1
+        self.stdout.write(self.style.SUCCESS(f"🗑️ {borrados} trabajo(s) de reporte purgados"))
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inteligencia_negocios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteEstandar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=60, unique=True)),
+                ('huella', models.CharField(max_length=64)),
+                ('formato', models.CharField(max_length=10)),
+                ('version', models.CharField(max_length=16)),
+                ('archivo', models.FileField(blank=True, null=True, upload_to='reportes/estandar/')),
+                ('nombre_archivo', models.CharField(blank=True, max_length=100)),
+                ('etag', models.CharField(blank=True, max_length=64)),
+                ('generado_en', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Reporte Estándar',
+                'verbose_name_plural': 'Reportes Estándar',
+                'ordering': ['clave'],
+            },
+        ),
+    ]
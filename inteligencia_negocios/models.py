@@ -1,3 +1,80 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.db.models import Q
+
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte generado en segundo plano (ver core/trabajos.py). spec es el
+    pedido del parser en forma canónica y huella el hash del pedido y el
+    usuario: dos pedidos iguales del mismo usuario mientras uno está pendiente
+    o en proceso comparten el mismo trabajo.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    ACTIVOS = ('pendiente', 'procesando')
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    spec = models.JSONField()
+    huella = models.CharField(max_length=64)
+    formato = models.CharField(max_length=10)
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='pendiente')
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos_reporte')
+    archivo = models.FileField(upload_to='reportes/%Y/%m/', null=True, blank=True)
+    nombre_archivo = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(null=True, blank=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'Reporte {self.formato} {self.id} ({self.estado})'
+
+    class Meta:
+        verbose_name = 'Trabajo de Reporte'
+        verbose_name_plural = 'Trabajos de Reporte'
+        ordering = ['-creado_en']
+        constraints = [
+            # Deduplicación: un solo trabajo activo por huella
+            models.UniqueConstraint(
+                fields=['huella'],
+                condition=Q(estado__in=['pendiente', 'procesando']),
+                name='trabajo_reporte_activo_unico',
+            ),
+        ]
+        indexes = [
+            # Cola: los pendientes más viejos primero
+            models.Index(fields=['estado', 'creado_en'], name='trabajo_reporte_cola_idx'),
+        ]
+
+
+class ReporteEstandar(models.Model):
+    """
+    Último archivo generado de un reporte estándar (ver core/estandar.py).
+    huella, formato y version son los de core.cache_reportes.ClaveReporte al
+    generarlo: si ya no coinciden con los actuales, el archivo quedó viejo.
+    Sin archivo significa que el reporte no tenía datos.
+    """
+    clave = models.CharField(max_length=60, unique=True)
+    huella = models.CharField(max_length=64)
+    formato = models.CharField(max_length=10)
+    version = models.CharField(max_length=16)
+    archivo = models.FileField(upload_to='reportes/estandar/', null=True, blank=True)
+    nombre_archivo = models.CharField(max_length=100, blank=True)
+    etag = models.CharField(max_length=64, blank=True)
+    generado_en = models.DateTimeField()
+
+    def __str__(self):
+        return f'Reporte estándar {self.clave} ({self.generado_en:%Y-%m-%d %H:%M})'
 
-# Create your models here.
+    class Meta:
+        verbose_name = 'Reporte Estándar'
+        verbose_name_plural = 'Reportes Estándar'
+        ordering = ['clave']
@@ -1,27 +1,34 @@
 # reports/services/parser.py
-from catalogo.models import Marca, Categoria
+import copy
+import re
 from datetime import datetime
+from functools import lru_cache
+
 from dateutil.relativedelta import relativedelta
-import re
+
+from .core.vocabulario import generacion, registro_vocabulario
+
+# Prompts distintos (ya normalizados) cuyo resultado se recuerda por proceso
+TAMANO_CACHE = 1024
+
+_AÑO = re.compile(r'(\d{4})')
+
 
 class ReportParser:
-    
-    # --- (Palabras clave de Marcas, Categorías y Campos se quedan igual) ---
-    try:
-        MARCAS_CONOCIDAS = [m.nombre.lower() for m in Marca.objects.all()]
-    except Exception:
-        MARCAS_CONOCIDAS = ['lg', 'samsung', 'mabe', 'oster', 'mueller', 'etc']
-
-    try:
-        CATEGORIAS_MAPA = {
-            'línea blanca': 'línea blanca', 'blanca': 'línea blanca',
-            'informática': 'línea gris (informática)', 'gris': 'línea gris (informática)',
-            'audio': 'línea marrón (audio/video)', 'video': 'línea marrón (audio/video)',
-            'marrón': 'línea marrón (audio/video)',
-            'pae': 'pequeños electrodomésticos (pae)',
-        }
-    except Exception:
-        CATEGORIAS_MAPA = {}
+    """
+    Interpreta el prompt con una sola pasada de core.vocabulario (palabras
+    clave fijas + marcas y categorías del catálogo) y recuerda el resultado
+    por prompt normalizado, fecha del día y generación del catálogo.
+    """
+
+    # Sinónimos de categoría; las categorías de la base se agregan solas
+    CATEGORIAS_MAPA = {
+        'línea blanca': 'línea blanca', 'blanca': 'línea blanca',
+        'informática': 'línea gris (informática)', 'gris': 'línea gris (informática)',
+        'audio': 'línea marrón (audio/video)', 'video': 'línea marrón (audio/video)',
+        'marrón': 'línea marrón (audio/video)',
+        'pae': 'pequeños electrodomésticos (pae)',
+    }
     
     CAMPOS_MAPA = {
         'numero de serie': 'numero_serie', 'costo': 'costo',
@@ -36,8 +43,26 @@ class ReportParser:
         'mayo': 5, 'junio': 6, 'julio': 7, 'agosto': 8,
         'septiembre': 9, 'octubre': 10, 'noviembre': 11, 'diciembre': 12
     }
-    
+
+    # Todas las palabras que parse() busca en el prompt
+    PALABRAS_CLAVE = tuple(sorted({
+        'por producto', 'por cliente', 'por categoria', 'por marca',
+        'inventario', 'stock', 'producto', 'venta', 'pedido', 'ingreso',
+        'pdf', 'excel', 'csv',
+        'disponible', 'vendido', 'pendiente', 'completada',
+        'hoy', 'este mes', 'mes pasado',
+        *CAMPOS_MAPA, *MONTH_MAP,
+    }))
+
     def parse(self, prompt):
+        """Interpreta el prompt; el dict devuelto se puede modificar libremente."""
+        prompt = ' '.join(prompt.lower().split())
+        return copy.deepcopy(_parsear(prompt, datetime.now().date(), generacion()))
+
+    def _interpretar(self, prompt, today, vocabulario):
+        encontradas = vocabulario.buscar(prompt)
+        palabras = {palabra for _, palabra in encontradas}
+
         result = {
             'type': None,
             'filters': {},
@@ -48,16 +73,16 @@ class ReportParser:
 
         # --- A. DETECTAR TIPO DE REPORTE (¡ORDEN CORREGIDO!) ---
         # 1. Revisamos INVENTARIO primero, es más específico.
-        if 'por producto' in prompt or 'por cliente' in prompt:
+        if 'por producto' in palabras or 'por cliente' in palabras:
             result['type'] = 'ventas'
         
         # 2. SI NO ES AGRUPADO, buscamos palabras clave de INVENTARIO primero.
         #    "producto" y "stock" son más específicas que "venta".
-        elif 'inventario' in prompt or 'stock' in prompt or 'producto' in prompt:
+        elif 'inventario' in palabras or 'stock' in palabras or 'producto' in palabras:
             result['type'] = 'inventario'
 
         # 3. Si no es inventario, RECIÉN buscamos palabras de ventas.
-        elif 'venta' in prompt or 'pedido' in prompt or 'ingreso' in prompt:
+        elif 'venta' in palabras or 'pedido' in palabras or 'ingreso' in palabras:
             result['type'] = 'ventas'
         
         else:
@@ -68,39 +93,40 @@ class ReportParser:
                 raise ValueError("No entiendo si pides un reporte de 'ventas' o de 'inventario'.")
 
         # --- B. DETECTAR FORMATO ---
-        if 'pdf' in prompt: result['format'] = 'pdf'
-        elif 'excel' in prompt: result['format'] = 'excel'
+        if 'pdf' in palabras: result['format'] = 'pdf'
+        elif 'excel' in palabras: result['format'] = 'excel'
+        elif 'csv' in palabras: result['format'] = 'csv'
 
         # --- C. DETECTAR AGRUPACIÓN (¡LÓGICA CORREGIDA!) ---
         # La agrupación depende del tipo de reporte que ya detectamos
         
         if result['type'] == 'ventas':
-            if 'por cliente' in prompt:
+            if 'por cliente' in palabras:
                 result['group_by'] = 'cliente'
-            elif 'por producto' in prompt: # "por producto" SÓLO aplica a ventas
+            elif 'por producto' in palabras: # "por producto" SÓLO aplica a ventas
                 result['group_by'] = 'producto'
-            elif 'por categoria' in prompt:
+            elif 'por categoria' in palabras:
                 result['group_by'] = 'categoria'
-            elif 'por marca' in prompt:
+            elif 'por marca' in palabras:
                 result['group_by'] = 'marca'
         
         elif result['type'] == 'inventario':
             # "por producto" o "por cliente" no tienen sentido aquí
-            if 'por categoria' in prompt: 
+            if 'por categoria' in palabras: 
                 result['group_by'] = 'categoria'
-            elif 'por marca' in prompt:
+            elif 'por marca' in palabras:
                 result['group_by'] = 'marca'
 
         # --- D. DETECTAR FILTROS (Sin cambios, ya era correcto) ---
         
         # Filtros de Estado
-        if 'disponible' in prompt and result['type'] == 'inventario':
+        if 'disponible' in palabras and result['type'] == 'inventario':
             result['filters']['estado'] = 'disponible'
-        elif 'vendido' in prompt and result['type'] == 'inventario':
+        elif 'vendido' in palabras and result['type'] == 'inventario':
             result['filters']['estado'] = 'vendido'
-        elif 'pendiente' in prompt and result['type'] == 'ventas':
+        elif 'pendiente' in palabras and result['type'] == 'ventas':
             result['filters']['estado'] = 'pendiente'
-        elif 'completada' in prompt and result['type'] == 'ventas':
+        elif 'completada' in palabras and result['type'] == 'ventas':
             result['filters']['estado'] = 'completada'
         
         # Filtros de Fecha
@@ -110,15 +136,13 @@ class ReportParser:
             if result['group_by'] in ['producto', 'categoria', 'marca']:
                 date_prefix = 'venta__fecha__' 
 
-            today = datetime.now()
-            
             # 1. Buscamos fechas relativas (como antes)
-            if 'hoy' in prompt:
-                result['filters'][f'{date_prefix}date'] = today.date()
-            elif 'este mes' in prompt:
+            if 'hoy' in palabras:
+                result['filters'][f'{date_prefix}date'] = today
+            elif 'este mes' in palabras:
                 result['filters'][f'{date_prefix}month'] = today.month
                 result['filters'][f'{date_prefix}year'] = today.year
-            elif 'mes pasado' in prompt:
+            elif 'mes pasado' in palabras:
                 last_month = today - relativedelta(months=1)
                 result['filters'][f'{date_prefix}month'] = last_month.month
                 result['filters'][f'{date_prefix}year'] = last_month.year
@@ -130,12 +154,12 @@ class ReportParser:
 
                 # Buscar un nombre de mes
                 for month_name, num in self.MONTH_MAP.items():
-                    if month_name in prompt:
+                    if month_name in palabras:
                         month_num = num
                         break
                 
                 # Buscar un año de 4 dígitos (ej. 2023, 2024, 2025)
-                match_year = re.search(r'(\d{4})', prompt)
+                match_year = _AÑO.search(prompt)
                 if match_year:
                     year_num = int(match_year.group(1))
 
@@ -161,21 +185,22 @@ class ReportParser:
                 filter_prefix = 'detalles__catalogo__'
 
         # 2. Aplicar los filtros con el prefijo correcto
-        for marca in self.MARCAS_CONOCIDAS:
-            if marca in prompt:
+        #    (la primera marca/categoría que aparece en el prompt)
+        for _, palabra in encontradas:
+            if palabra in vocabulario.marcas:
                 # Usamos f-string para construir la clave del filtro
-                result['filters'][f'{filter_prefix}marca__nombre__icontains'] = marca
-                break 
-        
-        for keyword, nombre_categoria in self.CATEGORIAS_MAPA.items():
-            if keyword in prompt:
-                result['filters'][f'{filter_prefix}categoria__nombre__icontains'] = nombre_categoria
+                result['filters'][f'{filter_prefix}marca__nombre__icontains'] = palabra
+                break
+
+        for _, palabra in encontradas:
+            if palabra in vocabulario.categorias:
+                result['filters'][f'{filter_prefix}categoria__nombre__icontains'] = vocabulario.categorias[palabra]
                 break
         
         # --- E. DETECTAR CAMPOS SELECCIONADOS (Sin cambios, ya era correcto) ---
         if not result['group_by']:
             for keyword, field_name in self.CAMPOS_MAPA.items():
-                if keyword in prompt:
+                if keyword in palabras:
                     result['select_fields'].append(field_name)
             
             if not result['select_fields']:
@@ -184,4 +209,10 @@ class ReportParser:
                 elif result['type'] == 'ventas':
                     result['select_fields'] = ['id', 'fecha', 'cliente__nombre', 'total', 'estado']
 
-        return result
\ No newline at end of file
+        return result
+
+
+@lru_cache(maxsize=TAMANO_CACHE)
+def _parsear(prompt, today, gen):
+    vocabulario = registro_vocabulario.obtener(ReportParser.PALABRAS_CLAVE, ReportParser.CATEGORIAS_MAPA, gen)
+    return ReportParser()._interpretar(prompt, today, vocabulario)
@@ -0,0 +1,77 @@
+"""
+Señales de inteligencia de negocios: mantienen al día el vocabulario del
+parser de reportes y la caché de resultados de reportes.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from administracion.models import Cliente
+from catalogo.core.stock import stock_modificado
+from catalogo.models import Catalogo, Categoria, Marca, Producto
+from inteligencia_negocios.core import cache_reportes
+from inteligencia_negocios.core.motor import motor_analitico
+from inteligencia_negocios.core.vocabulario import invalidar
+from ventas.models import Venta, DetalleVenta
+
+
+@receiver(post_save, sender=Marca)
+@receiver(post_delete, sender=Marca)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_vocabulario(sender, instance, **kwargs):
+    """
+    Una marca o categoría nueva, renombrada o borrada obliga a recompilar el
+    vocabulario. Se invalida al confirmar la transacción: antes, otro proceso
+    podría recompilar todavía con los datos viejos.
+    """
+    transaction.on_commit(invalidar)
+
+
+@receiver(post_save, sender=Marca)
+@receiver(post_delete, sender=Marca)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Catalogo)
+@receiver(post_delete, sender=Catalogo)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_reportes_maestros(sender, instance, **kwargs):
+    """Nombres de productos, marcas, categorías y clientes aparecen en todos los reportes."""
+    cache_reportes.invalidar(cache_reportes.MAESTROS)
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(stock_modificado)
+def invalidar_reportes_inventario(sender, **kwargs):
+    """Altas, bajas y cambios de estado (ventas, reservas) de unidades."""
+    cache_reportes.invalidar(cache_reportes.INVENTARIO)
+
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def invalidar_reportes_venta(sender, instance, **kwargs):
+    """Solo se invalidan los reportes que cubren el mes de la venta."""
+    cache_reportes.invalidar_venta(instance.fecha)
+
+
+@receiver(post_delete, sender=Venta)
+def quitar_venta_del_motor(sender, instance, **kwargs):
+    """Las bajas no se ven por actualizado_en: se quitan de la copia del motor."""
+    # Al terminar el delete Django ya dejó instance.pk en None
+    venta_id = instance.pk
+    transaction.on_commit(lambda: motor_analitico.olvidar_venta(venta_id))
+
+
+@receiver(post_save, sender=DetalleVenta)
+@receiver(post_delete, sender=DetalleVenta)
+def invalidar_reportes_detalle(sender, instance, **kwargs):
+    """
+    El mes sale de la venta ya cargada; si no lo está, se invalidan todos
+    los meses en vez de consultarla en cada save.
+    """
+    if DetalleVenta.venta.is_cached(instance):
+        cache_reportes.invalidar_venta(instance.venta.fecha)
+    else:
+        cache_reportes.invalidar_venta(None)
@@ -1,3 +1,382 @@
-from django.test import TestCase
+import csv
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+from rest_framework.test import APIClient
+
+from administracion.models import Cliente
+from catalogo.core.stock import marcar_vendidos
+from catalogo.models import Catalogo, Categoria, Marca, Producto
+from inteligencia_negocios.core.cache_reportes import ClaveReporte
+from inteligencia_negocios.core.datos import obtener_datos
+from inteligencia_negocios.core.estandar import obtener, prerenderizar, renderizar
+from inteligencia_negocios.core.motor import MotorAnalitico
+from inteligencia_negocios.core.trabajos import ejecutar_pendientes
+from inteligencia_negocios.core.vocabulario import Automata
+from inteligencia_negocios.generator import ReportGenerator
+from inteligencia_negocios.models import TrabajoReporte
+from inteligencia_negocios.parser import ReportParser
+from ventas.models import DetalleVenta, Venta
+
+
+class ReportGeneratorTests(TestCase):
+    """Los formatos CSV y XLSX se generan en streaming con las mismas filas que el JSON."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(nombre='Cliente Reporte')
+        for total in ('10.00', '25.50', '7.25'):
+            Venta.objects.create(cliente=cliente, estado='completada', subtotal=Decimal(total), impuesto=0, descuento=0)
+        catalogo = Catalogo.objects.create(sku='REP-1', nombre='Producto Reporte', precio=Decimal('99.90'))
+        Producto.objects.create(numero_serie='REP-1-1', costo=Decimal('50.00'), catalogo=catalogo)
+
+    def _generar(self, prompt):
+        return ReportGenerator().generate(ReportParser().parse(prompt))
+
+    def test_csv_en_streaming(self):
+        response = self._generar('reporte de ventas completada con cliente total en csv')
+        self.assertTrue(response.streaming)
+        contenido = b''.join(response.streaming_content).decode('utf-8-sig')
+        filas = list(csv.reader(io.StringIO(contenido)))
+        self.assertEqual(filas[0], ['cliente__nombre', 'total'])
+        self.assertEqual(sorted(fila[1] for fila in filas[1:]), ['10.00', '25.50', '7.25'])
+
+    def test_xlsx_write_only(self):
+        response = self._generar('reporte de ventas por cliente en excel')
+        libro = load_workbook(io.BytesIO(b''.join(response.streaming_content)))
+        filas = list(libro.active.values)
+        self.assertEqual(filas[0], ('cliente__nombre', 'cliente__nit_ci', 'cantidad_compras', 'monto_total'))
+        self.assertEqual(filas[1][2:], (3, 42.75))
+
+    def test_inventario_sin_instanciar_productos(self):
+        with self.assertNumQueries(1):
+            response = self._generar('reporte de inventario con nombre precio garantía numero de serie')
+        self.assertEqual(response.data['report_data'], [
+            {'nombre': 'Producto Reporte', 'precio': Decimal('99.90'), 'garantia_vigente': False, 'numero_serie': 'REP-1-1'},
+        ])
+
+    def test_pdf_paginado(self):
+        with mock.patch('inteligencia_negocios.core.escritores.PDF_FILAS_POR_PAGINA', 2):
+            response = self._generar('reporte de ventas completada con cliente total fecha en pdf')
+        contenido = b''.join(response.streaming_content)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        # 3 ventas de a 2 filas por página
+        self.assertIn(b'/Count 2', contenido)
+
+    def test_sin_datos(self):
+        self.assertEqual(self._generar('reporte de ventas pendiente').status_code, 404)
+
+
+class ReportJobTests(TestCase):
+    """
+    Los pedidos iguales comparten el trabajo mientras está activo, el worker
+    genera el archivo y se descarga al terminar.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(nombre='Cliente Trabajo')
+        Venta.objects.create(cliente=cliente, estado='completada', subtotal=Decimal('30.00'), impuesto=0, descuento=0)
+        cls.user = User.objects.create_user(username='analista', password='secreta123')
+        cls.otro = User.objects.create_user(username='curioso', password='secreta123')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media, REPORTES_EN_PROCESO=False)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_deduplica_y_descarga(self):
+        primero = self.client.post('/api/reports/jobs/', {'prompt': 'ventas por cliente en csv'}, format='json')
+        segundo = self.client.post('/api/reports/jobs/', {'prompt': 'Ventas por cliente en CSV'}, format='json')
+        self.assertEqual(primero.status_code, 202)
+        self.assertEqual(primero.json()['id'], segundo.json()['id'])
+        self.assertTrue(segundo.json()['reutilizado'])
+
+        url = f"/api/reports/jobs/{primero.json()['id']}/"
+        self.assertEqual(self.client.get(url + 'descargar/').status_code, 409)
+
+        self.assertEqual(ejecutar_pendientes(), 1)
+        estado = self.client.get(url).json()
+        self.assertEqual(estado['estado'], 'completado')
+        descarga = self.client.get(url + 'descargar/')
+        self.assertEqual(descarga.status_code, 200)
+        self.assertIn('Cliente Trabajo', b''.join(descarga.streaming_content).decode('utf-8-sig'))
+
+        # Terminado el trabajo, un pedido igual genera uno nuevo
+        tercero = self.client.post('/api/reports/jobs/', {'prompt': 'ventas por cliente en csv'}, format='json')
+        self.assertNotEqual(tercero.json()['id'], primero.json()['id'])
+
+    def test_solo_el_dueno_ve_el_trabajo(self):
+        anonimo = APIClient()
+        self.assertEqual(
+            anonimo.post('/api/reports/jobs/', {'report_key': 'inventory_available_pdf'}, format='json').status_code, 401,
+        )
+
+        respuesta = self.client.post('/api/reports/jobs/', {'prompt': 'ventas por cliente en csv'}, format='json')
+        ejecutar_pendientes()
+        url = f"/api/reports/jobs/{respuesta.json()['id']}/"
+        self.assertEqual(anonimo.get(url + 'descargar/').status_code, 401)
+
+        otro = APIClient()
+        otro.force_authenticate(self.otro)
+        self.assertEqual(otro.get(url).status_code, 404)
+        self.assertEqual(otro.get(url + 'descargar/').status_code, 404)
+        # El mismo pedido de otro usuario es otro trabajo
+        propio = otro.post('/api/reports/jobs/', {'prompt': 'ventas por cliente en csv'}, format='json')
+        self.assertNotEqual(propio.json()['id'], respuesta.json()['id'])
+
+    def test_trabajo_colgado_vuelve_a_la_cola_hasta_agotar_intentos(self):
+        respuesta = self.client.post('/api/reports/jobs/', {'prompt': 'ventas por cliente en csv'}, format='json')
+        url = f"/api/reports/jobs/{respuesta.json()['id']}/"
+        hace_una_hora = timezone.now() - timedelta(hours=1)
+
+        TrabajoReporte.objects.update(estado='procesando', iniciado_en=hace_una_hora, intentos=1)
+        self.assertEqual(self.client.get(url).json()['estado'], 'pendiente')
+
+        TrabajoReporte.objects.update(estado='procesando', iniciado_en=hace_una_hora, intentos=3)
+        estado = self.client.get(url).json()
+        self.assertEqual(estado['estado'], 'error')
+        # Un pedido igual ya no queda pegado al trabajo muerto
+        nuevo = self.client.post('/api/reports/jobs/', {'prompt': 'ventas por cliente en csv'}, format='json')
+        self.assertNotEqual(nuevo.json()['id'], respuesta.json()['id'])
+
+    def test_reporte_sin_datos_termina_en_error(self):
+        respuesta = self.client.post('/api/reports/jobs/', {'prompt': 'ventas pendiente'}, format='json')
+        ejecutar_pendientes()
+        trabajo = TrabajoReporte.objects.get(pk=respuesta.json()['id'])
+        self.assertEqual(trabajo.estado, 'error')
+        self.assertIn('No hay datos', trabajo.error)
+
+
+class ReportParserTests(TestCase):
+    """El vocabulario se compila una vez, se invalida con el catálogo y los resultados se recuerdan."""
+
+    def test_automata_encuentra_palabras_superpuestas(self):
+        automata = Automata(['total', 'subtotal', 'por cliente', 'cliente', 'lg', 'lg electronics'])
+        self.assertEqual(
+            automata.buscar('ventas por cliente con subtotal de lg electronics'),
+            [(7, 'por cliente'), (11, 'cliente'), (23, 'subtotal'), (26, 'total'), (35, 'lg electronics'), (35, 'lg')],
+        )
+
+    def test_marca_nueva_invalida_el_vocabulario(self):
+        parser = ReportParser()
+        self.assertNotIn('detalles__catalogo__marca__nombre__icontains', parser.parse('ventas de zentrix')['filters'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Marca.objects.create(nombre='Zentrix')
+        self.assertEqual(
+            parser.parse('Ventas de  ZENTRIX')['filters']['detalles__catalogo__marca__nombre__icontains'], 'zentrix',
+        )
+
+    def test_resultado_en_cache_no_se_comparte(self):
+        parser = ReportParser()
+        primero = parser.parse('ventas por cliente en pdf')
+        primero['filters']['estado'] = 'modificado'
+        with self.assertNumQueries(0):
+            segundo = parser.parse('ventas por cliente en pdf')
+        self.assertEqual(segundo['filters'], {})
+
+
+class ReportCacheTests(TestCase):
+    """Filas y archivos se reutilizan hasta que entra una venta del período que cubren."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(nombre='Cliente Caché')
+        Venta.objects.create(cliente=cls.cliente, estado='completada', subtotal=Decimal('40.00'), impuesto=0, descuento=0)
+
+    def _generar(self, prompt):
+        return ReportGenerator().generate(ReportParser().parse(prompt))
+
+    def test_filas_y_archivo_compartidos(self):
+        primero = b''.join(self._generar('ventas por cliente este mes en excel').streaming_content)
+        with self.assertNumQueries(0):
+            segundo = b''.join(self._generar('ventas por cliente este mes en excel').streaming_content)
+            # Otro formato del mismo pedido reutiliza las filas
+            self._generar('ventas por cliente este mes en pdf')
+        self.assertEqual(primero, segundo)
+
+    def test_venta_nueva_invalida_su_mes(self):
+        self.assertEqual(self._generar('ventas completada este mes con total').data['report_data'], [{'total': Decimal('40.00')}])
+        with self.captureOnCommitCallbacks(execute=True):
+            Venta.objects.create(cliente=self.cliente, estado='completada', subtotal=Decimal('5.00'), impuesto=0, descuento=0)
+        filas = self._generar('ventas completada este mes con total').data['report_data']
+        self.assertEqual(sorted(fila['total'] for fila in filas), [Decimal('5.00'), Decimal('40.00')])
+
+    def test_invalida_al_confirmar(self):
+        spec = ReportParser().parse('ventas completada este mes con total')
+        version = ClaveReporte(spec).version
+        with self.captureOnCommitCallbacks() as callbacks:
+            Venta.objects.create(cliente=self.cliente, estado='completada', subtotal=Decimal('5.00'), impuesto=0, descuento=0)
+            self.assertEqual(ClaveReporte(spec).version, version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(ClaveReporte(spec).version, version)
+
+    @override_settings(REPORTES_CACHE_TTL_HOY=10, REPORTES_CACHE_TTL_RECIENTE=20, REPORTES_CACHE_TTL_HISTORICO=30)
+    def test_ttl_segun_periodo(self):
+        parser = ReportParser()
+        self.assertEqual(ClaveReporte(parser.parse('ventas de hoy')).ttl, 10)
+        self.assertEqual(ClaveReporte(parser.parse('ventas de este mes')).ttl, 20)
+        self.assertEqual(ClaveReporte(parser.parse('ventas de septiembre 2020')).ttl, 30)
+        self.assertEqual(ClaveReporte(parser.parse('inventario disponible')).ttl, 20)
+
+
+class StandardReportTests(TestCase):
+    """Los reportes estándar se sirven ya generados, con ETag, y se regeneran al cambiar los datos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(nombre='Cliente Estándar')
+        Venta.objects.create(cliente=cls.cliente, estado='completada', subtotal=Decimal('12.00'), impuesto=0, descuento=0)
+        cls.user = User.objects.create_user(username='gerencia', password='secreta123')
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_etag_y_regeneracion(self):
+        url = '/api/standard/sales_this_month_excel/'
+        primera = self.client.get(url)
+        self.assertEqual(primera.status_code, 200)
+        etag = primera['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Venta.objects.create(cliente=self.cliente, estado='completada', subtotal=Decimal('8.00'), impuesto=0, descuento=0)
+        nueva = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(nueva.status_code, 200)
+        self.assertNotEqual(nueva['ETag'], etag)
+        filas = list(load_workbook(io.BytesIO(b''.join(nueva.streaming_content))).active.values)
+        self.assertEqual(len(filas), 3)
+
+    def test_venta_de_stock_regenera_el_inventario(self):
+        catalogo = Catalogo.objects.create(sku='EST-1', nombre='Producto Estándar', precio=Decimal('10.00'))
+        for serie in ('EST-1-1', 'EST-1-2'):
+            Producto.objects.create(numero_serie=serie, costo=Decimal('5.00'), catalogo=catalogo)
+        self.assertTrue(obtener('inventory_available_pdf').archivo)
+
+        # marcar_vendidos cambia el estado con UPDATE, sin post_save
+        with self.captureOnCommitCallbacks(execute=True):
+            marcar_vendidos({catalogo.pk: 2})
+        self.assertFalse(obtener('inventory_available_pdf').archivo)
+
+    def test_reporte_viejo_se_regenera(self):
+        primero = obtener('sales_this_month_excel')
+        self.assertEqual(obtener('sales_this_month_excel').generado_en, primero.generado_en)
+        with override_settings(REPORTES_ESTANDAR_MAX_EDAD=0):
+            regenerado = obtener('sales_this_month_excel')
+        self.assertGreater(regenerado.generado_en, primero.generado_en)
+        # Mismas filas: el mismo ETag y el mismo archivo, aunque openpyxl grabe otra hora
+        self.assertEqual((regenerado.etag, regenerado.archivo.name), (primero.etag, primero.archivo.name))
+
+    def test_archivo_borrado_por_otro_request(self):
+        anterior = obtener('sales_this_month_excel')
+        Venta.objects.create(cliente=self.cliente, estado='completada', subtotal=Decimal('3.00'), impuesto=0, descuento=0)
+        # Otro request regenera el reporte y borra el archivo anterior
+        vigente = renderizar('sales_this_month_excel')
+        self.assertFalse(default_storage.exists(anterior.archivo.name))
+        with mock.patch('inteligencia_negocios.views.estandar.obtener', side_effect=[anterior, vigente]):
+            response = self.client.get('/api/standard/sales_this_month_excel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(b''.join(response.streaming_content))
+
+    def test_prerenderizar_solo_lo_viejo(self):
+        self.assertEqual(prerenderizar(), ['sales_this_month_excel', 'inventory_available_pdf'])
+        self.assertEqual(prerenderizar(), [])
+        self.assertEqual(self.client.get('/api/standard/no_existe/').status_code, 404)
+
+
+class MotorAnaliticoTests(TestCase):
+    """El motor columnar devuelve lo mismo que el ORM y ve las ventas nuevas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        marca = Marca.objects.create(nombre='Motorola Test')
+        categoria = Categoria.objects.create(nombre='Celulares Test')
+        cls.catalogos = [
+            Catalogo.objects.create(sku='MOT-1', nombre='Equipo Uno', precio=Decimal('100.00'), marca=marca, categoria=categoria),
+            Catalogo.objects.create(sku='MOT-2', nombre='Equipo Dos', precio=Decimal('35.50')),
+        ]
+        cls.clientes = [Cliente.objects.create(nombre='Ana', nit_ci='1'), Cliente.objects.create(nombre='Beto')]
+        for i, estado in enumerate(['completada', 'completada', 'pendiente']):
+            cls._vender(cls.clientes[i % 2], estado, [(cls.catalogos[0], i + 1), (cls.catalogos[1], 2)])
+
+    @staticmethod
+    def _vender(cliente, estado, items):
+        venta = Venta.objects.create(cliente=cliente, estado=estado, subtotal=Decimal('0.00'), impuesto=0, descuento=0)
+        for catalogo, cantidad in items:
+            DetalleVenta.objects.create(
+                venta=venta, catalogo=catalogo, cantidad=cantidad, precio_unitario=catalogo.precio,
+                subtotal=catalogo.precio * cantidad, total=catalogo.precio * cantidad,
+            )
+        venta.subtotal = sum(catalogo.precio * cantidad for catalogo, cantidad in items)
+        venta.save()
+
+    def _comparar(self, motor, prompt):
+        spec = ReportParser().parse(prompt)
+        self.assertTrue(motor.soporta(spec), prompt)
+        columnas, filas = motor.consultar(spec)
+        orm = obtener_datos(spec)
+        self.assertEqual(columnas, orm.columnas)
+        self.assertCountEqual(filas, list(orm))
+        return filas
+
+    def test_igual_que_el_orm(self):
+        motor = MotorAnalitico()
+        motor.cargar()
+        for prompt in (
+            'ventas por cliente', 'ventas por cliente completada este mes', 'ventas por producto',
+            'ventas por marca', 'ventas por categoria este mes', 'ventas por producto motorola test',
+        ):
+            self._comparar(motor, prompt)
+        self.assertFalse(motor.soporta(ReportParser().parse('ventas completada con total')))
+
+    def test_actualizacion_incremental(self):
+        motor = MotorAnalitico()
+        motor.cargar()
+        with self.captureOnCommitCallbacks(execute=True):
+            self._vender(self.clientes[1], 'completada', [(self.catalogos[1], 10)])
+        filas = self._comparar(motor, 'ventas por producto')
+        self.assertIn(('Equipo Dos', 16, Decimal('568.00')), filas)
+
+    def test_venta_borrada_sale_del_motor(self):
+        motor = MotorAnalitico()
+        motor.cargar()
+        venta = Venta.objects.filter(estado='completada').first()
+        with mock.patch('inteligencia_negocios.signals.motor_analitico', motor), \
+                self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                venta.delete()
+        self._comparar(motor, 'ventas por cliente')
+        self._comparar(motor, 'ventas por producto')
+
+    def test_obtener_datos_usa_el_motor(self):
+        motor = MotorAnalitico()
+        motor.cargar()
+        spec = ReportParser().parse('ventas por cliente completada')
+        with override_settings(REPORTES_MOTOR_COLUMNAR=True), \
+                mock.patch('inteligencia_negocios.core.datos.motor_analitico', motor), \
+                self.assertNumQueries(0):
+            filas = list(obtener_datos(spec))
+        self.assertEqual(filas, [('Beto', None, 1, Decimal('271.00')), ('Ana', '1', 1, Decimal('171.00'))])
@@ -1,8 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import GenerateReportView, StandardReportView
+from .views import GenerateReportView, StandardReportView, ReportJobView, ReportJobDetailView, ReportJobDownloadView
 
 urlpatterns = [
     path('reports/', GenerateReportView.as_view(), name='generate_report'),
+    path('reports/jobs/', ReportJobView.as_view(), name='report_jobs'),
+    path('reports/jobs/<uuid:job_id>/', ReportJobDetailView.as_view(), name='report_job_detail'),
+    path('reports/jobs/<uuid:job_id>/descargar/', ReportJobDownloadView.as_view(), name='report_job_download'),
     path('standard/<str:report_key>/', StandardReportView.as_view(), name='standard_report'),
-]
\ No newline at end of file
+]
@@ -1,9 +1,17 @@
+from django.http import FileResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from .parser import ReportParser
 from .generator import ReportGenerator
+from .core import estandar
+from .core.escritores import CONTENT_TYPES
+from .core.trabajos import encolar, reanudar
+from .models import TrabajoReporte
 from rest_framework.permissions import IsAuthenticated
-from datetime import datetime
 
 class GenerateReportView(APIView):
     def post(self, request):
@@ -18,48 +26,131 @@ class GenerateReportView(APIView):
         generator = ReportGenerator()
         return generator.generate(parsed_request)
 
+
 class StandardReportView(APIView):
     """
-    Genera reportes predefinidos y estándar sin necesidad de un prompt.
+    Reportes predefinidos y estándar sin necesidad de un prompt
+    (registrados en core/estandar.py). Se sirven ya generados, con ETag y
+    Last-Modified: una descarga repetida sin cambios responde 304.
     """
     permission_classes = [IsAuthenticated]
 
     def get(self, request, report_key):
-        
-        # 1. PREPARAMOS EL PLAN (El dict que el Parser solía crear)
-        parsed_request = {}
-        today = datetime.now()
-
-        # 2. DECIDIMOS QUÉ REPORTE HACER BASADO EN LA URL
-        if report_key == 'sales_this_month_excel':
-            parsed_request = {
-                'type': 'ventas',
-                'filters': {
-                    'fecha__month': today.month,
-                    'fecha__year': today.year
-                },
-                'format': 'excel',
-                'group_by': None,
-                'select_fields': ['id', 'fecha', 'cliente__nombre', 'total', 'estado']
-            }
-        
-        elif report_key == 'inventory_available_pdf':
-            parsed_request = {
-                'type': 'inventario',
-                'filters': {'estado': 'disponible'},
-                'format': 'pdf',
-                'group_by': 'categoria', # Agrupado por categoría
-                'select_fields': []
-            }
-        
+        # Si otro request lo regenera entre obtener() y abrir el archivo, el
+        # anterior ya no existe: se vuelve a pedir una vez
+        for intento in range(2):
+            registro = estandar.obtener(report_key)
+            if registro is None:
+                return Response({'error': 'Reporte no válido.'}, status=404)
+            if not registro.archivo:
+                return Response({'error': 'No hay datos para este reporte'}, status=404)
+
+            etag = quote_etag(registro.etag)
+            ultima_modificacion = int(registro.generado_en.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+            if response is not None:
+                break
+            try:
+                archivo = registro.archivo.open('rb')
+            except FileNotFoundError:
+                if intento:
+                    raise
+                continue
+            response = FileResponse(
+                archivo,
+                as_attachment=True,
+                filename=registro.nombre_archivo,
+                content_type=CONTENT_TYPES[registro.formato],
+            )
+            break
+
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(ultima_modificacion)
+        # Se puede guardar, pero siempre se revalida
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+def _estado_trabajo(request, trabajo):
+    data = {
+        'id': str(trabajo.id),
+        'estado': trabajo.estado,
+        'formato': trabajo.formato,
+        'creado_en': trabajo.creado_en,
+        'terminado_en': trabajo.terminado_en,
+    }
+    if trabajo.estado == 'completado':
+        data['descarga'] = request.build_absolute_uri(reverse('report_job_download', args=[trabajo.id]))
+    elif trabajo.estado == 'error':
+        data['error'] = trabajo.error
+    return data
+
+
+def _trabajo_del_usuario(request, job_id):
+    """El trabajo si es del usuario (o si es staff); si no, 404."""
+    trabajos = TrabajoReporte.objects.all()
+    if not request.user.is_staff:
+        trabajos = trabajos.filter(usuario=request.user)
+    return get_object_or_404(trabajos, pk=job_id)
+
+
+class ReportJobView(APIView):
+    """
+    Reportes en segundo plano, para los que tardan más que un request.
+    Ruta: POST /api/reports/jobs/
+    Body: {"prompt": "ventas por marca en excel"} o {"report_key": "sales_this_month_excel"}
+    Responde 202 con el id del trabajo; un pedido igual a uno que todavía se
+    está generando (del mismo usuario) devuelve ese mismo trabajo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        report_key = request.data.get('report_key')
+        if report_key:
+            parsed_request = estandar.plan(report_key)
+            if parsed_request is None:
+                return Response({'error': 'Reporte no válido.'}, status=404)
         else:
-            return Response({'error': 'Reporte no válido.'}, status=404)
+            try:
+                parsed_request = ReportParser().parse(request.data.get('prompt', '').lower())
+            except ValueError as e:
+                return Response({'error': str(e)}, status=400)
 
-        # 3. LLAMAMOS AL MISMO GENERADOR
-        # Reutilizamos 100% de nuestra lógica de PDF/Excel
-        generator = ReportGenerator()
-        return generator.generate(parsed_request)
+        if parsed_request['format'] not in CONTENT_TYPES:
+            return Response({'error': 'Formato no soportado.'}, status=400)
 
-# Create your views here.
+        trabajo, creado = encolar(parsed_request, request.user)
+        data = _estado_trabajo(request, trabajo)
+        data['reutilizado'] = not creado
+        return Response(data, status=202)
+
+
+class ReportJobDetailView(APIView):
+    """
+    Estado de un trabajo de reporte.
+    Ruta: GET /api/reports/jobs/<id>/
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        trabajo = reanudar(_trabajo_del_usuario(request, job_id))
+        return Response(_estado_trabajo(request, trabajo))
+
+
+class ReportJobDownloadView(APIView):
+    """
+    Descarga del archivo de un trabajo completado.
+    Ruta: GET /api/reports/jobs/<id>/descargar/
+    """
+    permission_classes = [IsAuthenticated]
 
-# Create your views here.
+    def get(self, request, job_id):
+        trabajo = _trabajo_del_usuario(request, job_id)
+        if trabajo.estado != 'completado' or not trabajo.archivo:
+            return Response({'error': 'El reporte todavía no está listo.', 'estado': trabajo.estado}, status=409)
+        return FileResponse(
+            trabajo.archivo.open('rb'),
+            as_attachment=True,
+            filename=trabajo.nombre_archivo,
+            content_type=CONTENT_TYPES[trabajo.formato],
+        )
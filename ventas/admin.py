@@ -1,5 +1,6 @@
 from django.contrib import admin
 from ventas.models import Cart, CartItem, Venta, DetalleVenta, Pago
+from ventas.core.cart_store import cart_store
 
 
 # ==================== ADMIN PARA CARRITO ====================
@@ -16,7 +17,18 @@ class CartAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['user__username', 'user__email']
     inlines = [CartItemInline]
-    readonly_fields = ['id', 'created_at', 'updated_at', 'total_price']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'version', 'total_price']
+
+    def get_queryset(self, request):
+        # total_price en list_display sin una consulta por carrito
+        return super().get_queryset(request).con_items()
+
+    def save_related(self, request, form, formsets, change):
+        # Los cambios hechos desde el admin no pasan por el cart_store:
+        # se descarta la foto en caché para que la app vea el carrito real.
+        super().save_related(request, form, formsets, change)
+        if form.instance.user_id:
+            cart_store.invalidar(form.instance.user)
 
 
 # ==================== ADMIN PARA VENTAS ====================
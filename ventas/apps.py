@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class VentasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ventas'
+
+    def ready(self):
+        from ventas import signals  # noqa: F401
+
+        if settings.SALES_MODEL_WARMUP:
+            from ventas.core.prediccion import registro_modelo
+            try:
+                registro_modelo.obtener()
+            except FileNotFoundError:
+                # Sin modelo entrenado: SalesPredictionView responde 503
+                pass
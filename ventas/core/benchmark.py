@@ -0,0 +1,253 @@
+"""
+Benchmark de los caminos calientes de la API.
+
+Cada escenario es una petición real (APIClient) a un endpoint: catálogo,
+carrito (lectura y modificación), checkout, listado y detalle de ventas,
+dashboards, reportes en JSON/Excel/PDF y predicción. Por escenario se mide
+la latencia (p50/p95, en ms) y la cantidad de consultas SQL sobre datos
+sembrados con ventas.core.semillas a distintas escalas.
+
+Los resultados se guardan como JSON y sirven de línea base: comparar()
+informa una regresión si un escenario hace más consultas que en la base (o
+que su presupuesto fijo) o si su p95 empeora más allá de la tolerancia.
+"""
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from administracion.models import Cliente
+from catalogo.models import Catalogo
+from ventas.core.cart_items import sumar_items
+from ventas.core.cart_store import cart_store
+from ventas.core.prediccion import registro_modelo
+from ventas.core.semillas import sembrar
+from ventas.models import Cart, Venta
+
+# Parámetros de sembrar() por escala
+ESCALAS = {
+    'chica': {'ventas': 1000, 'catalogos': 30, 'unidades_por_catalogo': 50, 'dias': 365},
+    'mediana': {'ventas': 10000, 'catalogos': 100, 'unidades_por_catalogo': 100, 'dias': 730},
+    'grande': {'ventas': 100000, 'catalogos': 300, 'unidades_por_catalogo': 200, 'dias': 1095},
+}
+
+# Margen de latencia por defecto antes de considerar una regresión
+TOLERANCIA = 0.5
+HOLGURA_MS = 5.0
+
+
+class EscenarioFallido(Exception):
+    """La petición de un escenario no devolvió el estado esperado."""
+
+    def __init__(self, nombre, estado, contenido):
+        self.nombre = nombre
+        self.estado = estado
+        super().__init__(f"{nombre}: estado {estado}: {contenido[:300]!r}")
+
+
+class Contexto:
+    """Datos compartidos por los escenarios de una corrida."""
+
+    def __init__(self, user, cliente_id, catalogo_ids, venta_id):
+        self.user = user
+        self.cliente_id = cliente_id
+        self.catalogo_ids = catalogo_ids
+        self.venta_id = venta_id
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.vuelta = 0
+
+    def siguientes_catalogos(self, cantidad):
+        """Catálogos rotativos, para no agotar el stock de uno solo."""
+        inicio = self.vuelta * cantidad
+        self.vuelta += 1
+        return [self.catalogo_ids[(inicio + n) % len(self.catalogo_ids)] for n in range(cantidad)]
+
+
+class Escenario:
+    """
+    Una petición a medir. peticion(ctx) hace la llamada y devuelve la
+    respuesta; preparar(ctx), si existe, corre antes de cada repetición y no
+    se mide. consultas_max es un presupuesto fijo, independiente de la base.
+    """
+
+    def __init__(self, nombre, peticion, preparar=None, estado=200, consultas_max=None):
+        self.nombre = nombre
+        self.peticion = peticion
+        self.preparar = preparar
+        self.estado = estado
+        self.consultas_max = consultas_max
+
+
+def _llenar_carrito(ctx):
+    cart, _ = Cart.objects.get_or_create(user=ctx.user)
+    cart.items.all().delete()
+    sumar_items(cart.pk, {catalogo_id: 1 for catalogo_id in ctx.siguientes_catalogos(3)})
+    cart_store.invalidar(ctx.user)
+
+
+def _reporte(prompt):
+    return lambda ctx: ctx.client.post('/api/reports/', {'prompt': prompt}, format='json')
+
+
+ESCENARIOS = [
+    Escenario('catalogo_lista', lambda ctx: ctx.client.get('/api/catalogo/'), consultas_max=5),
+    Escenario('carrito_leer', lambda ctx: ctx.client.get('/api/cart/my_cart/'), consultas_max=3),
+    Escenario(
+        'carrito_agregar',
+        lambda ctx: ctx.client.post(
+            '/api/cart/add_item/',
+            {'catalogo_id': ctx.siguientes_catalogos(1)[0], 'quantity': 1},
+            format='json',
+        ),
+        consultas_max=12,
+    ),
+    Escenario(
+        'checkout',
+        lambda ctx: ctx.client.post('/api/cart/checkout/', {'cliente_id': ctx.cliente_id}, format='json'),
+        preparar=_llenar_carrito,
+        estado=201,
+        # Incluye el recálculo del resumen diario que corre en on_commit
+        consultas_max=30,
+    ),
+    Escenario('ventas_lista', lambda ctx: ctx.client.get('/api/ventas/')),
+    Escenario('ventas_detalle', lambda ctx: ctx.client.get(f'/api/ventas/{ctx.venta_id}/'), consultas_max=5),
+    Escenario('dashboard_estadisticas', lambda ctx: ctx.client.get('/api/ventas/estadisticas/'), consultas_max=5),
+    Escenario(
+        'dashboard_ventas_en_el_tiempo',
+        lambda ctx: ctx.client.get('/api/ventas/dashboard-sales-over-time/?periodo=mes'),
+        consultas_max=5,
+    ),
+    Escenario('dashboard_productos', lambda ctx: ctx.client.get('/api/ventas/dashboard-products/'), consultas_max=5),
+    Escenario('dashboard_clientes', lambda ctx: ctx.client.get('/api/ventas/dashboard-clients/'), consultas_max=5),
+    Escenario('reporte_json', _reporte('reporte de ventas por cliente')),
+    Escenario('reporte_excel', _reporte('reporte de ventas por cliente en excel')),
+    Escenario('reporte_pdf', _reporte('reporte de ventas por cliente en pdf')),
+    Escenario('prediccion', lambda ctx: ctx.client.get('/api/sales-prediction/'), consultas_max=2),
+]
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) con interpolación lineal."""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    posicion = (len(ordenados) - 1) * p / 100
+    inferior = int(posicion)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicion - inferior)
+
+
+def _contenido(response):
+    # Las respuestas en streaming se consumen dentro de la medición
+    if getattr(response, 'streaming', False):
+        return b''.join(response.streaming_content)
+    return response.content
+
+
+def medir(escenario, ctx, repeticiones=20, calentamiento=2):
+    """
+    Ejecuta el escenario calentamiento + repeticiones veces y devuelve
+    {'p50_ms', 'p95_ms', 'consultas', 'repeticiones'} de las repeticiones
+    medidas. consultas es el máximo observado.
+    """
+    tiempos, consultas = [], 0
+    for vuelta in range(calentamiento + repeticiones):
+        if escenario.preparar:
+            escenario.preparar(ctx)
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            response = escenario.peticion(ctx)
+            contenido = _contenido(response)
+            transcurrido = (time.perf_counter() - inicio) * 1000
+        if response.status_code != escenario.estado:
+            raise EscenarioFallido(escenario.nombre, response.status_code, contenido)
+        if vuelta >= calentamiento:
+            tiempos.append(transcurrido)
+            consultas = max(consultas, len(capturadas))
+    return {
+        'p50_ms': round(percentil(tiempos, 50), 3),
+        'p95_ms': round(percentil(tiempos, 95), 3),
+        'consultas': consultas,
+        'repeticiones': repeticiones,
+    }
+
+
+def preparar_contexto():
+    """Usuario de benchmark, un cliente, los catálogos y una venta completada."""
+    user, _ = User.objects.get_or_create(username='benchmark')
+    return Contexto(
+        user=user,
+        cliente_id=Cliente.objects.values_list('id', flat=True).first(),
+        catalogo_ids=list(Catalogo.objects.order_by('id').values_list('id', flat=True)),
+        venta_id=Venta.objects.filter(estado='completada').values_list('id', flat=True).first(),
+    )
+
+
+def ejecutar(siembra, repeticiones=20, calentamiento=2, escenarios=None, progreso=None):
+    """
+    Siembra los datos (parámetros de sembrar()), entrena un modelo temporal
+    para la predicción y mide cada escenario. Devuelve {nombre: métricas}.
+    Debe correr sobre una base descartable.
+    """
+    avisar = progreso or (lambda mensaje: None)
+    escenarios = escenarios or ESCENARIOS
+
+    avisar(f"Sembrando {siembra['ventas']} ventas...")
+    sembrar(prefijo='BENCH', procesos=1, **siembra)
+
+    directorio = tempfile.mkdtemp(prefix='benchmark-')
+    try:
+        with override_settings(SALES_MODEL_PATH=os.path.join(directorio, 'sales_model.pkl')):
+            call_command('train_sales_model', '--full', stdout=io.StringIO())
+            registro_modelo.descartar()
+            caches[cart_store.alias].clear()
+
+            ctx = preparar_contexto()
+            resultados = {}
+            for escenario in escenarios:
+                avisar(f"  {escenario.nombre}...")
+                resultados[escenario.nombre] = medir(escenario, ctx, repeticiones, calentamiento)
+                if escenario.consultas_max is not None:
+                    resultados[escenario.nombre]['consultas_max'] = escenario.consultas_max
+    finally:
+        registro_modelo.descartar()
+        shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+def comparar(actual, base=None, tolerancia=TOLERANCIA, holgura_ms=HOLGURA_MS):
+    """
+    Compara {escala: {escenario: métricas}} contra la línea base con la misma
+    forma. Devuelve la lista de regresiones (mensajes); vacía si no hay.
+    """
+    regresiones = []
+    for escala, escenarios in actual.items():
+        for nombre, metricas in escenarios.items():
+            etiqueta = f"[{escala}] {nombre}"
+            maximo = metricas.get('consultas_max')
+            if maximo is not None and metricas['consultas'] > maximo:
+                regresiones.append(f"{etiqueta}: {metricas['consultas']} consultas (presupuesto {maximo})")
+
+            previo = (base or {}).get(escala, {}).get(nombre)
+            if previo is None:
+                continue
+            if metricas['consultas'] > previo['consultas']:
+                regresiones.append(
+                    f"{etiqueta}: {metricas['consultas']} consultas (línea base {previo['consultas']})"
+                )
+            limite = previo['p95_ms'] * (1 + tolerancia) + holgura_ms
+            if metricas['p95_ms'] > limite:
+                regresiones.append(
+                    f"{etiqueta}: p95 {metricas['p95_ms']:.1f} ms (línea base {previo['p95_ms']:.1f} ms, "
+                    f"límite {limite:.1f} ms)"
+                )
+    return regresiones
@@ -0,0 +1,104 @@
+"""
+Escrituras de ítems del carrito en una sola sentencia.
+
+sumar_items hace un upsert (INSERT ... ON CONFLICT (cart_id, catalogo_id)
+DO UPDATE SET quantity = quantity + n) para todas las líneas a la vez, en vez
+de get_or_create + quantity += n + save() por ítem. fijar_items deja
+cantidades absolutas (0 elimina la línea), útil para sincronizar un carrito
+armado sin conexión.
+"""
+from django.db import connection
+from django.db.models import F
+
+from catalogo.models import Catalogo
+from ventas.models import CartItem
+
+# Límite de PositiveSmallIntegerField: la suma se recorta en vez de desbordar
+# (se suma como INTEGER para que smallint no falle antes del recorte)
+CANTIDAD_MAXIMA = 32767
+
+
+class CatalogosInexistentes(Exception):
+    """Alguna línea apunta a un catálogo que no existe."""
+
+    def __init__(self, ids):
+        self.ids = sorted(ids)
+        super().__init__(f"Catálogos inexistentes: {self.ids}")
+
+
+def validar_catalogos(catalogo_ids):
+    """Comprueba en una consulta que todos los catálogos existan."""
+    catalogo_ids = set(catalogo_ids)
+    existentes = set(Catalogo.objects.filter(pk__in=catalogo_ids).values_list('pk', flat=True))
+    faltantes = catalogo_ids - existentes
+    if faltantes:
+        raise CatalogosInexistentes(faltantes)
+
+
+def _soporta_upsert():
+    return (
+        connection.vendor in ('postgresql', 'sqlite')
+        and connection.features.supports_update_conflicts_with_target
+    )
+
+
+def sumar_items(cart_id, lineas):
+    """
+    Suma cantidades al carrito: lineas es {catalogo_id: cantidad}.
+    Las líneas nuevas se insertan y las existentes se incrementan, todo en
+    una sentencia (o una por línea en motores sin ON CONFLICT).
+    """
+    if not lineas:
+        return
+
+    if not _soporta_upsert():
+        for catalogo_id, cantidad in lineas.items():
+            actualizados = CartItem.objects.filter(cart_id=cart_id, catalogo_id=catalogo_id).update(
+                quantity=F('quantity') + cantidad
+            )
+            if not actualizados:
+                CartItem.objects.create(cart_id=cart_id, catalogo_id=catalogo_id, quantity=cantidad)
+        return
+
+    qn = connection.ops.quote_name
+    tabla = qn(CartItem._meta.db_table)
+    # Cart.id es UUID: en SQLite se guarda como texto sin guiones
+    cart = CartItem._meta.get_field('cart').get_db_prep_value(cart_id, connection)
+    minimo = 'LEAST' if connection.vendor == 'postgresql' else 'MIN'
+
+    params = []
+    for catalogo_id, cantidad in lineas.items():
+        params.extend([cart, catalogo_id, min(cantidad, CANTIDAD_MAXIMA)])
+    valores = ', '.join(['(%s, %s, %s)'] * len(lineas))
+    sql = f"""
+        INSERT INTO {tabla} ({qn('cart_id')}, {qn('catalogo_id')}, {qn('quantity')})
+        VALUES {valores}
+        ON CONFLICT ({qn('cart_id')}, {qn('catalogo_id')})
+        DO UPDATE SET {qn('quantity')} = {minimo}(
+            CAST({tabla}.{qn('quantity')} AS INTEGER) + excluded.{qn('quantity')}, %s
+        )
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params + [CANTIDAD_MAXIMA])
+
+
+def fijar_items(cart_id, lineas):
+    """
+    Deja cantidades absolutas: lineas es {catalogo_id: cantidad}; una
+    cantidad de 0 elimina la línea. Un DELETE y un upsert en total.
+    """
+    eliminar = [catalogo_id for catalogo_id, cantidad in lineas.items() if cantidad <= 0]
+    if eliminar:
+        CartItem.objects.filter(cart_id=cart_id, catalogo_id__in=eliminar).delete()
+
+    items = [
+        CartItem(cart_id=cart_id, catalogo_id=catalogo_id, quantity=cantidad)
+        for catalogo_id, cantidad in lineas.items()
+        if cantidad > 0
+    ]
+    if not items:
+        return
+    conflicto = {}
+    if connection.features.supports_update_conflicts_with_target:
+        conflicto['unique_fields'] = ['cart', 'catalogo']
+    CartItem.objects.bulk_create(items, update_conflicts=True, update_fields=['quantity'], **conflicto)
@@ -0,0 +1,138 @@
+"""
+Almacén del carrito activo en caché con escritura directa (write-through)
+a Cart/CartItem.
+
+La caché guarda, por usuario, una "foto" del carrito ya serializado junto a
+su versión. Las lecturas (my_cart) se responden desde la caché sin tocar la
+base; cada modificación se aplica en la base dentro de una transacción que
+bloquea la fila del carrito, incrementa Cart.version y reescribe la foto
+antes de liberar el bloqueo, de modo que la caché nunca queda con una
+versión más vieja que la última confirmada.
+
+El backend es el de CART_CACHE_ALIAS (locmem en desarrollo/tests, Redis en
+producción).
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from ventas.models import Cart
+from ventas.serializers.serializers_cart import CartSerializer
+
+
+class VersionConflicto(Exception):
+    """
+    El cliente modificó una versión del carrito que ya no es la actual
+    (otra pestaña o dispositivo lo cambió antes). Lleva la foto vigente.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        super().__init__(
+            f"El carrito está en la versión {snapshot['version']}; recargue antes de modificarlo"
+        )
+
+
+class CartStore:
+    """
+    Carrito por usuario en caché, con la base de datos como fuente de verdad.
+
+    Uso:
+        snapshot = cart_store.leer(user)                  # {'version', 'data'}
+        snapshot = cart_store.escribir(user, mutacion)    # mutacion(cart)
+    """
+
+    def __init__(self, alias=None, ttl=None):
+        self.alias = alias or settings.CART_CACHE_ALIAS
+        self.ttl = settings.CART_CACHE_TTL if ttl is None else ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _clave(self, user_id):
+        return f'cart:snapshot:{user_id}'
+
+    def _snapshot(self, cart):
+        """Serializa el carrito con ítems y catálogos precargados."""
+        prefetch_related_objects([cart], Cart.prefetch_items())
+        return {'version': cart.version, 'data': CartSerializer(cart).data}
+
+    def leer(self, user):
+        """
+        Devuelve la foto del carrito del usuario; en un fallo de caché la
+        reconstruye desde la base (creando el carrito si no existe).
+        """
+        clave = self._clave(user.pk)
+        snapshot = self.cache.get(clave)
+        if snapshot is None:
+            cart, _ = Cart.objects.get_or_create(user=user)
+            snapshot = self._snapshot(cart)
+            # add y no set: si una escritura ya guardó una versión más
+            # nueva mientras leíamos, no la pisamos con la nuestra.
+            self.cache.add(clave, snapshot, self.ttl)
+        return snapshot
+
+    def obtener_carrito(self, user):
+        """
+        Carrito del usuario como instancia del modelo, usando el id de la
+        foto en caché para evitar el get_or_create.
+        """
+        snapshot = self.cache.get(self._clave(user.pk))
+        if snapshot is not None:
+            cart = Cart.objects.filter(pk=snapshot['data']['id'], user=user).first()
+            if cart is not None:
+                return cart
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return cart
+
+    def _bloquear(self, user):
+        """Carrito del usuario con su fila bloqueada (SELECT ... FOR UPDATE)."""
+        snapshot = self.cache.get(self._clave(user.pk))
+        if snapshot is not None:
+            cart = Cart.objects.select_for_update().filter(pk=snapshot['data']['id'], user=user).first()
+            if cart is not None:
+                return cart
+        cart, _ = Cart.objects.get_or_create(user=user)
+        return Cart.objects.select_for_update().get(pk=cart.pk)
+
+    def escribir(self, user, mutacion, version_esperada=None):
+        """
+        Aplica mutacion(cart) en la base y actualiza la caché.
+
+        Si version_esperada no es None y no coincide con Cart.version, no se
+        modifica nada y se lanza VersionConflicto con la foto vigente. Las
+        excepciones de la mutación (p. ej. Http404) revierten la transacción.
+        """
+        clave = self._clave(user.pk)
+        try:
+            with transaction.atomic():
+                cart = self._bloquear(user)
+                if version_esperada is not None and version_esperada != cart.version:
+                    raise VersionConflicto(self._snapshot(cart))
+
+                mutacion(cart)
+
+                # Con la fila bloqueada el incremento no se puede perder
+                cart.version += 1
+                cart.save(update_fields=['version', 'updated_at'])
+
+                snapshot = self._snapshot(cart)
+                # Se escribe antes de liberar el bloqueo: dos escrituras
+                # concurrentes actualizan la caché en el mismo orden que la base.
+                self.cache.set(clave, snapshot, self.ttl)
+        except VersionConflicto:
+            raise
+        except Exception:
+            # Si la transacción no se confirmó, la foto escrita no es válida
+            self.cache.delete(clave)
+            raise
+        return snapshot
+
+    def invalidar(self, user):
+        """Descarta la foto del usuario; la próxima lectura va a la base."""
+        self.cache.delete(self._clave(user.pk))
+
+
+cart_store = CartStore()
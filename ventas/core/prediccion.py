@@ -0,0 +1,107 @@
+"""
+Registro del modelo de predicción de ventas.
+
+El modelo (un RandomForest serializado con joblib) se carga una sola vez por
+proceso. En cada consulta solo se hace un stat() del archivo: si cambian el
+mtime o el tamaño se calcula el sha256 y, si el contenido es otro, se vuelve
+a cargar. Las predicciones se memorizan por (versión del modelo, mes), así
+que refrescar el dashboard no vuelve a ejecutar el modelo.
+"""
+import hashlib
+import json
+import os
+import threading
+
+import joblib
+import pandas as pd
+from django.conf import settings
+
+COLUMNAS = ['year', 'month_num']
+
+
+def ruta_metadatos(ruta=None):
+    """Archivo JSON junto al pickle con la versión y datos del entrenamiento."""
+    return f"{ruta or settings.SALES_MODEL_PATH}.json"
+
+
+def leer_metadatos(ruta=None):
+    try:
+        with open(ruta_metadatos(ruta), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def guardar_metadatos(metadatos, ruta=None):
+    destino = ruta_metadatos(ruta)
+    temporal = f"{destino}.tmp{os.getpid()}"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(metadatos, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(temporal, destino)
+
+
+def sha256_archivo(ruta):
+    """Versión del modelo: hash del contenido del pickle."""
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+class RegistroModelo:
+    """Modelo cargado en memoria, con recarga al cambiar el archivo."""
+
+    def __init__(self, ruta=None):
+        self._ruta = ruta
+        self._lock = threading.Lock()
+        self._modelo = None
+        self._firma = None
+        self.version = None
+        self._predicciones = {}
+
+    @property
+    def ruta(self):
+        return self._ruta or settings.SALES_MODEL_PATH
+
+    def obtener(self):
+        """
+        Devuelve (modelo, version). Lanza FileNotFoundError si todavía no se
+        entrenó ningún modelo.
+        """
+        st = os.stat(self.ruta)
+        firma = (self.ruta, st.st_mtime_ns, st.st_size)
+        if firma != self._firma:
+            with self._lock:
+                if firma != self._firma:
+                    version = sha256_archivo(self.ruta)
+                    if version != self.version:
+                        modelo = joblib.load(self.ruta)
+                        self._predicciones = {}
+                        self._modelo, self.version = modelo, version
+                    # Mismo contenido (p. ej. solo se tocó el archivo): no se recarga
+                    self._firma = firma
+        return self._modelo, self.version
+
+    def predecir(self, meses):
+        """
+        Ventas estimadas para meses = [(año, mes), ...], en el mismo orden.
+        Los meses que no están memorizados se predicen en un solo lote.
+        """
+        modelo, version = self.obtener()
+        predicciones = self._predicciones
+        faltantes = [mes for mes in meses if (version, mes) not in predicciones]
+        if faltantes:
+            valores = modelo.predict(pd.DataFrame(faltantes, columns=COLUMNAS))
+            for mes, valor in zip(faltantes, valores):
+                predicciones[(version, mes)] = float(valor)
+        return [predicciones[(version, mes)] for mes in meses]
+
+    def descartar(self):
+        """Olvida el modelo cargado; la próxima consulta lo vuelve a leer."""
+        with self._lock:
+            self._modelo = self._firma = self.version = None
+            self._predicciones = {}
+
+
+registro_modelo = RegistroModelo()
@@ -0,0 +1,220 @@
+"""
+Resúmenes persistidos de ventas.
+
+recalcular_resumen_mensual y recalcular_dias reescriben solo los meses o días
+indicados, de modo que el costo de mantenerlos depende de las ventas nuevas
+o modificadas y no del historial completo.
+
+Los resúmenes diarios se mantienen solos: las señales de ventas anotan los
+días tocados con marcar_dia y se recalculan al confirmar la transacción.
+"""
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.db import transaction
+from django.db.models import Count, DateField, Min, Max, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from ventas.models import (
+    Venta, DetalleVenta, ResumenMensualVentas, ResumenDiarioVenta, ResumenDiarioProducto
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _mes(campo):
+    return TruncMonth(campo, output_field=DateField())
+
+
+def _inicio(dia):
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def meses_modificados(desde):
+    """
+    Meses (fecha del día 1) con ventas creadas o modificadas desde `desde`,
+    más los marcados como sucios al borrar ventas.
+    """
+    meses = set(
+        Venta.objects.filter(actualizado_en__gte=desde)
+        .annotate(mes=_mes('fecha')).values_list('mes', flat=True).distinct()
+    )
+    meses.update(ResumenMensualVentas.objects.filter(sucio=True).values_list('mes', flat=True))
+    return meses
+
+
+def recalcular_resumen_mensual(meses=None):
+    """
+    Recalcula ResumenMensualVentas para `meses` (iterable de fechas día 1) o,
+    con meses=None, para todo el historial. Los meses que quedaron sin ventas
+    completadas se eliminan. Devuelve la cantidad de meses recalculados.
+    """
+    ventas = Venta.objects.filter(estado='completada')
+    existentes = ResumenMensualVentas.objects.all()
+    if meses is not None:
+        meses = set(meses)
+        if not meses:
+            return 0
+        # Rangos por fecha (usan el índice) en vez de filtrar por TruncMonth
+        rangos = Q()
+        for mes in meses:
+            rangos |= Q(fecha__gte=_inicio(mes), fecha__lt=_inicio(mes + relativedelta(months=1)))
+        ventas = ventas.filter(rangos)
+        existentes = existentes.filter(mes__in=meses)
+
+    filas = (
+        ventas.annotate(mes=_mes('fecha')).values('mes')
+        .annotate(total=Sum('total'), cantidad=Count('id')).order_by()
+    )
+    resumenes = [
+        ResumenMensualVentas(mes=f['mes'], total_ventas=f['total'], cantidad_ventas=f['cantidad'], sucio=False)
+        for f in filas
+    ]
+
+    with transaction.atomic():
+        existentes.exclude(mes__in=[r.mes for r in resumenes]).delete()
+        ResumenMensualVentas.objects.bulk_create(
+            resumenes,
+            update_conflicts=True,
+            unique_fields=['mes'],
+            update_fields=['total_ventas', 'cantidad_ventas', 'sucio', 'actualizado_en'],
+        )
+    return len(meses) if meses is not None else len(resumenes)
+
+
+# ==================== RESUMEN DIARIO ====================
+
+def _rango_dias(dias, campo):
+    """Q con un rango [inicio, fin) por cada día consecutivo de `dias`."""
+    rangos = Q()
+    dias = sorted(dias)
+    i = 0
+    while i < len(dias):
+        desde = hasta = dias[i]
+        while i + 1 < len(dias) and dias[i + 1] == hasta + timedelta(days=1):
+            i += 1
+            hasta = dias[i]
+        rangos |= Q(**{f'{campo}__gte': _inicio(desde), f'{campo}__lt': _inicio(hasta + timedelta(days=1))})
+        i += 1
+    return rangos
+
+
+def recalcular_dias(dias):
+    """
+    Reescribe ResumenDiarioVenta y ResumenDiarioProducto para los días
+    indicados (fechas locales). Devuelve (filas de ventas, filas de productos).
+    """
+    dias = set(dias)
+    if not dias:
+        return 0, 0
+
+    ventas = (
+        Venta.objects.filter(_rango_dias(dias, 'fecha'))
+        .annotate(dia=TruncDate('fecha'))
+        .values('dia', 'cliente_id', 'estado')
+        .annotate(cantidad=Count('id'), monto=Sum('total'))
+        .order_by()
+    )
+    productos = (
+        DetalleVenta.objects.filter(_rango_dias(dias, 'venta__fecha'), venta__estado='completada')
+        .annotate(dia=TruncDate('venta__fecha'))
+        .values('dia', 'catalogo_id', 'catalogo__marca_id', 'catalogo__categoria_id')
+        .annotate(unidades=Sum('cantidad'), monto=Sum('total'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        # Primero se borran (bloquea las filas existentes de esos días) y
+        # después se agrega, así dos recálculos del mismo día se serializan.
+        ResumenDiarioVenta.objects.filter(fecha__in=dias).delete()
+        ResumenDiarioProducto.objects.filter(fecha__in=dias).delete()
+
+        filas_ventas = ResumenDiarioVenta.objects.bulk_create(
+            [
+                ResumenDiarioVenta(
+                    fecha=f['dia'], cliente_id=f['cliente_id'], estado=f['estado'],
+                    cantidad_ventas=f['cantidad'], monto_total=f['monto'],
+                )
+                for f in ventas
+            ],
+            update_conflicts=True,
+            unique_fields=['fecha', 'cliente', 'estado'],
+            update_fields=['cantidad_ventas', 'monto_total'],
+        )
+        filas_productos = ResumenDiarioProducto.objects.bulk_create(
+            [
+                ResumenDiarioProducto(
+                    fecha=f['dia'], catalogo_id=f['catalogo_id'],
+                    marca_id=f['catalogo__marca_id'], categoria_id=f['catalogo__categoria_id'],
+                    unidades=f['unidades'], monto_total=f['monto'],
+                )
+                for f in productos
+            ],
+            update_conflicts=True,
+            unique_fields=['fecha', 'catalogo'],
+            update_fields=['marca', 'categoria', 'unidades', 'monto_total'],
+        )
+    return len(filas_ventas), len(filas_productos)
+
+
+def reconstruir_resumen_diario(desde=None, hasta=None, lote_dias=31):
+    """
+    Recalcula los resúmenes diarios de desde..hasta (por defecto, todo el
+    historial) en transacciones de lote_dias días. Sin rango, también borra
+    los días que ya no tienen ventas. Devuelve los días procesados.
+    """
+    limites = Venta.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+    if limites['primera'] is None:
+        if desde is None and hasta is None:
+            ResumenDiarioVenta.objects.all().delete()
+            ResumenDiarioProducto.objects.all().delete()
+        return 0
+
+    completo = desde is None and hasta is None
+    desde = desde or timezone.localdate(limites['primera'])
+    hasta = hasta or timezone.localdate(limites['ultima'])
+    if completo:
+        ResumenDiarioVenta.objects.exclude(fecha__range=(desde, hasta)).delete()
+        ResumenDiarioProducto.objects.exclude(fecha__range=(desde, hasta)).delete()
+
+    procesados = 0
+    dia = desde
+    while dia <= hasta:
+        fin = min(dia + timedelta(days=lote_dias - 1), hasta)
+        recalcular_dias(dia + timedelta(days=n) for n in range((fin - dia).days + 1))
+        procesados += (fin - dia).days + 1
+        dia = fin + timedelta(days=1)
+    return procesados
+
+
+_pendientes = threading.local()
+
+
+def _recalcular_pendientes():
+    dias = getattr(_pendientes, 'dias', set())
+    _pendientes.dias = set()
+    if not dias:
+        return
+    try:
+        recalcular_dias(dias)
+    except Exception as e:
+        # La venta ya se confirmó: no se hace fallar la petición por el
+        # resumen. rebuild_sales_rollup corrige los días que queden atrasados.
+        logger.error(f"❌ Error recalculando resumen diario de {sorted(dias)}: {e}")
+
+
+def marcar_dia(fecha):
+    """
+    Anota el día (local) de `fecha` para recalcular su resumen cuando se
+    confirme la transacción actual; varios cambios del mismo día se
+    recalculan una sola vez.
+    """
+    if fecha is None:
+        return
+    if not hasattr(_pendientes, 'dias'):
+        _pendientes.dias = set()
+    _pendientes.dias.add(timezone.localdate(fecha))
+    transaction.on_commit(_recalcular_pendientes)
@@ -0,0 +1,341 @@
+"""
+Generador de datos sintéticos para pruebas de carga y benchmarks.
+
+Produce clientes repartidos por Departamento/Ciudad, marcas, categorías,
+catálogo, unidades serializadas (Producto), ventas con sus detalles y pagos.
+Todo se inserta con bulk_create en lotes; las fechas siguen un patrón
+estacional (meses fuertes, fines de semana, crecimiento anual) y salen de un
+random.Random con semilla, así que la misma semilla y cantidad de procesos
+generan los mismos datos.
+
+Con procesos > 1 las ventas se reparten entre procesos hijos, cada uno con
+su propia conexión (solo en motores con escrituras concurrentes; en SQLite se
+usa un único proceso). El hijo es ventas.core.semillas_trabajador, que no
+importa modelos, así funciona con cualquier método de arranque (fork, spawn,
+forkserver).
+"""
+import multiprocessing
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from administracion.models import Cliente, Ciudad, Departamento
+from catalogo.models import Catalogo, Categoria, Marca, Producto
+from ventas.core.semillas_trabajador import trabajador
+from ventas.models import Venta, DetalleVenta, Pago
+
+ESTADOS_VENTA = (('completada', 70), ('pendiente', 20), ('cancelada', 10))
+
+DEPARTAMENTOS = {
+    'Santa Cruz': (['Santa Cruz de la Sierra', 'Montero', 'Warnes'], 30),
+    'La Paz': (['La Paz', 'El Alto', 'Viacha'], 28),
+    'Cochabamba': (['Cochabamba', 'Quillacollo', 'Sacaba'], 18),
+    'Oruro': (['Oruro'], 5),
+    'Potosí': (['Potosí', 'Uyuni'], 5),
+    'Chuquisaca': (['Sucre'], 5),
+    'Tarija': (['Tarija', 'Yacuiba'], 5),
+    'Beni': (['Trinidad', 'Riberalta'], 3),
+    'Pando': (['Cobija'], 1),
+}
+MARCAS = ['Samsung', 'LG', 'Sony', 'HP', 'Lenovo', 'Apple', 'Xiaomi', 'Asus', 'Philips', 'Mabe']
+CATEGORIAS = {
+    'Celulares': (800, 9000),
+    'Laptops': (3000, 15000),
+    'Televisores': (2000, 12000),
+    'Audio': (150, 3000),
+    'Refrigeradores': (3000, 10000),
+    'Lavadoras': (2500, 8000),
+    'Tablets': (1000, 7000),
+    'Monitores': (900, 4000),
+}
+
+# Estacionalidad: peso relativo por mes (1 = enero) y por día (0 = lunes)
+PESO_MES = {1: 0.8, 2: 0.75, 3: 0.9, 4: 0.9, 5: 1.0, 6: 0.95, 7: 1.0, 8: 1.05, 9: 0.95, 10: 1.0, 11: 1.3, 12: 1.6}
+PESO_DIA_SEMANA = (0.9, 0.9, 0.95, 1.0, 1.15, 1.3, 0.8)
+CRECIMIENTO_ANUAL = 0.15
+
+TASA_IMPUESTO = Decimal('0.13')
+CENTAVOS = Decimal('0.01')
+
+
+@contextmanager
+def fechas_manuales(*campos):
+    """
+    Desactiva auto_now/auto_now_add en los campos (modelo, nombre) mientras
+    dura el bloque, para poder insertar fechas históricas con bulk_create.
+    """
+    originales = []
+    for modelo, nombre in campos:
+        campo = modelo._meta.get_field(nombre)
+        originales.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def _elegir(rng, opciones):
+    valores, pesos = zip(*opciones)
+    return rng.choices(valores, weights=pesos)[0]
+
+
+def _pesos_acumulados(pesos):
+    acumulado, total = [], 0
+    for peso in pesos:
+        total += peso
+        acumulado.append(total)
+    return acumulado
+
+
+def calendario(hasta, dias):
+    """
+    Días del período [hasta - dias, hasta) y sus pesos acumulados según la
+    estacionalidad y el crecimiento anual.
+    """
+    inicio = hasta - timedelta(days=dias)
+    fechas = [inicio + timedelta(days=n) for n in range(dias)]
+    pesos = [
+        PESO_MES[f.month] * PESO_DIA_SEMANA[f.weekday()] * (1 + CRECIMIENTO_ANUAL * n / 365)
+        for n, f in enumerate(fechas)
+    ]
+    return fechas, _pesos_acumulados(pesos)
+
+
+# ==================== MAESTROS ====================
+
+def _geografia():
+    """Departamentos y ciudades de Bolivia (se crean si faltan)."""
+    ciudades, pesos = [], []
+    for nombre_dep, (nombres, peso) in DEPARTAMENTOS.items():
+        departamento, _ = Departamento.objects.get_or_create(nombre=nombre_dep)
+        for nombre in nombres:
+            ciudad, _ = Ciudad.objects.get_or_create(nombre=nombre, departamento=departamento)
+            ciudades.append(ciudad.id)
+            pesos.append(peso / len(nombres))
+    return ciudades, pesos
+
+
+def crear_maestros(rng, clientes, catalogos, unidades_por_catalogo, prefijo, lote):
+    """
+    Crea clientes, marcas, categorías, catálogo y unidades disponibles.
+    Devuelve un dict serializable (ids, precios y pesos) para los procesos.
+    """
+    ciudades, pesos_ciudad = _geografia()
+    marcas = [Marca.objects.get_or_create(nombre=nombre)[0].id for nombre in MARCAS]
+    categorias = {
+        Categoria.objects.get_or_create(nombre=nombre)[0].id: rango
+        for nombre, rango in CATEGORIAS.items()
+    }
+
+    clientes_creados = Cliente.objects.bulk_create(
+        (
+            Cliente(
+                nombre=f'{prefijo} Cliente {i}',
+                nit_ci=f'{prefijo}-{i}',
+                ciudad_id=rng.choices(ciudades, weights=pesos_ciudad)[0],
+                razon_social='juridica' if rng.random() < 0.1 else 'natural',
+                sexo=rng.choice('MF'),
+            )
+            for i in range(clientes)
+        ),
+        batch_size=lote,
+    )
+
+    catalogos_creados = []
+    for i in range(catalogos):
+        categoria_id = rng.choice(list(categorias))
+        minimo, maximo = categorias[categoria_id]
+        catalogos_creados.append(Catalogo(
+            sku=f'{prefijo}-{i}',
+            nombre=f'{prefijo} Producto {i}',
+            precio=Decimal(rng.randint(minimo, maximo)),
+            marca_id=rng.choice(marcas),
+            categoria_id=categoria_id,
+        ))
+    Catalogo.objects.bulk_create(catalogos_creados, batch_size=lote)
+
+    ahora = timezone.now()
+    with fechas_manuales((Producto, 'fecha_ingreso')):
+        Producto.objects.bulk_create(
+            (
+                Producto(
+                    numero_serie=f'{prefijo}-C{catalogo.id}-{j}',
+                    costo=(catalogo.precio * Decimal('0.6')).quantize(CENTAVOS),
+                    catalogo=catalogo,
+                    fecha_ingreso=ahora - timedelta(seconds=rng.randint(0, 90 * 86400)),
+                )
+                for catalogo in catalogos_creados
+                for j in range(unidades_por_catalogo)
+            ),
+            batch_size=lote,
+        )
+
+    return {
+        'clientes': [c.id for c in clientes_creados],
+        # Unos pocos clientes compran mucho (Pareto)
+        'pesos_clientes': _pesos_acumulados(rng.paretovariate(1.5) for _ in clientes_creados),
+        'catalogos': [(c.id, c.precio) for c in catalogos_creados],
+        # Popularidad tipo Zipf: el primer catálogo vende mucho más que el último
+        'pesos_catalogos': _pesos_acumulados(1 / (n + 1) ** 0.8 for n in range(len(catalogos_creados))),
+    }
+
+
+# ==================== VENTAS ====================
+
+def generar_ventas(maestros, cantidad, semilla, hasta, dias, lote, prefijo):
+    """
+    Inserta `cantidad` ventas con detalles, pagos (completadas) y las unidades
+    vendidas, en transacciones de `lote` ventas. Devuelve los conteos.
+    """
+    rng = random.Random(semilla)
+    fechas, pesos_fechas = calendario(hasta, dias)
+    clientes, pesos_clientes = maestros['clientes'], maestros['pesos_clientes']
+    catalogos, pesos_catalogos = maestros['catalogos'], maestros['pesos_catalogos']
+    conteo = {'ventas': 0, 'detalles': 0, 'pagos': 0, 'unidades_vendidas': 0}
+
+    campos = ((Venta, 'fecha'), (Pago, 'fecha_pago'), (Producto, 'fecha_ingreso'))
+    with fechas_manuales(*campos):
+        pendientes = cantidad
+        while pendientes > 0:
+            n = min(lote, pendientes)
+            pendientes -= n
+
+            ventas, lineas = [], []
+            dias_elegidos = rng.choices(fechas, cum_weights=pesos_fechas, k=n)
+            clientes_elegidos = rng.choices(clientes, cum_weights=pesos_clientes, k=n)
+            for dia, cliente_id in zip(dias_elegidos, clientes_elegidos):
+                # Horario comercial: 9 a 21 h
+                fecha = dia + timedelta(seconds=rng.randint(9 * 3600, 21 * 3600))
+                productos = rng.choices(catalogos, cum_weights=pesos_catalogos, k=rng.choice((1, 1, 1, 2, 2, 3, 4)))
+                detalles = {}
+                for catalogo_id, precio in productos:
+                    _, cantidad_previa = detalles.get(catalogo_id, (precio, 0))
+                    detalles[catalogo_id] = (precio, cantidad_previa + rng.choice((1, 1, 1, 2, 3)))
+                detalles = [
+                    DetalleVenta(catalogo_id=catalogo_id, cantidad=unidades, precio_unitario=precio)
+                    for catalogo_id, (precio, unidades) in detalles.items()
+                ]
+                for detalle in detalles:
+                    detalle.calcular_totales()
+                subtotal = sum((d.total for d in detalles), Decimal('0.00'))
+                venta = Venta(
+                    cliente_id=cliente_id,
+                    fecha=fecha,
+                    subtotal=subtotal,
+                    impuesto=(subtotal * TASA_IMPUESTO).quantize(CENTAVOS, rounding=ROUND_HALF_UP),
+                    estado=_elegir(rng, ESTADOS_VENTA),
+                )
+                venta.calcular_total()
+                ventas.append(venta)
+                lineas.append(detalles)
+
+            with transaction.atomic():
+                Venta.objects.bulk_create(ventas, batch_size=lote)
+
+                todos, pagos, unidades = [], [], []
+                for venta, detalles in zip(ventas, lineas):
+                    for detalle in detalles:
+                        detalle.venta = venta
+                        todos.append(detalle)
+                    if venta.estado != 'completada':
+                        continue
+                    pagos.append(Pago(
+                        venta=venta,
+                        fecha_pago=venta.fecha + timedelta(minutes=rng.randint(1, 30)),
+                        monto=venta.total,
+                        estado='completado',
+                        proveedor='Stripe',
+                        transaccion_id=f'{prefijo}-{venta.id}',
+                    ))
+                    for i, detalle in enumerate(detalles):
+                        for k in range(detalle.cantidad):
+                            unidades.append(Producto(
+                                numero_serie=f'{prefijo}-V{venta.id}-{i}-{k}',
+                                costo=(detalle.precio_unitario * Decimal('0.6')).quantize(CENTAVOS),
+                                catalogo_id=detalle.catalogo_id,
+                                estado='vendido',
+                                fecha_ingreso=venta.fecha - timedelta(days=rng.randint(1, 60)),
+                                fecha_venta=venta.fecha,
+                                venta=venta,
+                            ))
+
+                DetalleVenta.objects.bulk_create(todos, batch_size=lote)
+                Pago.objects.bulk_create(pagos, batch_size=lote)
+                Producto.objects.bulk_create(unidades, batch_size=lote)
+
+            conteo['ventas'] += len(ventas)
+            conteo['detalles'] += len(todos)
+            conteo['pagos'] += len(pagos)
+            conteo['unidades_vendidas'] += len(unidades)
+    return conteo
+
+
+def sembrar(ventas=10000, clientes=None, catalogos=50, unidades_por_catalogo=200, dias=730,
+            semilla=42, prefijo=None, lote=5000, procesos=1, resumenes=True, progreso=None):
+    """
+    Genera un conjunto de datos completo y devuelve un dict con los conteos.
+
+    resumenes=True reconcilia los contadores de stock y reconstruye los
+    resúmenes diarios y mensuales al final (bulk_create no dispara señales).
+    progreso(mensaje) recibe avisos de avance.
+    """
+    avisar = progreso or (lambda mensaje: None)
+    rng = random.Random(semilla)
+    prefijo = prefijo or f'SIM{int(time.time()):x}'
+    clientes = clientes or max(ventas // 20, 1)
+    hasta = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    avisar(f"Maestros: {clientes} clientes, {catalogos} catálogos, {catalogos * unidades_por_catalogo} unidades...")
+    maestros = crear_maestros(rng, clientes, catalogos, unidades_por_catalogo, prefijo, lote)
+
+    if connection.vendor == 'sqlite':
+        procesos = 1
+    procesos = max(1, min(procesos, ventas or 1))
+    partes = [
+        {
+            'maestros': maestros,
+            'cantidad': ventas // procesos + (1 if p < ventas % procesos else 0),
+            'semilla': semilla * 1000 + p,
+            'hasta': hasta,
+            'dias': dias,
+            'lote': lote,
+            'prefijo': f'{prefijo}P{p}',
+        }
+        for p in range(procesos)
+    ]
+
+    avisar(f"Ventas: {ventas} en {procesos} proceso(s), lotes de {lote}...")
+    if procesos == 1:
+        resultados = [generar_ventas(**partes[0])]
+    else:
+        # Los hijos no deben heredar la conexión abierta del padre
+        connections.close_all()
+        with multiprocessing.get_context().Pool(procesos) as pool:
+            resultados = pool.map(trabajador, partes)
+
+    conteo = {
+        'clientes': len(maestros['clientes']),
+        'catalogos': len(maestros['catalogos']),
+        'unidades_disponibles': catalogos * unidades_por_catalogo,
+    }
+    for resultado in resultados:
+        for clave, valor in resultado.items():
+            conteo[clave] = conteo.get(clave, 0) + valor
+
+    if resumenes:
+        from catalogo.core.stock import recalcular_contadores
+        from ventas.core.resumenes import recalcular_resumen_mensual, reconstruir_resumen_diario
+
+        avisar("Reconciliando stock y reconstruyendo resúmenes...")
+        recalcular_contadores(catalogo_ids=[c for c, _ in maestros['catalogos']])
+        reconstruir_resumen_diario()
+        recalcular_resumen_mensual()
+
+    return conteo
@@ -0,0 +1,23 @@
+"""
+Proceso hijo de ventas.core.semillas.
+
+Este módulo no importa modelos: con los métodos de arranque spawn y
+forkserver el hijo empieza en un intérprete nuevo, lo importa para
+deserializar la tarea y recién ahí puede configurar Django. Los modelos se
+importan después de django.setup().
+"""
+
+
+def trabajador(argumentos):
+    """Abre su propia conexión y genera su parte de las ventas."""
+    import django
+    django.setup()
+
+    from django.db import connections
+
+    from ventas.core.semillas import generar_ventas
+
+    try:
+        return generar_ventas(**argumentos)
+    finally:
+        connections.close_all()
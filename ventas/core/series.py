@@ -0,0 +1,108 @@
+"""
+Series de ventas por período (día, mes o año) para los gráficos.
+
+Se leen de ResumenDiarioVenta, acotadas a una ventana [desde, hasta] y
+paginadas hacia atrás desde `hasta` con un cursor (el período más viejo
+devuelto). Con relleno, los
+períodos sin ventas salen con total 0: en PostgreSQL la serie la genera
+generate_series y en otros motores se completa en Python.
+"""
+from dateutil.relativedelta import relativedelta
+from django.db import connection
+from django.db.models import F, Max, Min, Sum
+from django.db.models.functions import TruncMonth, TruncYear
+
+PERIODOS = ('dia', 'mes', 'anio')
+
+_TRUNC = {'dia': None, 'mes': TruncMonth, 'anio': TruncYear}
+_PASO = {
+    'dia': relativedelta(days=1),
+    'mes': relativedelta(months=1),
+    'anio': relativedelta(years=1),
+}
+_INTERVALO_SQL = {'dia': '1 day', 'mes': '1 month', 'anio': '1 year'}
+
+
+def inicio_periodo(fecha, periodo):
+    if periodo == 'mes':
+        return fecha.replace(day=1)
+    if periodo == 'anio':
+        return fecha.replace(month=1, day=1)
+    return fecha
+
+
+def _agrupado(queryset, periodo, desde, hasta):
+    """Total de monto_total por período dentro de [desde, hasta]."""
+    queryset = queryset.filter(fecha__gte=desde, fecha__lte=hasta)
+    trunc = _TRUNC[periodo]
+    agrupar = trunc('fecha') if trunc else F('fecha')
+    return queryset.values(periodo_agrupado=agrupar).annotate(total_ventas=Sum('monto_total')).order_by()
+
+
+def limites(queryset):
+    """Primer y último día con datos en el queryset (o None, None)."""
+    datos = queryset.aggregate(primero=Min('fecha'), ultimo=Max('fecha'))
+    return datos['primero'], datos['ultimo']
+
+
+def serie_ventas(queryset, periodo, desde, hasta, limite, cursor=None, rellenar=True):
+    """
+    Devuelve (filas, siguiente_cursor). Las páginas van de lo más reciente a
+    lo más viejo: la primera trae los últimos `limite` períodos hasta
+    `hasta` y siguiente_cursor (el primer período devuelto) pide los
+    anteriores; es None en la última página. Dentro de cada página las filas
+    son (fecha del período, total) en orden ascendente.
+
+    queryset es un ResumenDiarioVenta ya filtrado (estado, cliente, ...).
+    """
+    inicio = inicio_periodo(desde, periodo)
+    ultimo = inicio_periodo(hasta, periodo)
+    if cursor is not None:
+        ultimo = min(ultimo, inicio_periodo(cursor, periodo) - _PASO[periodo])
+    if ultimo < inicio:
+        return [], None
+    # Último día que cubre la página
+    fin = min(hasta, ultimo + _PASO[periodo] - relativedelta(days=1))
+
+    if not rellenar:
+        datos = list(
+            _agrupado(queryset, periodo, desde, fin)
+            .order_by('-periodo_agrupado')
+            .values_list('periodo_agrupado', 'total_ventas')[:limite + 1]
+        )
+        siguiente = datos[limite - 1][0] if len(datos) > limite else None
+        return datos[:limite][::-1], siguiente
+
+    # Con relleno la página se conoce de antemano: `limite` períodos hasta ultimo
+    primero = max(inicio, ultimo - _PASO[periodo] * (limite - 1))
+    siguiente = primero if primero > inicio else None
+    agrupado = _agrupado(queryset, periodo, max(primero, desde), fin)
+
+    if connection.vendor == 'postgresql':
+        return _serie_postgres(agrupado, periodo, primero, ultimo), siguiente
+
+    totales = dict(agrupado.values_list('periodo_agrupado', 'total_ventas'))
+    filas = []
+    actual = primero
+    while actual <= ultimo:
+        filas.append((actual, totales.get(actual, 0)))
+        actual += _PASO[periodo]
+    return filas, siguiente
+
+
+def _serie_postgres(agrupado, periodo, inicio, fin):
+    """generate_series LEFT JOIN los totales agrupados, leída por bloques."""
+    datos_sql, datos_params = agrupado.query.sql_with_params()
+    sql = f"""
+        SELECT s.periodo::date, COALESCE(d.total_ventas, 0)
+        FROM generate_series(%s::date, %s::date, %s::interval) AS s(periodo)
+        LEFT JOIN ({datos_sql}) AS d ON d.periodo_agrupado = s.periodo::date
+        ORDER BY 1
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [inicio, fin, _INTERVALO_SQL[periodo], *datos_params])
+        while True:
+            bloque = cursor.fetchmany(500)
+            if not bloque:
+                break
+            yield from bloque
@@ -0,0 +1,142 @@
+# ventas/management/commands/benchmark_api.py
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import timezone
+
+from administracion.core.bitacora import buffer_bitacora
+from ventas.core.benchmark import (
+    ESCALAS,
+    ESCENARIOS,
+    HOLGURA_MS,
+    TOLERANCIA,
+    EscenarioFallido,
+    comparar,
+    ejecutar,
+)
+
+BASE_POR_DEFECTO = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide latencia (p50/p95) y consultas SQL de los endpoints principales sobre una base '
+        'de pruebas descartable, y falla si algún escenario empeora respecto de la línea base.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escala',
+            action='append',
+            choices=list(ESCALAS),
+            help='Escala de datos a sembrar (se puede repetir). Por defecto, chica.',
+        )
+        parser.add_argument('--repeticiones', type=int, default=20, help='Repeticiones medidas por escenario.')
+        parser.add_argument('--calentamiento', type=int, default=2, help='Repeticiones previas sin medir.')
+        parser.add_argument(
+            '--escenario',
+            action='append',
+            choices=[escenario.nombre for escenario in ESCENARIOS],
+            help='Medir solo este escenario (se puede repetir).',
+        )
+        parser.add_argument('--base', default=str(BASE_POR_DEFECTO), help='Archivo JSON de la línea base.')
+        parser.add_argument(
+            '--guardar',
+            action='store_true',
+            help='Guardar los resultados como nueva línea base en vez de compararlos.',
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=TOLERANCIA,
+            help='Empeoramiento relativo de p95 permitido (0.5 = 50%%).',
+        )
+        parser.add_argument(
+            '--holgura-ms',
+            type=float,
+            default=HOLGURA_MS,
+            help='Milisegundos de p95 permitidos además de la tolerancia.',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError("--repeticiones debe ser mayor que 0")
+        escalas = options['escala'] or ['chica']
+        escenarios = [e for e in ESCENARIOS if not options['escenario'] or e.nombre in options['escenario']]
+        ruta_base = Path(options['base'])
+
+        resultados = {}
+        setup_test_environment()
+        bases = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            for escala in escalas:
+                # Cada escala parte de una base vacía
+                call_command('flush', interactive=False, verbosity=0)
+                self.stdout.write(self.style.MIGRATE_HEADING(f"Escala {escala}"))
+                resultados[escala] = ejecutar(
+                    ESCALAS[escala],
+                    repeticiones=options['repeticiones'],
+                    calentamiento=options['calentamiento'],
+                    escenarios=escenarios,
+                    progreso=self.stdout.write,
+                )
+        except EscenarioFallido as e:
+            raise CommandError(str(e))
+        finally:
+            # El hilo de la bitácora no debe quedar conectado a la base de pruebas
+            buffer_bitacora.detener()
+            teardown_databases(bases, verbosity=0)
+            teardown_test_environment()
+
+        self.mostrar(resultados)
+
+        if options['guardar']:
+            ruta_base.parent.mkdir(parents=True, exist_ok=True)
+            documento = {
+                'generado_en': timezone.now().isoformat(),
+                'motor': connection.vendor,
+                'repeticiones': options['repeticiones'],
+                'escalas': resultados,
+            }
+            ruta_base.write_text(json.dumps(documento, indent=2, ensure_ascii=False))
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {ruta_base}"))
+            return
+
+        base = None
+        if ruta_base.exists():
+            documento = json.loads(ruta_base.read_text())
+            if documento.get('motor') != connection.vendor:
+                self.stdout.write(self.style.WARNING(
+                    f"La línea base se tomó en {documento.get('motor')}; se compara igual contra {connection.vendor}."
+                ))
+            base = documento['escalas']
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"No hay línea base en {ruta_base}: solo se revisan los presupuestos de consultas."
+            ))
+
+        regresiones = comparar(resultados, base, options['tolerancia'], options['holgura_ms'])
+        if regresiones:
+            for regresion in regresiones:
+                self.stderr.write(f"❌ {regresion}")
+            raise CommandError(f"{len(regresiones)} regresión(es) de rendimiento")
+        self.stdout.write(self.style.SUCCESS("✅ Sin regresiones de rendimiento"))
+
+    def mostrar(self, resultados):
+        for escala, escenarios in resultados.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{escala}"))
+            self.stdout.write(f"{'escenario':<32}{'p50 ms':>10}{'p95 ms':>10}{'consultas':>11}")
+            for nombre, metricas in escenarios.items():
+                self.stdout.write(
+                    f"{nombre:<32}{metricas['p50_ms']:>10.1f}{metricas['p95_ms']:>10.1f}{metricas['consultas']:>11}"
+                )
@@ -0,0 +1,140 @@
+# ventas/management/commands/explain_indexes.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from catalogo.models import Producto
+from ventas.core.semillas import sembrar
+from ventas.models import Venta, Pago
+
+# Índices cuyo efecto se compara (modelo, nombre)
+INDICES = [
+    (Venta, 'venta_estado_fecha_idx'),
+    (Pago, 'pago_venta_fecha_idx'),
+    (Producto, 'producto_disponible_fifo_idx'),
+    (Producto, 'producto_catalogo_estado_idx'),
+]
+
+# En PostgreSQL el plan "sin índices" se obtiene apagando los accesos por
+# índice solo para esta transacción, sin tocar las tablas
+SIN_INDICES_POSTGRES = ['enable_indexscan', 'enable_indexonlyscan', 'enable_bitmapscan']
+
+
+class Command(BaseCommand):
+    help = (
+        'Muestra los planes EXPLAIN de las consultas de ventas, pagos e inventario '
+        'con y sin índices, sobre datos sembrados. Todo se revierte al terminar. '
+        'En PostgreSQL el plan sin índices apaga los accesos por índice de la sesión; '
+        'con --permitir-bloqueo se quitan los índices compuestos (DROP INDEX), lo que '
+        'bloquea las tablas hasta terminar: usarlo solo en una base de prueba.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ventas',
+            type=int,
+            default=20000,
+            help='Ventas a sembrar (0 = usar los datos existentes).',
+        )
+        parser.add_argument('--catalogos', type=int, default=50, help='Catálogos a sembrar.')
+        parser.add_argument('--unidades', type=int, default=200, help='Unidades por catálogo a sembrar.')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla del generador aleatorio.')
+        parser.add_argument(
+            '--permitir-bloqueo',
+            action='store_true',
+            help='Comparar quitando los índices compuestos con DROP INDEX (bloquea las tablas; solo bases de prueba).',
+        )
+
+    def consultas(self):
+        """Las formas de consulta que cubren los índices."""
+        venta = Venta.objects.filter(estado='completada').order_by('-id').first()
+        catalogo_id = Producto.objects.filter(estado='disponible').values_list('catalogo_id', flat=True).first()
+        catalogo_ids = list(Producto.objects.values_list('catalogo_id', flat=True).distinct()[:20])
+        return [
+            (
+                'Ventas completadas por día (últimos 90 días)',
+                Venta.objects.filter(estado='completada', fecha__gte=timezone.now() - timedelta(days=90))
+                .annotate(dia=TruncDate('fecha')).values('dia').annotate(total=Sum('total')).order_by('dia'),
+            ),
+            (
+                'Último pago de una venta',
+                Pago.objects.filter(venta_id=venta.id if venta else 0).order_by('-fecha_pago')[:1],
+            ),
+            (
+                'Unidades disponibles FIFO de un catálogo',
+                Producto.objects.filter(catalogo_id=catalogo_id or 0, estado='disponible')
+                .order_by('fecha_ingreso', 'id')[:5],
+            ),
+            (
+                'Conteo de unidades por catálogo y estado',
+                Producto.objects.filter(catalogo_id__in=catalogo_ids)
+                .values('catalogo_id', 'estado').annotate(total=Count('id')).order_by(),
+            ),
+        ]
+
+    def planes(self):
+        opciones = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        return [(titulo, queryset.explain(**opciones)) for titulo, queryset in self.consultas()]
+
+    def quitar_indices(self, permitir_bloqueo):
+        if not permitir_bloqueo:
+            # SET LOCAL vuelve a su valor al terminar la transacción
+            with connection.cursor() as cursor:
+                for opcion in SIN_INDICES_POSTGRES:
+                    cursor.execute(f'SET LOCAL {opcion} = off')
+            return
+
+        # DROP INDEX dentro de la transacción (PostgreSQL y SQLite lo revierten),
+        # pero bloquea las tablas hasta el rollback
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for modelo, nombre in INDICES:
+                cursor.execute(f'DROP INDEX {qn(nombre)}')
+            cursor.execute('ANALYZE')
+
+    def handle(self, *args, **options):
+        permitir_bloqueo = options['permitir_bloqueo']
+        if connection.vendor != 'postgresql' and not permitir_bloqueo:
+            raise CommandError(
+                f'En {connection.vendor} la comparación quita los índices con DROP INDEX y bloquea '
+                'las tablas: usar --permitir-bloqueo, solo sobre una base de prueba.'
+            )
+        if permitir_bloqueo:
+            self.stdout.write(self.style.WARNING(
+                'Los índices se quitan con DROP INDEX: las tablas quedan bloqueadas hasta terminar.'
+            ))
+
+        with transaction.atomic():
+            if options['ventas'] > 0:
+                self.stdout.write("Sembrando datos de prueba...")
+                creados = sembrar(
+                    ventas=options['ventas'],
+                    catalogos=options['catalogos'],
+                    unidades_por_catalogo=options['unidades'],
+                    semilla=options['semilla'],
+                    prefijo=f"EXPLAIN{options['semilla']}",
+                    resumenes=False,
+                )
+                self.stdout.write(", ".join(f"{k}: {v}" for k, v in creados.items()))
+
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            con_indices = self.planes()
+
+            self.quitar_indices(permitir_bloqueo)
+            sin_indices = self.planes()
+
+            transaction.set_rollback(True)
+
+        for (titulo, despues), (_, antes) in zip(con_indices, sin_indices):
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== {titulo} ==="))
+            self.stdout.write(self.style.WARNING("-- Sin índices --"))
+            self.stdout.write(antes)
+            self.stdout.write(self.style.SUCCESS("-- Con índices --"))
+            self.stdout.write(despues)
+
+        self.stdout.write(self.style.SUCCESS("\nListo: los datos sembrados y los índices quitados se revirtieron."))
@@ -1,57 +1,58 @@
 # ventas/management/commands/generate_fake_sales.py
-import random
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
-from decimal import Decimal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.core.semillas import sembrar
 
-from django.core.management.base import BaseCommand
-from django.utils import timezone
-from ventas.models.models_venta import Venta
-from administracion.models import Cliente
 
 class Command(BaseCommand):
-    help = 'Genera ventas falsas para entrenar el modelo de IA'
+    help = (
+        'Genera datos sintéticos (clientes, catálogo, unidades, ventas con detalles y pagos) '
+        'para entrenar el modelo de IA y para pruebas de carga.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=100, help='Cantidad de ventas a generar.')
+        parser.add_argument('--clientes', type=int, help='Clientes a crear (por defecto, ventas / 20).')
+        parser.add_argument('--catalogos', type=int, default=20, help='Catálogos a crear.')
+        parser.add_argument('--unidades', type=int, default=10, help='Unidades disponibles por catálogo.')
+        parser.add_argument('--dias', type=int, default=365, help='Días hacia atrás en que se reparten las ventas.')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create / ventas por transacción.')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla del generador aleatorio.')
+        parser.add_argument('--procesos', type=int, default=1, help='Procesos en paralelo (no aplica en SQLite).')
+        parser.add_argument('--prefijo', help='Prefijo de SKU, series y nombres (por defecto, uno nuevo por corrida).')
+        parser.add_argument(
+            '--sin-resumenes',
+            action='store_true',
+            help='No reconciliar stock ni reconstruir resúmenes al final.',
+        )
 
     def handle(self, *args, **options):
+        for opcion in ('ventas', 'catalogos', 'dias', 'lote', 'procesos'):
+            if options[opcion] < 1:
+                raise CommandError(f"--{opcion} debe ser mayor que 0")
+
         self.stdout.write("Generando datos de ventas sintéticos...")
-        
-        # 1. Asegúrate de tener al menos un cliente
-        cliente, created = Cliente.objects.get_or_create(
-            nombre="Cliente de Prueba (Sintético)",
-            defaults={'nit_ci': '1234567'}
+        inicio = time.monotonic()
+        conteo = sembrar(
+            ventas=options['ventas'],
+            clientes=options['clientes'],
+            catalogos=options['catalogos'],
+            unidades_por_catalogo=options['unidades'],
+            dias=options['dias'],
+            semilla=options['semilla'],
+            prefijo=options['prefijo'],
+            lote=options['lote'],
+            procesos=options['procesos'],
+            resumenes=not options['sin_resumenes'],
+            progreso=self.stdout.write,
         )
-        if created:
-            self.stdout.write(f"Cliente de prueba '{cliente.nombre}' creado.")
-
-        # 2. Generar 100 ventas en los últimos 12 meses
-        today = timezone.now()
-        ventas_creadas = 0
-        for _ in range(100):
-            # Fecha aleatoria en los últimos 12 meses
-            dias_atras = random.randint(1, 365)
-            fecha_venta = today - relativedelta(days=dias_atras)
-            
-            # Valores aleatorios
-            subtotal = Decimal(random.uniform(100.0, 5000.0))
-            descuento = Decimal(random.uniform(0.0, 100.0))
-            
-            try:
-                venta = Venta(
-                    cliente=cliente,
-                    fecha=fecha_venta, # ¡Importante! Asignar la fecha histórica
-                    subtotal=subtotal,
-                    descuento=descuento,
-                    # (El modelo Venta recalculará el total al guardar)
-                    estado='completada' # ¡Importante! Solo entrenamos con completadas
-                )
-                
-                # Asignamos la fecha manualmente de nuevo para 'auto_now_add'
-                # (Es un truco para datos históricos)
-                venta.save()
-                Venta.objects.filter(pk=venta.pk).update(fecha=fecha_venta)
-                
-                ventas_creadas += 1
-            except Exception as e:
-                self.stderr.write(f"Error creando venta: {e}")
-
-        self.stdout.write(self.style.SUCCESS(f"¡Se crearon {ventas_creadas} ventas sintéticas!"))
\ No newline at end of file
+        segundos = time.monotonic() - inicio
+
+        for clave, valor in conteo.items():
+            self.stdout.write(f"  {clave}: {valor}")
+        self.stdout.write(self.style.SUCCESS(
+            f"¡Se crearon {conteo['ventas']} ventas sintéticas en {segundos:.1f}s "
+            f"({conteo['ventas'] / segundos:.0f} ventas/s)!"
+        ))
@@ -0,0 +1,44 @@
+# ventas/management/commands/rebuild_sales_rollup.py
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.core.resumenes import reconstruir_resumen_diario
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes diarios de ventas (por cliente/estado y por producto) que usan los dashboards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--desde',
+            help='Primer día a recalcular (AAAA-MM-DD). Por defecto, la primera venta.',
+        )
+        parser.add_argument(
+            '--hasta',
+            help='Último día a recalcular (AAAA-MM-DD). Por defecto, la última venta.',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=31,
+            help='Cantidad de días procesados por transacción.',
+        )
+
+    def _fecha(self, valor, opcion):
+        if not valor:
+            return None
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise CommandError(f"--{opcion} debe tener el formato AAAA-MM-DD")
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options['desde'], 'desde')
+        hasta = self._fecha(options['hasta'], 'hasta')
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta")
+
+        self.stdout.write("Reconstruyendo resúmenes diarios de ventas...")
+        dias = reconstruir_resumen_diario(desde=desde, hasta=hasta, lote_dias=max(options['lote'], 1))
+        self.stdout.write(self.style.SUCCESS(f"Se recalcularon {dias} días."))
@@ -1,56 +1,121 @@
-# inteligencia_negocios/management/commands/train_sales_model.py
+# ventas/management/commands/train_sales_model.py
 
+import os
+import time
 import pandas as pd
 import joblib
+from datetime import datetime, timedelta
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.db.models.functions import TruncMonth
-from django.db.models import Sum
+from django.utils import timezone
 from sklearn.ensemble import RandomForestRegressor
 
 # Importa tus modelos de ventas
-from ventas.models import Venta
+from ventas.models import ResumenMensualVentas
+from ventas.core.prediccion import COLUMNAS, guardar_metadatos, leer_metadatos, sha256_archivo
+from ventas.core.resumenes import meses_modificados, recalcular_resumen_mensual
 
-# Define dónde se guardará el modelo entrenado
-MODEL_FILE_PATH = 'sales_model.pkl'
+# El modelo se guarda en settings.SALES_MODEL_PATH (lo lee ventas.core.prediccion)
+
+# Solapamiento al buscar ventas modificadas: cubre transacciones que
+# guardaron antes de la corrida anterior pero confirmaron después.
+MARGEN_MARCA_DE_AGUA = timedelta(minutes=10)
+
+# Versiones anteriores que se conservan en los metadatos
+MAX_HISTORIAL = 20
 
 class Command(BaseCommand):
-    help = 'Entrena el modelo de predicción de ventas (RandomForestRegressor) y lo guarda.'
+    help = (
+        'Entrena el modelo de predicción de ventas (RandomForestRegressor) y lo guarda. '
+        'Por defecto solo recalcula los meses con ventas modificadas desde la última corrida.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Reconstruye el resumen mensual con todo el historial.',
+        )
+        parser.add_argument(
+            '--arboles',
+            type=int,
+            default=100,
+            help='Cantidad de árboles del RandomForest.',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write("Iniciando entrenamiento del modelo de predicción...")
+        inicio = time.monotonic()
+        ruta = settings.SALES_MODEL_PATH
+        anteriores = leer_metadatos(ruta)
+        # Se toma antes de leer ventas: lo que cambie durante la corrida entra en la próxima
+        corte = timezone.now()
+
+        # 1. ACTUALIZAR EL RESUMEN MENSUAL
+        # Solo ventas completadas; en modo incremental, solo los meses tocados
+        marca = anteriores.get('marca_de_agua')
+        if options['full'] or not marca or not ResumenMensualVentas.objects.exists():
+            modo = 'completo'
+            meses_recalculados = recalcular_resumen_mensual()
+        else:
+            modo = 'incremental'
+            desde = datetime.fromisoformat(marca) - MARGEN_MARCA_DE_AGUA
+            meses_recalculados = recalcular_resumen_mensual(meses_modificados(desde))
+        self.stdout.write(f"Resumen mensual ({modo}): {meses_recalculados} meses recalculados.")
 
-        # 1. OBTENER DATOS HISTÓRICOS
-        # Obtenemos solo ventas completadas 
-        sales_data = Venta.objects.filter(estado='completada') \
-            .annotate(month=TruncMonth('fecha')) \
-            .values('month') \
-            .annotate(total_ventas=Sum('total')) \
-            .order_by('month')
+        # 2. PREPARAR DATOS (Feature Engineering) desde la tabla de resumen
+        sales_data = ResumenMensualVentas.objects.order_by('mes').values('mes', 'total_ventas', 'cantidad_ventas')
+        df = pd.DataFrame(list(sales_data))
 
-        if not sales_data:
+        if df.empty:
             self.stderr.write("No hay datos de ventas completadas para entrenar.")
             return
 
-        # 2. PREPARAR DATOS (Feature Engineering)
-        # Convertimos los datos al formato que scikit-learn entiende
-        df = pd.DataFrame(list(sales_data))
-        
-        # Convertimos la columna 'month' (que es una fecha) en features numéricos
-        df['year'] = df['month'].dt.year
-        df['month_num'] = df['month'].dt.month
+        # Convertimos el mes en features numéricos
+        df['year'] = df['mes'].map(lambda mes: mes.year)
+        df['month_num'] = df['mes'].map(lambda mes: mes.month)
         
         # 'X' son las características (Año, Mes)
-        X = df[['year', 'month_num']]
+        X = df[COLUMNAS]
         # 'y' es lo que queremos predecir (Total de Ventas)
-        y = df['total_ventas']
+        y = df['total_ventas'].astype(float)
 
         # 3. ENTRENAR EL MODELO 
-        # (Usamos 100 árboles, puedes ajustar esto)
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model = RandomForestRegressor(n_estimators=options['arboles'], random_state=42)
         model.fit(X, y)
 
-        # 4. GUARDAR (SERIALIZAR) EL MODELO [cite: 226, 247]
-        # Usamos joblib para guardar el modelo entrenado en un archivo
-        joblib.dump(model, MODEL_FILE_PATH)
+        # 4. GUARDAR (SERIALIZAR) EL MODELO
+        # Se escribe en un temporal y se reemplaza de una vez, para que los
+        # procesos que lo recargan nunca lean un archivo a medio escribir.
+        temporal = f"{ruta}.tmp{os.getpid()}"
+        joblib.dump(model, temporal)
+        os.replace(temporal, ruta)
+
+        # 5. METADATOS DE LA VERSIÓN (junto al pickle)
+        version = {
+            'version': sha256_archivo(ruta),
+            'entrenado_en': corte.isoformat(),
+            'modo': modo,
+            'meses_recalculados': meses_recalculados,
+            'filas': len(df),
+            'ventas': int(df['cantidad_ventas'].sum()),
+            'desde': df['mes'].iloc[0].isoformat(),
+            'hasta': df['mes'].iloc[-1].isoformat(),
+            'features': COLUMNAS,
+            'modelo': f'RandomForestRegressor(n_estimators={options["arboles"]})',
+            'segundos': round(time.monotonic() - inicio, 3),
+        }
+        historial = [anteriores] + anteriores.get('historial', []) if anteriores.get('version') else []
+        for anterior in historial:
+            anterior.pop('historial', None)
+            anterior.pop('marca_de_agua', None)
+        guardar_metadatos({
+            **version,
+            'marca_de_agua': corte.isoformat(),
+            'historial': historial[:MAX_HISTORIAL],
+        }, ruta)
 
-        self.stdout.write(self.style.SUCCESS(f"¡Modelo entrenado y guardado exitosamente en {MODEL_FILE_PATH}!"))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f"¡Modelo entrenado y guardado exitosamente en {ruta}! "
+            f"({version['filas']} meses, {version['ventas']} ventas, {version['segundos']}s)"
+        ))
@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0002_cart_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='actualizado_en',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, verbose_name='Última Modificación'),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='ResumenMensualVentas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField(unique=True, verbose_name='Mes')),
+                ('total_ventas', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Total de Ventas')),
+                ('cantidad_ventas', models.PositiveIntegerField(default=0, verbose_name='Cantidad de Ventas')),
+                ('sucio', models.BooleanField(default=False)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen Mensual de Ventas',
+                'verbose_name_plural': 'Resúmenes Mensuales de Ventas',
+                'db_table': 'ventas_resumen_mensual',
+                'ordering': ['mes'],
+            },
+        ),
+    ]
@@ -0,0 +1,95 @@
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumen_diario(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    DetalleVenta = apps.get_model('ventas', 'DetalleVenta')
+    ResumenDiarioVenta = apps.get_model('ventas', 'ResumenDiarioVenta')
+    ResumenDiarioProducto = apps.get_model('ventas', 'ResumenDiarioProducto')
+
+    ventas = (
+        Venta.objects.annotate(dia=TruncDate('fecha'))
+        .values('dia', 'cliente_id', 'estado')
+        .annotate(cantidad=Count('id'), monto=Sum('total')).order_by()
+    )
+    ResumenDiarioVenta.objects.bulk_create(
+        (
+            ResumenDiarioVenta(
+                fecha=f['dia'], cliente_id=f['cliente_id'], estado=f['estado'],
+                cantidad_ventas=f['cantidad'], monto_total=f['monto'],
+            )
+            for f in ventas.iterator()
+        ),
+        batch_size=1000,
+    )
+
+    productos = (
+        DetalleVenta.objects.filter(venta__estado='completada')
+        .annotate(dia=TruncDate('venta__fecha'))
+        .values('dia', 'catalogo_id', 'catalogo__marca_id', 'catalogo__categoria_id')
+        .annotate(unidades=Sum('cantidad'), monto=Sum('total')).order_by()
+    )
+    ResumenDiarioProducto.objects.bulk_create(
+        (
+            ResumenDiarioProducto(
+                fecha=f['dia'], catalogo_id=f['catalogo_id'],
+                marca_id=f['catalogo__marca_id'], categoria_id=f['catalogo__categoria_id'],
+                unidades=f['unidades'], monto_total=f['monto'],
+            )
+            for f in productos.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('administracion', '0003_alter_cliente_razon_social_alter_cliente_sexo'),
+        ('catalogo', '0005_producto_reserva'),
+        ('ventas', '0003_resumen_mensual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('unidades', models.PositiveIntegerField(default=0, verbose_name='Unidades')),
+                ('monto_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Monto Total')),
+                ('catalogo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalogo.catalogo', verbose_name='Catálogo')),
+                ('categoria', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalogo.categoria', verbose_name='Categoría')),
+                ('marca', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='catalogo.marca', verbose_name='Marca')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario por Producto',
+                'verbose_name_plural': 'Resúmenes Diarios por Producto',
+                'db_table': 'ventas_resumen_diario_producto',
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'catalogo'), name='resumen_diario_producto_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioVenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('estado', models.CharField(max_length=20, verbose_name='Estado')),
+                ('cantidad_ventas', models.PositiveIntegerField(default=0, verbose_name='Cantidad de Ventas')),
+                ('monto_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Monto Total')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='administracion.cliente', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Ventas',
+                'verbose_name_plural': 'Resúmenes Diarios de Ventas',
+                'db_table': 'ventas_resumen_diario_venta',
+                'indexes': [models.Index(fields=['estado', 'fecha'], name='resumen_venta_estado_fecha')],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'cliente', 'estado'), name='resumen_diario_venta_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_resumen_diario, migrations.RunPython.noop),
+    ]
@@ -7,6 +7,9 @@ from ventas.models.models_cart import Cart, CartItem
 # Modelos nuevos (Ventas)
 from ventas.models.models_venta import Venta, DetalleVenta, Pago
 
+# Resúmenes persistidos
+from ventas.models.models_resumen import ResumenMensualVentas, ResumenDiarioVenta, ResumenDiarioProducto
+
 # Exportar todo
 __all__ = [
     'Cart',
@@ -14,4 +17,7 @@ __all__ = [
     'Venta',
     'DetalleVenta',
     'Pago',
+    'ResumenMensualVentas',
+    'ResumenDiarioVenta',
+    'ResumenDiarioProducto',
 ]
@@ -2,10 +2,21 @@
 Modelos para el carrito de compras
 """
 import uuid
+from decimal import Decimal
 from django.db import models
+from django.db.models import F, Sum
 from django.conf import settings
 
 
+class CartQuerySet(models.QuerySet):
+    def con_items(self):
+        """
+        Carrito con ítems, catálogo, marca y categoría (el stock viene en la
+        fila del catálogo) en dos consultas, sin importar la cantidad de ítems.
+        """
+        return self.prefetch_related(Cart.prefetch_items())
+
+
 class Cart(models.Model):
     """
     Modelo para el carrito de compras
@@ -14,10 +25,31 @@ class Cart(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Se incrementa en cada modificación (ver ventas.core.cart_store): permite
+    # detectar que otra pestaña cambió el carrito y no perder actualizaciones.
+    version = models.PositiveIntegerField(default=0)
+
+    objects = CartQuerySet.as_manager()
+
+    @staticmethod
+    def prefetch_items():
+        """
+        Prefetch de ítems listo para CartSerializer. Sirve también para
+        prefetch_related_objects() sobre un carrito ya obtenido.
+        """
+        return models.Prefetch(
+            'items',
+            queryset=CartItem.objects.select_related('catalogo__marca', 'catalogo__categoria').order_by('id'),
+        )
 
     @property
     def total_price(self):
-        return sum([item.subtotal for item in self.items.all()])
+        # Con los ítems precargados se suma en memoria (sin consultas);
+        # si no, una sola agregación en la base de datos.
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum((item.subtotal for item in self.items.all()), Decimal('0.00'))
+        total = self.items.aggregate(total=Sum(F('quantity') * F('catalogo__precio')))['total']
+        return total or Decimal('0.00')
 
     def __str__(self):
         return f"Carrito de {self.user.username if self.user else 'Anónimo'}"
@@ -0,0 +1,115 @@
+"""
+Tablas de resumen de ventas (agregados persistidos para entrenamiento y reportes)
+"""
+from django.db import models
+from decimal import Decimal
+
+
+class ResumenMensualVentas(models.Model):
+    """
+    Total de ventas completadas por mes. Lo mantiene train_sales_model, que
+    solo recalcula los meses con ventas modificadas desde la última corrida.
+    """
+    mes = models.DateField(unique=True, verbose_name='Mes')
+    total_ventas = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Total de Ventas'
+    )
+    cantidad_ventas = models.PositiveIntegerField(default=0, verbose_name='Cantidad de Ventas')
+    # Marcado al borrar una venta completada del mes: se recalcula en la próxima corrida
+    sucio = models.BooleanField(default=False)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ventas_resumen_mensual'
+        verbose_name = 'Resumen Mensual de Ventas'
+        verbose_name_plural = 'Resúmenes Mensuales de Ventas'
+        ordering = ['mes']
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m}: Bs. {self.total_ventas}"
+
+
+class ResumenDiarioVenta(models.Model):
+    """
+    Ventas por día, cliente y estado. Lo mantienen las señales de ventas
+    (se recalculan los días tocados al confirmar la transacción) y el comando
+    rebuild_sales_rollup. Respalda los dashboards y las estadísticas.
+    """
+    fecha = models.DateField(verbose_name='Fecha')
+    cliente = models.ForeignKey(
+        'administracion.Cliente',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Cliente'
+    )
+    estado = models.CharField(max_length=20, verbose_name='Estado')
+    cantidad_ventas = models.PositiveIntegerField(default=0, verbose_name='Cantidad de Ventas')
+    monto_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Monto Total'
+    )
+
+    class Meta:
+        db_table = 'ventas_resumen_diario_venta'
+        verbose_name = 'Resumen Diario de Ventas'
+        verbose_name_plural = 'Resúmenes Diarios de Ventas'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'cliente', 'estado'], name='resumen_diario_venta_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['estado', 'fecha'], name='resumen_venta_estado_fecha'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} cliente #{self.cliente_id} ({self.estado}): {self.cantidad_ventas}"
+
+
+class ResumenDiarioProducto(models.Model):
+    """
+    Unidades y monto vendidos por día y catálogo (solo ventas completadas),
+    con la marca y categoría del catálogo copiadas para agrupar sin joins.
+    """
+    fecha = models.DateField(verbose_name='Fecha')
+    catalogo = models.ForeignKey(
+        'catalogo.Catalogo',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Catálogo'
+    )
+    marca = models.ForeignKey(
+        'catalogo.Marca',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Marca'
+    )
+    categoria = models.ForeignKey(
+        'catalogo.Categoria',
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Categoría'
+    )
+    unidades = models.PositiveIntegerField(default=0, verbose_name='Unidades')
+    monto_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        verbose_name='Monto Total'
+    )
+
+    class Meta:
+        db_table = 'ventas_resumen_diario_producto'
+        verbose_name = 'Resumen Diario por Producto'
+        verbose_name_plural = 'Resúmenes Diarios por Producto'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'catalogo'], name='resumen_diario_producto_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} catálogo #{self.catalogo_id}: {self.unidades} u."
@@ -9,6 +9,18 @@ from administracion.models import Cliente
 from catalogo.models import Catalogo
 
 
+class VentaQuerySet(models.QuerySet):
+    def con_detalles(self):
+        """
+        Carga todo lo que necesita VentaSerializer (cliente con ciudad y
+        departamento, detalles y sus catálogos) en un número fijo de consultas.
+        """
+        return self.select_related('cliente__ciudad__departamento').prefetch_related(
+            'detalles',
+            models.Prefetch('detalles__catalogo', queryset=Catalogo.objects.para_serializar()),
+        )
+
+
 class Venta(models.Model):
     """
     Modelo para registrar las ventas realizadas
@@ -72,12 +84,25 @@ class Venta(models.Model):
         verbose_name='Dirección de Entrega',
         default='Por definir'
     )
+    # Última modificación: train_sales_model recalcula solo los meses con
+    # ventas tocadas desde su corrida anterior.
+    actualizado_en = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Última Modificación'
+    )
+    
+    objects = VentaQuerySet.as_manager()
     
     class Meta:
         db_table = 'ventas_venta'
         verbose_name = 'Venta'
         verbose_name_plural = 'Ventas'
         ordering = ['-fecha']
+        indexes = [
+            # Dashboards, reportes y entrenamiento: estado='completada' por rango de fecha
+            models.Index(fields=['estado', 'fecha'], name='venta_estado_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Venta #{self.id} - {self.cliente.nombre} - Bs. {self.total}"
@@ -229,6 +254,10 @@ class Pago(models.Model):
         verbose_name = 'Pago'
         verbose_name_plural = 'Pagos'
         ordering = ['-fecha_pago']
+        indexes = [
+            # Pagos de una venta, el más reciente primero
+            models.Index(fields=['venta', '-fecha_pago'], name='pago_venta_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Pago #{self.id} - Venta #{self.venta.id} - {self.moneda} {self.monto}"
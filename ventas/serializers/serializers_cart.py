@@ -23,13 +23,13 @@ class CartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Cart
-        fields = ['id', 'items', 'total_price', 'created_at', 'updated_at']
+        fields = ['id', 'items', 'total_price', 'version', 'created_at', 'updated_at']
         # No incluimos 'user' porque generalmente el usuario sabe quién es él mismo.
 
 class AddCartItemSerializer(serializers.ModelSerializer):
     # El cliente envía el ID del catálogo y la cantidad que quiere
     catalogo_id = serializers.IntegerField(write_only=True) # write_only para que no salga en las respuestas GET
-    quantity = serializers.IntegerField(default=1)
+    quantity = serializers.IntegerField(default=1, max_value=32767)
 
     class Meta:
         model = CartItem
@@ -41,4 +41,11 @@ class AddCartItemSerializer(serializers.ModelSerializer):
         return value
     
     # Aquí podrías agregar la validación de stock si quieres ser muy pro:
-    # def validate_catalogo_id(self, value): ...
\ No newline at end of file
+    # def validate_catalogo_id(self, value): ...
+
+class SetCartItemSerializer(AddCartItemSerializer):
+    # Cantidad absoluta para sincronizar el carrito; 0 elimina la línea
+    quantity = serializers.IntegerField(min_value=0, max_value=32767)
+
+    def validate_quantity(self, value):
+        return value
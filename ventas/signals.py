@@ -0,0 +1,53 @@
+"""
+Señales de ventas: mantienen al día los resúmenes persistidos.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalogo.models import Catalogo
+from ventas.core.resumenes import marcar_dia
+from ventas.models import Venta, DetalleVenta, ResumenMensualVentas, ResumenDiarioProducto
+
+
+@receiver(post_delete, sender=Venta)
+def marcar_mes_sucio(sender, instance, **kwargs):
+    """
+    Una venta borrada ya no aparece al buscar ventas modificadas: se marca su
+    mes para que train_sales_model lo recalcule en la próxima corrida.
+    """
+    if instance.estado == 'completada' and instance.fecha:
+        mes = timezone.localtime(instance.fecha).date().replace(day=1)
+        ResumenMensualVentas.objects.filter(mes=mes).update(sucio=True)
+
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def actualizar_resumen_diario_venta(sender, instance, **kwargs):
+    """Cualquier alta, cambio de estado o baja recalcula el día de la venta."""
+    marcar_dia(instance.fecha)
+
+
+@receiver(post_save, sender=DetalleVenta)
+@receiver(post_delete, sender=DetalleVenta)
+def actualizar_resumen_diario_detalle(sender, instance, **kwargs):
+    """
+    Los detalles solo cuentan en el resumen por producto si la venta está
+    completada. Al borrar una venta en cascada el día ya quedó marcado.
+    """
+    if DetalleVenta.venta.is_cached(instance):
+        venta = {'fecha': instance.venta.fecha, 'estado': instance.venta.estado}
+    else:
+        venta = Venta.objects.filter(pk=instance.venta_id).values('fecha', 'estado').first()
+    if venta and venta['estado'] == 'completada':
+        marcar_dia(venta['fecha'])
+
+
+@receiver(post_save, sender=Catalogo)
+def actualizar_marca_categoria_resumen(sender, instance, created, **kwargs):
+    """Mantiene la marca y categoría copiadas en el resumen por producto."""
+    if created:
+        return
+    ResumenDiarioProducto.objects.filter(catalogo_id=instance.pk).exclude(
+        marca_id=instance.marca_id, categoria_id=instance.categoria_id
+    ).update(marca_id=instance.marca_id, categoria_id=instance.categoria_id)
@@ -1,3 +1,153 @@
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from administracion.models import Cliente
+from catalogo.core.stock import recalcular_contadores
+from catalogo.models import Catalogo, Producto
+from ventas.core.benchmark import ESCENARIOS, comparar, ejecutar, percentil
+from ventas.models import Cart, CartItem, DetalleVenta, ResumenDiarioVenta, Venta
+
+
+class CheckoutQueryBudgetTests(TestCase):
+    """
+    El checkout debe ejecutar la misma cantidad de consultas sin importar
+    cuántos ítems tenga el carrito.
+    """
+    PRESUPUESTO_CONSULTAS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(nombre='Cliente Checkout')
+        cls.catalogos = []
+        for i in range(12):
+            catalogo = Catalogo.objects.create(sku=f'CHK-{i}', nombre=f'Producto {i}', precio=Decimal('19.99'))
+            Producto.objects.bulk_create([
+                Producto(numero_serie=f'CHK-{i}-{j}', costo=Decimal('10.00'), catalogo=catalogo)
+                for j in range(5)
+            ])
+            cls.catalogos.append(catalogo)
+        recalcular_contadores()
+
+    def _checkout(self, username, cantidad_items):
+        user = User.objects.create_user(username=username, password='secreta123')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, catalogo=catalogo, quantity=2)
+            for catalogo in self.catalogos[:cantidad_items]
+        ])
+        client = APIClient()
+        client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as consultas:
+            response = client.post('/api/cart/checkout/', {'cliente_id': self.cliente.id}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response, len(consultas)
+
+    def test_consultas_constantes_segun_tamano_del_carrito(self):
+        _, consultas_1 = self._checkout('uno', 1)
+        _, consultas_10 = self._checkout('diez', 10)
+
+        self.assertEqual(consultas_1, consultas_10)
+        self.assertLessEqual(consultas_10, self.PRESUPUESTO_CONSULTAS)
+
+    def test_totales_en_decimal(self):
+        response, _ = self._checkout('totales', 3)
+
+        venta = Venta.objects.get(pk=response.data['id'])
+        self.assertEqual(venta.subtotal, Decimal('119.94'))
+        self.assertEqual(venta.impuesto, Decimal('15.59'))
+        self.assertEqual(venta.total, Decimal('135.53'))
+        self.assertEqual(len(response.data['detalles']), 3)
+        for detalle in DetalleVenta.objects.filter(venta=venta):
+            self.assertEqual(detalle.subtotal, Decimal('39.98'))
+            self.assertEqual(detalle.total, Decimal('39.98'))
+        self.assertEqual(Producto.objects.filter(venta=venta, estado='reservado').count(), 6)
+
+
+
+class SerieVentasTests(TestCase):
+    """
+    Sin parámetros, dashboard-sales-over-time devuelve los períodos más
+    recientes; el cursor pide los anteriores.
+    """
+    URL = '/api/ventas/dashboard-sales-over-time/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(nombre='Cliente Serie')
+        cls.ultimo = date(2025, 6, 30)
+        ResumenDiarioVenta.objects.bulk_create([
+            ResumenDiarioVenta(
+                fecha=cls.ultimo - timedelta(days=n), cliente=cliente, estado='completada',
+                cantidad_ventas=1, monto_total=Decimal('1.00'),
+            )
+            for n in range(400)
+        ])
+
+    def _pagina(self, **params):
+        response = APIClient().get(self.URL, params)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content)), response.get('X-Next-Cursor')
+
+    def test_primera_pagina_son_los_dias_mas_recientes(self):
+        for rellenar in ('1', '0'):
+            filas, cursor = self._pagina(rellenar=rellenar)
+            fechas = [fila['fecha'] for fila in filas]
+            self.assertEqual(len(fechas), 366)
+            self.assertEqual(fechas[-1], self.ultimo.isoformat())
+            self.assertEqual(fechas, sorted(fechas))
+            self.assertEqual(cursor, fechas[0])
+
+            anteriores, siguiente = self._pagina(rellenar=rellenar, cursor=cursor)
+            self.assertEqual(len(anteriores), 34)
+            self.assertEqual(anteriores[-1]['fecha'], (date.fromisoformat(cursor) - timedelta(days=1)).isoformat())
+            self.assertIsNone(siguiente)
+
+    def test_cursor_visible_desde_otro_origen(self):
+        response = APIClient().get(self.URL, HTTP_ORIGIN='http://localhost:5173')
+        self.assertIn('X-Next-Cursor', response['Access-Control-Expose-Headers'])
+
+    def test_por_mes_incluye_el_mes_completo(self):
+        filas, cursor = self._pagina(periodo='mes', limit=2)
+        self.assertEqual([(fila['fecha'], fila['total_ventas']) for fila in filas], [('2025-05-01', 31), ('2025-06-01', 30)])
+        self.assertEqual(cursor, '2025-05-01')
+
+class BenchmarkTests(TestCase):
+    """
+    El harness de benchmark corre todos los escenarios sobre datos sembrados
+    y detecta regresiones contra la línea base y los presupuestos fijos.
+    """
+
+    def test_percentil(self):
+        self.assertEqual(percentil([], 95), 0.0)
+        self.assertEqual(percentil([5], 95), 5)
+        self.assertEqual(percentil([4, 1, 3, 2], 50), 2.5)
+        self.assertAlmostEqual(percentil(range(1, 101), 95), 95.05)
+
+    def test_comparar_detecta_regresiones(self):
+        base = {'chica': {'checkout': {'p50_ms': 10, 'p95_ms': 20, 'consultas': 15}}}
+        igual = {'chica': {'checkout': {'p50_ms': 11, 'p95_ms': 25, 'consultas': 15, 'consultas_max': 20}}}
+        self.assertEqual(comparar(igual, base, tolerancia=0.5, holgura_ms=5), [])
+
+        peor = {'chica': {'checkout': {'p50_ms': 30, 'p95_ms': 40, 'consultas': 21, 'consultas_max': 20}}}
+        regresiones = comparar(peor, base, tolerancia=0.5, holgura_ms=5)
+        self.assertEqual(len(regresiones), 3)
+        self.assertTrue(all(r.startswith('[chica] checkout') for r in regresiones))
+
+        # Sin línea base solo cuentan los presupuestos fijos
+        self.assertEqual(len(comparar(peor, None)), 1)
+
+    def test_escenarios_dentro_de_presupuesto(self):
+        siembra = {'ventas': 150, 'catalogos': 8, 'unidades_por_catalogo': 20, 'dias': 150}
+        resultados = ejecutar(siembra, repeticiones=2, calentamiento=1)
 
-# Create your tests here.
+        self.assertEqual(set(resultados), {escenario.nombre for escenario in ESCENARIOS})
+        for metricas in resultados.values():
+            self.assertLessEqual(metricas['p50_ms'], metricas['p95_ms'])
+        self.assertEqual(comparar({'mini': resultados}), [])
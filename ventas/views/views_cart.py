@@ -5,11 +5,21 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from ventas.models import Cart, CartItem
-from catalogo.models import Catalogo
-from ventas.serializers.serializers_cart import CartSerializer, AddCartItemSerializer
+from rest_framework.exceptions import ValidationError
+from ventas.models import CartItem
+from ventas.serializers.serializers_cart import CartSerializer, AddCartItemSerializer, SetCartItemSerializer
+from ventas.core.cart_store import cart_store, VersionConflicto
+from ventas.core.cart_items import (
+    sumar_items, fijar_items, validar_catalogos, CatalogosInexistentes, CANTIDAD_MAXIMA
+)
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+# Impuesto aplicado en el checkout (IVA 13%)
+TASA_IMPUESTO = Decimal('0.13')
+CENTAVOS = Decimal('0.01')
 
 
 class CartViewSet(viewsets.GenericViewSet):
@@ -26,14 +36,37 @@ class CartViewSet(viewsets.GenericViewSet):
         """
         if not self.request.user.is_authenticated:
             return None
-        
-        user = self.request.user
-        print(f"DEBUG get_cart - Usuario autenticado: {user.username} (ID: {user.id})")
-        
-        # Cada usuario autenticado tiene su propio carrito
-        cart, created = Cart.objects.get_or_create(user=user)
-        print(f"DEBUG get_cart - Cart ID: {cart.id}, Creado: {created}, Items: {cart.items.count()}")
-        return cart
+        return cart_store.obtener_carrito(self.request.user)
+
+    def version_esperada(self, request):
+        """
+        Versión del carrito sobre la que el cliente hizo el cambio, enviada en
+        el header X-Cart-Version o en el body como "version". Si no se envía,
+        el cambio se aplica sobre la versión vigente.
+        """
+        valor = request.headers.get('X-Cart-Version')
+        if valor is None and hasattr(request.data, 'get'):
+            valor = request.data.get('version')
+        if valor in (None, ''):
+            return None
+        try:
+            return int(valor)
+        except (TypeError, ValueError):
+            raise ValidationError({'version': 'Debe ser un número entero'})
+
+    def modificar_carrito(self, request, mutacion, status_code=status.HTTP_200_OK):
+        """
+        Aplica la mutación con escritura directa a la base y responde con el
+        carrito actualizado; 409 si el cliente trabajaba sobre otra versión.
+        """
+        try:
+            snapshot = cart_store.escribir(request.user, mutacion, self.version_esperada(request))
+        except VersionConflicto as e:
+            return Response({
+                'error': 'El carrito fue modificado desde otra sesión',
+                'cart': e.snapshot['data'],
+            }, status=status.HTTP_409_CONFLICT)
+        return Response(snapshot['data'], status=status_code)
 
     @action(detail=False, methods=['get'])
     def my_cart(self, request):
@@ -41,6 +74,7 @@ class CartViewSet(viewsets.GenericViewSet):
         Ver mi carrito actual
         Ruta: GET /api/cart/my_cart/
         Requiere autenticación
+        Se responde desde la caché; la base solo se consulta en un fallo.
         """
         if not request.user.is_authenticated:
             return Response({
@@ -49,16 +83,44 @@ class CartViewSet(viewsets.GenericViewSet):
                 'message': 'Debes iniciar sesión para ver tu carrito'
             }, status=status.HTTP_200_OK)
         
-        cart = self.get_cart()
-        serializer = self.get_serializer(cart)
-        return Response(serializer.data)
+        return Response(cart_store.leer(request.user)['data'])
+
+    def lineas_del_body(self, request, serializer_class, agrupar):
+        """
+        Valida el body (un objeto o una lista de { catalogo_id, quantity }) y
+        lo agrupa por catálogo con agrupar(anterior, nueva). Todos los
+        catálogos se verifican en una sola consulta.
+        """
+        datos = request.data
+        if isinstance(datos, dict) and isinstance(datos.get('items'), list):
+            datos = datos['items']
+        muchos = isinstance(datos, list)
+        serializer = serializer_class(data=datos, many=muchos)
+        serializer.is_valid(raise_exception=True)
+
+        lineas = {}
+        for linea in (serializer.validated_data if muchos else [serializer.validated_data]):
+            catalogo_id = linea['catalogo_id']
+            if catalogo_id in lineas:
+                lineas[catalogo_id] = agrupar(lineas[catalogo_id], linea['quantity'])
+            else:
+                lineas[catalogo_id] = linea['quantity']
+        validar_catalogos(lineas)
+        return lineas
+
+    def respuesta_catalogos_inexistentes(self, error):
+        return Response({
+            'error': 'Catálogo no encontrado',
+            'catalogos_inexistentes': error.ids,
+        }, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=['post'], serializer_class=AddCartItemSerializer)
     def add_item(self, request):
         """
-        Añadir un ítem al carrito.
+        Añadir uno o varios ítems al carrito (se suman a lo que ya había).
         Ruta: POST /api/cart/add_item/
         Body: { "catalogo_id": 10, "quantity": 2 }
+           o: [{ "catalogo_id": 10, "quantity": 2 }, { "catalogo_id": 11, "quantity": 1 }]
         Requiere autenticación
         """
         if not request.user.is_authenticated:
@@ -66,27 +128,41 @@ class CartViewSet(viewsets.GenericViewSet):
                 'error': 'Debes iniciar sesión para agregar productos al carrito'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        cart = self.get_cart()
-        serializer = AddCartItemSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        try:
+            lineas = self.lineas_del_body(request, AddCartItemSerializer, lambda a, b: a + b)
+        except CatalogosInexistentes as e:
+            return self.respuesta_catalogos_inexistentes(e)
 
-        catalogo = get_object_or_404(Catalogo, pk=serializer.validated_data['catalogo_id'])
-        quantity = serializer.validated_data['quantity']
+        # Un solo upsert: inserta las líneas nuevas y suma en las existentes
+        # Devolvemos el carrito actualizado completo
+        return self.modificar_carrito(request, lambda cart: sumar_items(cart.id, lineas))
 
-        # Lógica de update_or_create
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            catalogo=catalogo,
-            defaults={'quantity': quantity}
-        )
+    @action(detail=False, methods=['patch', 'put'], serializer_class=SetCartItemSerializer)
+    def update_items(self, request):
+        """
+        Fijar la cantidad de uno o varios ítems (sincroniza un carrito armado
+        sin conexión). Una cantidad de 0 elimina el ítem.
+        Ruta: PATCH /api/cart/update_items/
+        Body: [{ "catalogo_id": 10, "quantity": 3 }, { "catalogo_id": 11, "quantity": 0 }]
+        Con PUT el carrito queda exactamente como la lista enviada.
+        Requiere autenticación
+        """
+        if not request.user.is_authenticated:
+            return Response({
+                'error': 'Debes iniciar sesión para actualizar el carrito'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        
+        try:
+            lineas = self.lineas_del_body(request, SetCartItemSerializer, lambda a, b: b)
+        except CatalogosInexistentes as e:
+            return self.respuesta_catalogos_inexistentes(e)
 
-        if not created:
-            # Si ya existía, sumamos la cantidad
-            cart_item.quantity += quantity
-            cart_item.save()
+        def sincronizar(cart):
+            if request.method == 'PUT':
+                cart.items.exclude(catalogo_id__in=lineas).delete()
+            fijar_items(cart.id, lineas)
 
-        # Devolvemos el carrito actualizado completo
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+        return self.modificar_carrito(request, sincronizar)
 
     @action(detail=False, methods=['patch'], url_path='update_item/(?P<item_id>[^/.]+)')
     def update_item_quantity(self, request, item_id=None):
@@ -101,19 +177,23 @@ class CartViewSet(viewsets.GenericViewSet):
                 'error': 'Debes iniciar sesión para actualizar el carrito'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        cart = self.get_cart()
-        # Aseguramos que el ítem pertenezca al carrito del usuario actual
-        cart_item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+        try:
+            quantity = min(int(request.data.get('quantity', 1)), CANTIDAD_MAXIMA)
+        except (TypeError, ValueError):
+            raise ValidationError({'quantity': 'Debe ser un número entero'})
 
-        quantity = int(request.data.get('quantity', 1))
-        if quantity > 0:
-            cart_item.quantity = quantity
-            cart_item.save()
-        else:
-            # Si envían cantidad 0 o menor, lo borramos
-            cart_item.delete()
+        def actualizar(cart):
+            # Una sentencia; el filtro por carrito asegura que el ítem sea del usuario
+            items = CartItem.objects.filter(pk=item_id, cart=cart)
+            if quantity > 0:
+                afectados = items.update(quantity=quantity)
+            else:
+                # Si envían cantidad 0 o menor, lo borramos
+                afectados, _ = items.delete()
+            if not afectados:
+                raise Http404('Ítem no encontrado en el carrito')
 
-        return Response(CartSerializer(cart).data)
+        return self.modificar_carrito(request, actualizar)
 
     @action(detail=False, methods=['delete'], url_path='remove_item/(?P<item_id>[^/.]+)')
     def remove_item(self, request, item_id=None):
@@ -127,11 +207,11 @@ class CartViewSet(viewsets.GenericViewSet):
                 'error': 'Debes iniciar sesión para modificar el carrito'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        cart = self.get_cart()
-        cart_item = get_object_or_404(CartItem, pk=item_id, cart=cart)
-        cart_item.delete()
+        def eliminar(cart):
+            cart_item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+            cart_item.delete()
         
-        return Response(CartSerializer(cart).data)
+        return self.modificar_carrito(request, eliminar)
     
     @action(detail=False, methods=['post'])
     def clear_cart(self, request):
@@ -146,53 +226,64 @@ class CartViewSet(viewsets.GenericViewSet):
                 'error': 'Debes iniciar sesión'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        cart = self.get_cart()
-        cart.items.all().delete()
+        response = self.modificar_carrito(request, lambda cart: cart.items.all().delete())
+        if response.status_code != status.HTTP_200_OK:
+            return response
         
         return Response({
             'message': 'Carrito vaciado exitosamente',
-            'cart': CartSerializer(cart).data
+            'cart': response.data
         })
 
     @action(detail=False, methods=['post'])
     def checkout(self, request):
         """
-        Crear una venta a partir del carrito actual y vaciar el carrito
+        Crear una venta a partir del carrito actual y reservar su stock
         Ruta: POST /api/cart/checkout/
         Body: {
             "cliente_id": 1,
             "direccion": "Calle Principal 123",
-            "impuesto": 0.00,
             "descuento": 0.00,
             "costo_envio": 0.00
         }
+        El impuesto se calcula siempre como el 13% del subtotal.
+        La cantidad de consultas no depende del tamaño del carrito.
         """
         from django.db import transaction
         from ventas.models import Venta, DetalleVenta
         from administracion.models import Cliente
         from administracion.core.utils import registrar_bitacora
+        from catalogo.core.stock import reservar_unidades, StockInsuficiente
+        from ventas.serializers.serializers_venta import VentaSerializer
+        
+        if not request.user.is_authenticated:
+            return Response({
+                'error': 'Debes iniciar sesión para realizar la compra'
+            }, status=status.HTTP_401_UNAUTHORIZED)
         
         cart = self.get_cart()
         
-        # Debug: Imprimir información del carrito
-        print(f"DEBUG - Usuario: {request.user if request.user.is_authenticated else 'No autenticado'}")
-        print(f"DEBUG - Cart ID: {cart.id}")
-        print(f"DEBUG - Cantidad de items: {cart.items.count()}")
-        print(f"DEBUG - Items: {list(cart.items.values_list('id', 'catalogo__nombre', 'quantity'))}")
+        # Una sola consulta para ítems y precios del catálogo
+        items = list(cart.items.select_related('catalogo'))
         
         # Validar que el carrito no esté vacío
-        if not cart.items.exists():
+        if not items:
             return Response(
                 {'error': 'El carrito está vacío'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Obtener datos del request
+        # Obtener datos del request (montos en Decimal, nunca float)
         cliente_id = request.data.get('cliente_id')
         direccion = request.data.get('direccion', '')
-        impuesto = float(request.data.get('impuesto', 0))
-        descuento = float(request.data.get('descuento', 0))
-        costo_envio = float(request.data.get('costo_envio', 0))
+        try:
+            descuento = Decimal(str(request.data.get('descuento', 0)))
+            costo_envio = Decimal(str(request.data.get('costo_envio', 0)))
+        except InvalidOperation:
+            return Response(
+                {'error': 'descuento y costo_envio deben ser numéricos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Validar cliente
         if not cliente_id:
@@ -211,11 +302,11 @@ class CartViewSet(viewsets.GenericViewSet):
         
         try:
             with transaction.atomic():
-                # Calcular subtotal del carrito
-                subtotal = float(cart.total_price)
+                # Subtotal desde las filas ya cargadas
+                subtotal = sum((item.subtotal for item in items), Decimal('0.00'))
                 
                 # Calcular impuesto automáticamente (13% del subtotal)
-                impuesto_calculado = subtotal * 0.13
+                impuesto_calculado = (subtotal * TASA_IMPUESTO).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
                 
                 # Crear la venta
                 venta = Venta.objects.create(
@@ -228,15 +319,24 @@ class CartViewSet(viewsets.GenericViewSet):
                     estado='pendiente'
                 )
                 
-                # Crear los detalles de venta a partir de los items del carrito
-                for item in cart.items.all():
-                    DetalleVenta.objects.create(
+                # Crear todos los detalles en un solo INSERT.
+                # bulk_create no llama a save(), así que los totales se calculan antes.
+                detalles = [
+                    DetalleVenta(
                         venta=venta,
                         catalogo=item.catalogo,
                         cantidad=item.quantity,
                         precio_unitario=item.catalogo.precio,
-                        descuento=0
+                        descuento=Decimal('0.00')
                     )
+                    for item in items
+                ]
+                for detalle in detalles:
+                    detalle.calcular_totales()
+                DetalleVenta.objects.bulk_create(detalles)
+                
+                # Reservar las unidades hasta que llegue el pago (todo o nada)
+                reservar_unidades(venta.id, {item.catalogo_id: item.quantity for item in items})
                 
                 # NO vaciar el carrito aquí - se vaciará cuando el pago sea exitoso
                 # El carrito se mantendrá para que el usuario pueda volver si cancela el pago
@@ -244,17 +344,22 @@ class CartViewSet(viewsets.GenericViewSet):
                 # Registrar en bitácora
                 registrar_bitacora(
                     request=request,
-                    usuario=request.user if request.user.is_authenticated else None,
+                    usuario=request.user,
                     accion='CREAR',
                     descripcion=f'Venta #{venta.id} creada desde carrito para cliente {cliente.nombre}',
                     modulo='VENTAS'
                 )
+            
+            # Retornar la venta creada (mismas precargas que VentaViewSet)
+            venta = Venta.objects.con_detalles().get(pk=venta.pk)
+            serializer = VentaSerializer(venta)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
                 
-                # Retornar la venta creada
-                from ventas.serializers.serializers_venta import VentaSerializer
-                serializer = VentaSerializer(venta)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
-                
+        except StockInsuficiente as e:
+            return Response(
+                {'error': 'Stock insuficiente para completar la compra', 'faltantes': e.faltantes},
+                status=status.HTTP_409_CONFLICT
+            )
         except Exception as e:
             return Response(
                 {'error': f'Error al crear la venta: {str(e)}'},
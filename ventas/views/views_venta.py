@@ -5,8 +5,9 @@ from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.db.models import Sum, Count, Avg
-from ventas.models import Venta, DetalleVenta, Pago
+from django.db.models import Sum, Count, Avg, Prefetch
+from ventas.models import Venta, DetalleVenta, Pago, ResumenDiarioVenta, ResumenDiarioProducto
+from catalogo.models import Catalogo
 from ventas.serializers.serializers_venta import (
     VentaSerializer,
     VentaListSerializer,
@@ -16,22 +17,28 @@ from ventas.serializers.serializers_venta import (
     PagoCreateSerializer
 )
 from administracion.core.utils import registrar_bitacora
+from catalogo.core.stock import liberar_reserva
 from django.db.models import Sum, Count, Avg
 from django.db.models.functions import TruncDate, TruncMonth, TruncYear
-import joblib
-import pandas as pd
-from datetime import datetime
+from ventas.core.prediccion import registro_modelo
+from ventas.core.series import PERIODOS, limites, serie_ventas
+from django.http import StreamingHttpResponse
+from datetime import date, datetime
+from decimal import Decimal
 from dateutil.relativedelta import relativedelta
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from rest_framework.utils.encoders import JSONEncoder
 
-MODEL_FILE_PATH = 'sales_model.pkl'
+# Períodos por página en dashboard-sales-over-time
+LIMITE_SERIE = 366
+LIMITE_SERIE_MAXIMO = 5000
 
 class VentaViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gestión de Ventas
     """
-    queryset = Venta.objects.all().select_related('cliente').prefetch_related('detalles')
+    queryset = Venta.objects.con_detalles()
     permission_classes = [AllowAny]
     
     def get_serializer_class(self):
@@ -62,6 +69,23 @@ class VentaViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def get_resumen_queryset(self):
+        """
+        Resumen diario de ventas con los mismos filtros que get_queryset.
+        Los dashboards leen de aquí en vez de agrupar ventas_venta completo.
+        """
+        queryset = ResumenDiarioVenta.objects.all()
+        
+        cliente_id = self.request.query_params.get('cliente', None)
+        if cliente_id:
+            queryset = queryset.filter(cliente_id=cliente_id)
+        
+        estado = self.request.query_params.get('estado', None)
+        if estado:
+            queryset = queryset.filter(estado=estado)
+        
+        return queryset
+    
     def create(self, request, *args, **kwargs):
         """
         Crea una nueva venta con sus detalles
@@ -130,6 +154,10 @@ class VentaViewSet(viewsets.ModelViewSet):
         venta.estado = nuevo_estado
         venta.save()
         
+        # Una venta cancelada devuelve sus unidades reservadas al stock
+        if nuevo_estado == 'cancelada':
+            liberar_reserva(venta.id)
+        
         # Registrar en bitácora
         registrar_bitacora(
             usuario=request.user if request.user.is_authenticated else None,
@@ -149,19 +177,24 @@ class VentaViewSet(viewsets.ModelViewSet):
         """
         from decimal import Decimal
         
-        stats = Venta.objects.aggregate(
-            total_ventas=Count('id'),
-            ventas_pendientes=Count('id', filter=models.Q(estado='pendiente')),
-            ventas_completadas=Count('id', filter=models.Q(estado='completada')),
-            ventas_canceladas=Count('id', filter=models.Q(estado='cancelada')),
-            ingresos_totales=Sum('total'),
-            ticket_promedio=Avg('total')
+        # Desde el resumen diario: el costo no crece con el historial
+        stats = ResumenDiarioVenta.objects.aggregate(
+            total_ventas=Sum('cantidad_ventas'),
+            ventas_pendientes=Sum('cantidad_ventas', filter=models.Q(estado='pendiente')),
+            ventas_completadas=Sum('cantidad_ventas', filter=models.Q(estado='completada')),
+            ventas_canceladas=Sum('cantidad_ventas', filter=models.Q(estado='cancelada')),
+            ingresos_totales=Sum('monto_total'),
         )
         
         # Convertir None a 0
         for key, value in stats.items():
             if value is None:
-                stats[key] = Decimal('0.00') if 'ingresos' in key or 'promedio' in key else 0
+                stats[key] = Decimal('0.00') if 'ingresos' in key else 0
+        
+        if stats['total_ventas']:
+            stats['ticket_promedio'] = (stats['ingresos_totales'] / stats['total_ventas']).quantize(Decimal('0.01'))
+        else:
+            stats['ticket_promedio'] = Decimal('0.00')
         
         return Response(stats)
     
@@ -174,49 +207,73 @@ class VentaViewSet(viewsets.ModelViewSet):
         Ruta por Día:   GET /api/ventas/dashboard-sales-over-time/
         Ruta por Mes:  GET /api/ventas/dashboard-sales-over-time/?periodo=mes
         Ruta por Año:  GET /api/ventas/dashboard-sales-over-time/?periodo=anio
+        
+        Parámetros opcionales:
+            desde, hasta: ventana AAAA-MM-DD (por defecto, primera y última venta)
+            limit: períodos por página (default 366, máximo 5000)
+            cursor: valor del header X-Next-Cursor de la página anterior
+        La primera página trae los últimos `limit` períodos hasta `hasta`;
+        cada página siguiente trae los anteriores.
+            rellenar: 1 (default) incluye los períodos sin ventas con total 0
+        La respuesta se envía en streaming; el header X-Next-Cursor solo
+        aparece si hay más páginas.
         """
         
         # 1. Leemos el parámetro 'periodo' de la URL. Por defecto es 'dia'.
         periodo = request.query_params.get('periodo', 'dia').lower()
+        if periodo not in PERIODOS:
+            periodo = 'dia'
         
-        queryset = self.get_queryset().filter(estado='completada')
-        
-        # 2. Decidimos qué función de truncamiento usar
-        if periodo == 'mes':
-            sales_data = queryset \
-                .annotate(periodo_agrupado=TruncMonth('fecha')) \
-                .values('periodo_agrupado') \
-                .annotate(total_ventas=Sum('total')) \
-                .order_by('periodo_agrupado')
-                
-        elif periodo == 'anio':
-            sales_data = queryset \
-                .annotate(periodo_agrupado=TruncYear('fecha')) \
-                .values('periodo_agrupado') \
-                .annotate(total_ventas=Sum('total')) \
-                .order_by('periodo_agrupado')
-        
-        else: # Por defecto, agrupamos por día
-            sales_data = queryset \
-                .annotate(periodo_agrupado=TruncDate('fecha')) \
-                .values('periodo_agrupado') \
-                .annotate(total_ventas=Sum('total')) \
-                .order_by('periodo_agrupado')
-        
-        # 3. Renombramos la clave para que el frontend la entienda
-        # (El resultado de .values() es [{'periodo_agrupado': '...', 'total_ventas': ...}])
-        # Lo cambiamos a [{'fecha': '...', 'total_ventas': ...}]
-        
-        # Nota: Convertimos la fecha a string para un JSON limpio
-        response_data = [
-            {
-                'fecha': item['periodo_agrupado'].strftime('%Y-%m-%d'), 
-                'total_ventas': item['total_ventas']
-            } 
-            for item in sales_data
-        ]
-        
-        return Response(response_data)
+        try:
+            desde = self._fecha_param(request, 'desde')
+            hasta = self._fecha_param(request, 'hasta')
+            cursor = self._fecha_param(request, 'cursor')
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limite = int(request.query_params.get('limit', LIMITE_SERIE))
+        except ValueError:
+            return Response({'error': 'limit debe ser un número entero'}, status=status.HTTP_400_BAD_REQUEST)
+        limite = max(1, min(limite, LIMITE_SERIE_MAXIMO))
+        rellenar = request.query_params.get('rellenar', '1').lower() not in ('0', 'false', 'no')
+        
+        # Se agrupa el resumen diario (una fila por día, cliente y estado)
+        queryset = self.get_resumen_queryset().filter(estado='completada')
+        
+        # 2. Ventana de fechas: si falta un extremo se usa el de los datos
+        if desde is None or hasta is None:
+            primero, ultimo = limites(queryset)
+            desde = desde or primero
+            hasta = hasta or ultimo
+        
+        if desde is None or hasta is None:
+            filas, siguiente = [], None
+        else:
+            filas, siguiente = serie_ventas(queryset, periodo, desde, hasta, limite, cursor, rellenar)
+        
+        # 3. Respuesta en streaming: [{'fecha': '...', 'total_ventas': ...}]
+        # Cada item pasa por el encoder de DRF, igual que con Response
+        encoder = JSONEncoder()
+        def generar():
+            yield '['
+            for i, (fecha, total) in enumerate(filas):
+                separador = ',' if i else ''
+                yield separador + encoder.encode({'fecha': f'{fecha:%Y-%m-%d}', 'total_ventas': Decimal(total)})
+            yield ']'
+        
+        response = StreamingHttpResponse(generar(), content_type='application/json')
+        if siguiente is not None:
+            response['X-Next-Cursor'] = siguiente.isoformat()
+        return response
+    
+    def _fecha_param(self, request, nombre):
+        valor = request.query_params.get(nombre)
+        if not valor:
+            return None
+        try:
+            return date.fromisoformat(valor)
+        except ValueError:
+            raise ValueError(f'{nombre} debe tener el formato AAAA-MM-DD')
     
     @action(detail=False, methods=['get'], url_path='dashboard-products')
     def dashboard_products_report(self, request):
@@ -237,10 +294,11 @@ class VentaViewSet(viewsets.ModelViewSet):
         else:
             order_by_field = '-monto_total_vendido' # Descendente (Top 5)
 
-        # 3. Construye la consulta
-        products_data = DetalleVenta.objects.filter(venta__estado='completada') \
+        # 3. Construye la consulta sobre el resumen diario por producto
+        # (solo contiene ventas completadas)
+        products_data = ResumenDiarioProducto.objects \
             .values('catalogo__nombre') \
-            .annotate(monto_total_vendido=Sum('total')) \
+            .annotate(monto_total_vendido=Sum('monto_total')) \
             .order_by(order_by_field)[:5] # <-- ¡Usa el campo dinámico!
         
         return Response(products_data)
@@ -268,14 +326,14 @@ class VentaViewSet(viewsets.ModelViewSet):
             # Orden Descendente = Más ventas (Top 5)
             order_by_field = '-monto_total'
 
-        # 3. El resto de la consulta es idéntica
-        queryset = self.get_queryset().filter(estado='completada')
+        # 3. El resto de la consulta es idéntica, sobre el resumen diario
+        queryset = self.get_resumen_queryset().filter(estado='completada')
         
         top_clients = queryset \
             .values('cliente__nombre', 'cliente__nit_ci') \
             .annotate(
-                cantidad_compras=Count('id'),
-                monto_total=Sum('total')
+                cantidad_compras=Sum('cantidad_ventas'),
+                monto_total=Sum('monto_total')
             ) \
             .order_by(order_by_field)[:5] # <-- 4. Usamos el campo dinámico
         
@@ -286,7 +344,9 @@ class DetalleVentaViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet de solo lectura para Detalles de Venta
     """
-    queryset = DetalleVenta.objects.all().select_related('venta', 'catalogo')
+    queryset = DetalleVenta.objects.all().select_related('venta').prefetch_related(
+        Prefetch('catalogo', queryset=Catalogo.objects.para_serializar()),
+    )
     serializer_class = DetalleVentaSerializer
     permission_classes = [AllowAny]
     
@@ -375,9 +435,17 @@ class SalesPredictionView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        # 1. Generar "features" para los próximos 6 meses
+        today = datetime.now()
+        meses = []
+        for i in range(1, 7): # Predecir los próximos 6 meses
+            future_date = today + relativedelta(months=i)
+            meses.append((future_date.year, future_date.month))
+
         try:
-            # 1. Cargar el modelo guardado
-            model = joblib.load(MODEL_FILE_PATH)
+            # 2. Modelo en memoria (se recarga solo si cambia el archivo) y
+            # predicción de los 6 meses en un solo lote, memorizada por versión
+            valores = registro_modelo.predecir(meses)
         except FileNotFoundError:
             return Response(
                 {'error': 'Modelo no encontrado. Por favor, entrene el modelo primero.'}, 
@@ -386,25 +454,11 @@ class SalesPredictionView(APIView):
         except Exception as e:
             return Response({'error': f'Error al cargar el modelo: {str(e)}'}, status=500)
 
-        # 2. Generar "features" para los próximos 6 meses
-        predictions = []
-        today = datetime.now()
-        
-        for i in range(1, 7): # Predecir los próximos 6 meses
-            future_date = today + relativedelta(months=i)
-            year = future_date.year
-            month_num = future_date.month
-            
-            # Crear el DataFrame para predecir (debe tener las mismas columnas que 'X' en el entrenamiento)
-            features = pd.DataFrame([[year, month_num]], columns=['year', 'month_num'])
-            
-            # 3. Hacer la predicción
-            predicted_sales = model.predict(features)[0]
-            
-            predictions.append({
-                'label': f'{year}-{month_num:02d}', # Formato '2026-01'
-                'predicted_sales': round(predicted_sales, 2)
-            })
+        # 3. Formato '2026-01'
+        predictions = [
+            {'label': f'{year}-{month_num:02d}', 'predicted_sales': round(valor, 2)}
+            for (year, month_num), valor in zip(meses, valores)
+        ]
 
         # 4. Devolver el JSON listo para el gráfico
         # Ej: [{'label': '2025-12', 'predicted_sales': 15000.00}, 